@@ -0,0 +1 @@
+"""Performance benchmarks driven by a simulated ADB device."""
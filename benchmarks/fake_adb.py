@@ -0,0 +1,133 @@
+"""Stand-in ``adb`` executable that serves a local directory tree as a device.
+
+The benchmark harness points :class:`~pykeypull.extractor.Extractor` at a
+wrapper script that runs this module. Device paths are mapped below
+``FAKE_ADB_ROOT`` and device shell commands run through the host ``sh``.
+Behaviour is configured through environment variables:
+
+``FAKE_ADB_ROOT``
+    Directory acting as the device filesystem root (required).
+``FAKE_ADB_LATENCY``
+    Seconds added to every invocation, emulating the USB and adbd round-trip.
+``FAKE_ADB_BANDWIDTH``
+    Transfer rate in bytes per second for ``pull`` and ``exec-out``; ``0``
+    means unlimited.
+``FAKE_ADB_LOG``
+    File that receives one line per invocation, used to count subprocesses.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import BinaryIO, List
+
+SERIAL = "FAKE0001"
+
+_CHUNK_SIZE = 64 * 1024
+
+# Absolute device paths appear after whitespace or an opening quote.
+_DEVICE_PATH = re.compile(r"(?<=[\s'\"])/")
+
+
+def _copy(source: BinaryIO, sink: BinaryIO, bandwidth: float) -> None:
+    """Copy ``source`` to ``sink`` at no more than ``bandwidth`` bytes per second."""
+
+    started = time.monotonic()
+    sent = 0
+    for chunk in iter(lambda: source.read(_CHUNK_SIZE), b""):
+        sink.write(chunk)
+        sent += len(chunk)
+        if bandwidth > 0:
+            ahead = sent / bandwidth - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+    sink.flush()
+
+
+def _device_command(root: Path, args: List[str]) -> str:
+    """Return the host shell command for the device command ``args``."""
+
+    command = " ".join(args)
+    words = shlex.split(command)
+    if words[:2] == ["su", "-c"] and len(words) == 3:
+        command = words[2]
+    return _DEVICE_PATH.sub(str(root) + "/", " " + command).lstrip()
+
+
+def _shell(root: Path, args: List[str]) -> int:
+    if args == ["id", "-u"]:
+        # The synthetic device always runs adbd as root.
+        sys.stdout.write("0\n")
+        return 0
+    result = subprocess.run(
+        ["sh", "-c", _device_command(root, args)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+    prefix = str(root).encode()
+    sys.stdout.buffer.write(result.stdout.replace(prefix, b""))
+    sys.stderr.buffer.write(result.stderr.replace(prefix, b""))
+    return result.returncode
+
+
+def _exec_out(root: Path, args: List[str], bandwidth: float) -> int:
+    with subprocess.Popen(
+        ["sh", "-c", _device_command(root, args)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    ) as process:
+        _copy(process.stdout, sys.stdout.buffer, bandwidth)
+    return 0
+
+
+def _pull(root: Path, remote: str, local: str, bandwidth: float) -> int:
+    source = root / remote.lstrip("/")
+    if not source.is_file():
+        sys.stderr.write(f"adb: error: remote object '{remote}' does not exist\n")
+        return 1
+    with source.open("rb") as handle, open(local, "wb") as output:
+        _copy(handle, output, bandwidth)
+    return 0
+
+
+def main(argv: List[str]) -> int:  # pylint: disable=too-many-return-statements
+    """Dispatch one ``adb`` invocation."""
+
+    root = Path(os.environ["FAKE_ADB_ROOT"])
+    log = os.environ.get("FAKE_ADB_LOG")
+    if log:
+        with open(log, "a", encoding="utf-8") as handle:
+            handle.write(" ".join(argv) + "\n")
+    time.sleep(float(os.environ.get("FAKE_ADB_LATENCY", "0")))
+    bandwidth = float(os.environ.get("FAKE_ADB_BANDWIDTH", "0"))
+
+    if argv[:2] == ["-s", SERIAL]:
+        argv = argv[2:]
+    command, args = argv[0], argv[1:]
+    if command == "start-server":
+        return 0
+    if command == "devices":
+        sys.stdout.write(f"List of devices attached\n{SERIAL}\tdevice\n")
+        return 0
+    if command == "root":
+        sys.stdout.write("adbd is already running as root\n")
+        return 0
+    if command == "shell":
+        return _shell(root, args)
+    if command == "exec-out":
+        return _exec_out(root, args, bandwidth)
+    if command == "pull" and len(args) == 2:
+        return _pull(root, args[0], args[1], bandwidth)
+    sys.stderr.write(f"fake adb: unsupported command {command!r}\n")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
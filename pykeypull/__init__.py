@@ -1,6 +1,8 @@
 """Python implementation of the KeyPull utility."""
 
+from .aio import AsyncExtractor
 from .extractor import Extractor
+from .fleet import extract_fleet
 from .locations import DEVICE_LOCATIONS
 
-__all__ = ["Extractor", "DEVICE_LOCATIONS"]
+__all__ = ["AsyncExtractor", "Extractor", "DEVICE_LOCATIONS", "extract_fleet"]
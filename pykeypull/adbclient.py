@@ -0,0 +1,372 @@
+"""Minimal pure-Python client for the ADB host protocol.
+
+The client talks to the local ADB server (``adb start-server``) over its TCP
+socket instead of forking the ``adb`` binary for every command. Only the
+services KeyPull needs are implemented: ``host:devices``, ``host:devices-l``,
+``host:track-devices``, ``shell``/``exec`` and the ``sync:`` file service
+(STAT, LIST and RECV).
+"""
+
+from __future__ import annotations
+
+import socket
+import struct
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5037
+
+# Shell protocol v2 packet identifiers.
+_SHELL_STDOUT = 1
+_SHELL_STDERR = 2
+_SHELL_EXIT = 3
+
+_SYNC_MAX_DATA = 64 * 1024
+_MAX_REQUEST = 0xFFFF
+
+
+class AdbProtocolError(RuntimeError):
+    """Raised when the ADB server rejects a request or replies unexpectedly."""
+
+
+@dataclass
+class SyncStat:
+    """File metadata returned by the sync ``STAT`` and ``LIST`` requests."""
+
+    mode: int
+    size: int
+    mtime: int
+    name: str = ""
+
+    @property
+    def exists(self) -> bool:
+        """Return whether the remote path exists (ADB reports zero mode otherwise)."""
+
+        return self.mode != 0
+
+    @property
+    def is_directory(self) -> bool:
+        """Return whether the entry is a directory."""
+
+        return self.mode & 0o170000 == 0o040000
+
+    @property
+    def is_file(self) -> bool:
+        """Return whether the entry is a regular file."""
+
+        return self.mode & 0o170000 == 0o100000
+
+
+def _recv_exact(sock: socket.socket, length: int) -> bytes:
+    chunks = []
+    remaining = length
+    while remaining:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            raise AdbProtocolError("connection closed by ADB server")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_all(sock: socket.socket) -> bytes:
+    chunks = []
+    while True:
+        chunk = sock.recv(_SYNC_MAX_DATA)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def _parse_devices(payload: str) -> List[Tuple[str, str]]:
+    devices = []
+    for line in payload.splitlines():
+        parts = line.split()
+        if len(parts) >= 2:
+            devices.append((parts[0], parts[1]))
+    return devices
+
+
+class SyncConnection:
+    """A device connection switched into ``sync:`` mode.
+
+    The connection stays open between requests so that many STAT, LIST and
+    RECV operations reuse a single socket. Requests from several threads are
+    serialised, since the protocol cannot interleave them. A request that
+    fails part way through leaves the socket in an unknown state, so the
+    connection closes itself and later requests raise a transient
+    "sync connection closed" error instead of reading another reply.
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self._sock = sock
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def close(self) -> None:
+        """Send ``QUIT`` and close the underlying socket."""
+
+        with self._lock:
+            self._close()
+
+    def stat(self, path: str) -> SyncStat:
+        """Return the metadata of ``path`` on the device."""
+
+        with self._exclusive():
+            self._request(b"STAT", path)
+            reply = _recv_exact(self._sock, 16)
+            if reply[:4] != b"STAT":
+                raise AdbProtocolError(f"unexpected sync reply {reply[:4]!r}")
+        mode, size, mtime = struct.unpack("<III", reply[4:])
+        return SyncStat(mode=mode, size=size, mtime=mtime)
+
+    def list(self, path: str) -> List[SyncStat]:
+        """Return the entries of the remote directory ``path``."""
+
+        entries: List[SyncStat] = []
+        with self._exclusive():
+            self._request(b"LIST", path)
+            while True:
+                header = _recv_exact(self._sock, 20)
+                ident = header[:4]
+                mode, size, mtime, name_length = struct.unpack("<IIII", header[4:])
+                if ident == b"DONE":
+                    return entries
+                if ident != b"DENT":
+                    raise AdbProtocolError(f"unexpected sync reply {ident!r}")
+                name = _recv_exact(self._sock, name_length).decode("utf-8", "replace")
+                if name not in (".", ".."):
+                    entries.append(SyncStat(mode=mode, size=size, mtime=mtime, name=name))
+
+    def recv(self, path: str, handle: BinaryIO) -> int:
+        """Stream the remote file ``path`` into ``handle``, returning the byte count."""
+
+        total = 0
+        with self._exclusive():
+            self._request(b"RECV", path)
+            while True:
+                header = _recv_exact(self._sock, 8)
+                ident = header[:4]
+                (length,) = struct.unpack("<I", header[4:])
+                if ident == b"DONE":
+                    return total
+                if ident == b"FAIL":
+                    # The reply is complete, so the connection stays usable.
+                    message = _recv_exact(self._sock, length).decode("utf-8", "replace")
+                    break
+                if ident != b"DATA":
+                    raise AdbProtocolError(f"unexpected sync reply {ident!r}")
+                handle.write(_recv_exact(self._sock, length))
+                total += length
+        raise AdbProtocolError(message)
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Hold the connection for one request, closing it if the request breaks."""
+
+        with self._lock:
+            if self.closed:
+                raise AdbProtocolError("sync connection closed")
+            try:
+                yield
+            except BaseException:
+                self._close()
+                raise
+
+    def _close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._sock.sendall(b"QUIT" + struct.pack("<I", 0))
+        except OSError:
+            pass
+        self._sock.close()
+
+    def _request(self, ident: bytes, path: str) -> None:
+        encoded = path.encode("utf-8")
+        self._sock.sendall(ident + struct.pack("<I", len(encoded)) + encoded)
+
+
+class AdbClient:
+    """Client for the ADB server listening on ``host``:``port``.
+
+    Sync connections are cached per serial so repeated file operations on a
+    device share one socket. Threads driving the same device take turns on
+    that connection; a connection that closed itself after a failed request
+    is replaced by the next :meth:`sync` call.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        timeout: float | None = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sync: Dict[str, SyncConnection] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Host services
+    def version(self) -> int:
+        """Return the protocol version reported by the ADB server."""
+
+        with self._connect() as sock:
+            self._send(sock, "host:version")
+            return int(self._read_length_prefixed(sock), 16)
+
+    def devices(self) -> List[Tuple[str, str]]:
+        """Return ``(serial, state)`` pairs for every device known to the server."""
+
+        with self._connect() as sock:
+            self._send(sock, "host:devices")
+            return _parse_devices(self._read_length_prefixed(sock))
+
+    def devices_long(self) -> str:
+        """Return the ``host:devices-l`` listing, which includes each USB port."""
+
+        with self._connect() as sock:
+            self._send(sock, "host:devices-l")
+            return self._read_length_prefixed(sock)
+
+    def track_devices(self) -> Iterator[List[Tuple[str, str]]]:
+        """Yield the full device list each time the server reports a change.
+
+        The first list describes the devices attached when tracking starts.
+        Iteration ends when the server closes the connection.
+        """
+
+        with self._connect() as sock:
+            # Updates arrive whenever a device appears; never time out between them.
+            sock.settimeout(None)
+            self._send(sock, "host:track-devices")
+            while True:
+                try:
+                    payload = self._read_length_prefixed(sock)
+                except AdbProtocolError:
+                    return
+                yield _parse_devices(payload)
+
+    # ------------------------------------------------------------------
+    # Device services
+    def shell(self, serial: str, command: str) -> Tuple[int, bytes, bytes]:
+        """Run ``command`` with the v2 shell protocol.
+
+        Returns the exit status together with the captured stdout and stderr.
+        """
+
+        with self._open_service(serial, f"shell,v2,raw:{command}") as sock:
+            stdout: List[bytes] = []
+            stderr: List[bytes] = []
+            while True:
+                header = sock.recv(5)
+                if not header:
+                    raise AdbProtocolError("shell closed without an exit status")
+                if len(header) < 5:
+                    header += _recv_exact(sock, 5 - len(header))
+                ident, length = struct.unpack("<BI", header)
+                data = _recv_exact(sock, length)
+                if ident == _SHELL_STDOUT:
+                    stdout.append(data)
+                elif ident == _SHELL_STDERR:
+                    stderr.append(data)
+                elif ident == _SHELL_EXIT:
+                    return data[0] if data else 0, b"".join(stdout), b"".join(stderr)
+
+    def exec_out(self, serial: str, command: str) -> socket.socket:
+        """Start ``command`` and return the socket carrying its raw stdout.
+
+        The caller owns the returned socket and must close it.
+        """
+
+        return self._open_service(serial, f"exec:{command}")
+
+    def root(self, serial: str) -> str:
+        """Ask adbd on ``serial`` to restart as root and return its reply."""
+
+        with self._open_service(serial, "root:") as sock:
+            message = _recv_all(sock).decode("utf-8", "replace").strip()
+        if "cannot" in message or "unable" in message:
+            raise AdbProtocolError(message)
+        return message
+
+    def sync(self, serial: str) -> SyncConnection:
+        """Return the cached sync connection for ``serial``, opening it if needed."""
+
+        with self._lock:
+            connection = self._sync.get(serial)
+        if connection is not None and not connection.closed:
+            return connection
+        fresh = SyncConnection(self._open_service(serial, "sync:"))
+        with self._lock:
+            connection = self._sync.get(serial)
+            if connection is None or connection.closed:
+                self._sync[serial] = connection = fresh
+                fresh = None
+        if fresh is not None:
+            # Another thread opened one first; share that connection instead.
+            fresh.close()
+        return connection
+
+    def drop_sync(self, serial: str) -> None:
+        """Close and forget the sync connection for ``serial``, if any."""
+
+        with self._lock:
+            connection = self._sync.pop(serial, None)
+        if connection is not None:
+            connection.close()
+
+    def close(self) -> None:
+        """Close every cached sync connection."""
+
+        with self._lock:
+            connections = list(self._sync.values())
+            self._sync.clear()
+        for connection in connections:
+            connection.close()
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    def _connect(self) -> socket.socket:
+        try:
+            return socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as exc:
+            raise AdbProtocolError(
+                f"cannot connect to ADB server at {self.host}:{self.port}: {exc}"
+            ) from exc
+
+    def _open_service(self, serial: str, service: str) -> socket.socket:
+        sock = self._connect()
+        try:
+            self._send(sock, f"host:transport:{serial}")
+            self._send(sock, service)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def _send(self, sock: socket.socket, request: str) -> None:
+        encoded = request.encode("utf-8")
+        if len(encoded) > _MAX_REQUEST:
+            # The length prefix has four hex digits; a longer one breaks the framing.
+            raise AdbProtocolError(
+                f"request of {len(encoded)} bytes exceeds the ADB limit of {_MAX_REQUEST}"
+            )
+        sock.sendall(b"%04x" % len(encoded) + encoded)
+        status = _recv_exact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbProtocolError(self._read_length_prefixed(sock))
+        raise AdbProtocolError(f"unexpected response {status!r} to {request!r}")
+
+    @staticmethod
+    def _read_length_prefixed(sock: socket.socket) -> str:
+        length = int(_recv_exact(sock, 4), 16)
+        return _recv_exact(sock, length).decode("utf-8", "replace")
@@ -0,0 +1,178 @@
+"""Asyncio flavour of :class:`~pykeypull.extractor.Extractor`.
+
+:class:`AsyncExtractor` exposes the extraction workflow as coroutines for
+embedding in asyncio services. Every device operation goes through the same
+:class:`~pykeypull.extractor.Extractor` code and
+:class:`~pykeypull.transport.Transport` as a synchronous run, so root
+caching, ``su`` transfers, compression and the store behave identically.
+Blocking calls run on an executor while the event loop stays free, and
+several locations of one device transfer and validate at once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple, TypeVar
+
+from .extractor import Extractor
+from .plan import DIRECTORY, LocationPlan
+from .scheduler import transfer_order
+
+DEFAULT_MAX_PULLS = 4
+
+T = TypeVar("T")
+
+
+def _depth(location: str) -> int:
+    return len(location.strip("/").split("/"))
+
+
+def claim_files(
+    locations: Sequence[str],
+    plans: Dict[str, LocationPlan],
+) -> Tuple[Dict[str, LocationPlan], Dict[str, List[str]]]:
+    """Assign every planned remote file to exactly one location.
+
+    Single files claim their path first so databases and keyboxes keep their
+    own handling, then directories claim theirs from the outermost down, so
+    a nested directory never races its parent for the same destination.
+    Returns the reduced plans of the locations that still have files to
+    fetch and, for each location left with nothing, the locations that
+    fetch its files instead. Locations without a plan are in neither.
+    """
+
+    planned = [location for location in locations if location in plans]
+    singles = [location for location in planned if plans[location].kind != DIRECTORY]
+    directories = sorted(
+        (location for location in planned if plans[location].kind == DIRECTORY), key=_depth
+    )
+
+    owners: Dict[str, str] = {}
+    reduced: Dict[str, LocationPlan] = {}
+    covered: Dict[str, List[str]] = {}
+    for location in singles + directories:
+        plan = plans[location]
+        fresh = [entry for entry in plan.files if entry.path not in owners]
+        if plan.files and not fresh:
+            covered[location] = sorted({owners[entry.path] for entry in plan.files})
+            continue
+        for entry in fresh:
+            owners[entry.path] = location
+        reduced[location] = LocationPlan(plan.location, plan.kind, fresh)
+    return reduced, covered
+
+
+class AsyncExtractor:
+    """Non-blocking extractor for a single device.
+
+    Keyword ``options`` are forwarded to :class:`Extractor`, so the
+    scheduler, prefilter, incremental manifest, resumable transfers, sink
+    and profiles behave as in a synchronous run. Up to ``max_pulls``
+    locations are extracted at once, each by a :meth:`Extractor.spawn` of
+    the same run. Blocking work runs on ``executor`` (the loop's default
+    executor when ``None``) with one thread per location in flight, so
+    keybox validation of one location overlaps with transfers of the
+    others. Files that several locations expand to are fetched only once.
+    """
+
+    def __init__(
+        self,
+        output: str = "output",
+        adb_path: str = "adb",
+        *,
+        max_pulls: int = DEFAULT_MAX_PULLS,
+        executor: Executor | None = None,
+        **options: Any,
+    ) -> None:
+        self.extractor = Extractor(output, adb_path, **options)
+        self.max_pulls = max(1, max_pulls)
+        self.executor = executor
+
+    @property
+    def device(self) -> str | None:
+        """Serial of the device being extracted."""
+
+        return self.extractor.device
+
+    @property
+    def output(self) -> Path:
+        """Directory the extracted files are written to."""
+
+        return self.extractor.output
+
+    # ------------------------------------------------------------------
+    # ADB helpers
+    async def list_devices(self) -> List[str]:
+        """Start the ADB server and return the serials of all ready devices."""
+
+        return await self._run(self.extractor.list_devices)
+
+    async def adb_stat(self) -> None:
+        """Detect a connected device and ensure the ADB server is running."""
+
+        await self._run(self.extractor.adb_stat)
+
+    async def obtain_root(self) -> None:
+        """Attempt to elevate privileges, honouring the root cache.
+
+        See :meth:`Extractor.obtain_root`; the method found is used by every
+        location extracted afterwards.
+        """
+
+        await self._run(self.extractor.obtain_root)
+
+    # ------------------------------------------------------------------
+    # File operations
+    async def plan_locations(self, locations: Iterable[str]) -> Dict[str, LocationPlan]:
+        """Expand and stat every location in a single shell round-trip."""
+
+        return await self._run(self.extractor.plan_locations, list(locations))
+
+    async def extract_from_location(
+        self,
+        location: str,
+        plan: LocationPlan | None = None,
+    ) -> None:
+        """Extract data from a specific device path."""
+
+        worker = await self._run(self.extractor.spawn)
+        await self._run(worker.extract_from_location, location, plan)
+
+    async def extract_all(self, locations: Iterable[str]) -> List[str]:
+        """Extract every location concurrently, returning the successful ones."""
+
+        locations = list(locations)
+        self.extractor.ensure_output_directory()
+        plans = await self._run(self.extractor.prepare, locations)
+        reduced, covered = claim_files(locations, plans)
+        # Without a plan, overlapping locations cannot be told apart.
+        slots = asyncio.Semaphore(self.max_pulls if plans else 1)
+        # Probe the compressor and load the manifest once, before the workers share them.
+        await self._run(self.extractor.spawn)
+
+        async def attempt(location: str) -> bool:
+            async with slots:
+                return await self._run(self._try_location, location, reduced.get(location))
+
+        order = locations
+        if self.extractor.scheduler is not None:
+            order = transfer_order(locations, plans)
+        fetched = [location for location in order if location not in covered]
+        outcomes = dict(zip(fetched, await asyncio.gather(*map(attempt, fetched))))
+        for location, owners in covered.items():
+            outcomes[location] = all(outcomes.get(owner, False) for owner in owners)
+            if outcomes[location]:
+                print(f"  Success: {location} (fetched with {', '.join(owners)})")
+        succeeded = {location for location, success in outcomes.items() if success}
+        return await self._run(self.extractor.finish_run, locations, plans, succeeded)
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    async def _run(self, function: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    def _try_location(self, location: str, plan: LocationPlan | None) -> bool:
+        return self.extractor.spawn().try_location(location, plan)
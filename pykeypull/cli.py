@@ -3,10 +3,26 @@
 from __future__ import annotations
 
 import argparse
-from typing import Sequence
+import json
+import sys
+from pathlib import Path
+from dataclasses import asdict
+from typing import Any, Dict, List, Sequence
 
+from .compression import AUTO, CODECS
+from .corpus import iter_keybox_files, validate_corpus
 from .extractor import ExtractionError, Extractor
-from .locations import DEVICE_LOCATIONS
+from .fleet import DEFAULT_MAX_WORKERS, DeviceResult, extract_fleet
+from .inventory import Inventory
+from .prefilter import DEFAULT_RULES
+from .profiles import ProfileCache
+from .retry import OK, Retrier, RetryPolicy, format_outcomes
+from .rootcache import RootCache
+from .scheduler import DEFAULT_PER_HUB, TransferScheduler
+from .sinks import DIRECTORY as DIRECTORY_SINK, SINKS
+from .store import ContentStore
+from .transport import SocketTransport, SubprocessTransport, Transport, TransportError
+from .watch import DeviceWatcher
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -14,11 +30,14 @@ def build_parser() -> argparse.ArgumentParser:
 
     parser = argparse.ArgumentParser(
         description="Extract Android keystore and keybox files over ADB",
+        epilog="Run 'python -m pykeypull validate --help' to check local keybox files and "
+        "'python -m pykeypull inventory --help' to search the keybox inventory.",
     )
     parser.add_argument(
         "locations",
         nargs="*",
-        help="Custom device paths to extract (defaults to the known KeyPull locations)",
+        help="Custom device paths to extract (defaults to the locations discovered on "
+        "each device)",
     )
     parser.add_argument(
         "--output",
@@ -30,26 +49,314 @@ def build_parser() -> argparse.ArgumentParser:
         default="adb",
         help="Path to the adb executable (default: %(default)s)",
     )
+    parser.add_argument(
+        "--transport",
+        choices=("subprocess", "socket"),
+        default="subprocess",
+        help="Run the adb executable per command or talk to the ADB server socket "
+        "directly (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Pull directories as a single tar stream instead of one pull per file",
+    )
+    parser.add_argument(
+        "--compress",
+        nargs="?",
+        const=AUTO,
+        choices=(AUTO, *CODECS),
+        metavar="CODEC",
+        help="Compress transfers on the device and decompress them as they arrive; "
+        "CODEC is one of %(choices)s (default when given without a value: auto)",
+    )
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help="Check names, sizes and leading bytes on the device and only transfer "
+        "keyboxes, SQLite databases and keystore blobs from directory locations",
+    )
+    parser.add_argument(
+        "--sink",
+        choices=tuple(SINKS),
+        default=DIRECTORY_SINK,
+        help="Keep extracted files as loose files in the output directory, or move them "
+        "into one indexed zip or tar archive per device next to it (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip files whose size, mtime and on-device hash match the previous run",
+    )
+    parser.add_argument(
+        "--resumable",
+        action="store_true",
+        help="Copy large keystore databases in checkpointed chunks that resume after "
+        "an interrupted transfer",
+    )
+    parser.add_argument(
+        "--store",
+        metavar="DIR",
+        help="Deduplicate extracted files into a content-addressed store in DIR and "
+        "hardlink them into the output directory",
+    )
+    parser.add_argument(
+        "--root-cache",
+        metavar="FILE",
+        help="Remember in FILE whether each device is rooted via adbd or su, so later "
+        "runs skip the root probing",
+    )
+    parser.add_argument(
+        "--profile-cache",
+        metavar="FILE",
+        help="Remember in FILE which locations held data per device model and build, so "
+        "later runs go straight to them",
+    )
+    parser.add_argument(
+        "--rediscover",
+        action="store_true",
+        help="Ignore learned location profiles and search every device again",
+    )
+    parser.add_argument(
+        "--inventory",
+        metavar="FILE",
+        help="Record every validated keybox in the SQLite inventory FILE for later lookups",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=RetryPolicy.attempts,
+        metavar="N",
+        help="Try ADB operations that fail transiently (offline device, timeout, dropped "
+        "connection) up to N times with exponential backoff (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--command-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Give up on a single ADB shell, pull or root command after SECONDS, "
+        "and on a streamed transfer that stalls for SECONDS",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        metavar="FILE",
+        help="Write per-device, per-location phase timings and throughput to FILE as JSON",
+    )
+    parser.add_argument(
+        "--all-devices",
+        action="store_true",
+        help="Extract from every connected device into per-serial subdirectories",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and extract from every device as soon as it is attached, "
+        "into per-serial subdirectories, until interrupted",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Maximum number of devices processed at once with --all-devices or --watch "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--hub-jobs",
+        type=int,
+        default=DEFAULT_PER_HUB,
+        help="Maximum number of devices transferring at once behind each USB hub with "
+        "--all-devices or --watch (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--hub-bandwidth",
+        type=float,
+        metavar="MIB_S",
+        help="Cap the combined transfer rate behind each USB hub at MIB_S MiB/s",
+    )
+    return parser
+
+
+def build_validate_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the ``validate`` subcommand."""
+
+    parser = argparse.ArgumentParser(
+        prog="pykeypull validate",
+        description="Validate previously pulled keybox XML files and print JSON lines",
+    )
+    parser.add_argument(
+        "path",
+        help="Keybox file or directory tree to validate",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--deep",
+        action="store_true",
+        help="Also check keybox counts, certificate chain links and key pairs",
+    )
+    return parser
+
+
+def run_validate(argv: Sequence[str]) -> int:
+    """Validate a local keybox corpus, returning non-zero if any file is invalid."""
+
+    parser = build_validate_parser()
+    args = parser.parse_args(argv)
+    root = Path(args.path)
+    if not root.exists():
+        parser.error(f"{root} does not exist")
+
+    failures = 0
+    for summary in validate_corpus(root, workers=args.jobs, deep=args.deep):
+        if summary["error"] is not None or summary.get("issues"):
+            failures += 1
+        sys.stdout.write(json.dumps(summary) + "\n")
+        sys.stdout.flush()
+    return 1 if failures else 0
+
+
+def build_inventory_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the ``inventory`` subcommand."""
+
+    parser = argparse.ArgumentParser(
+        prog="pykeypull inventory",
+        description="Update and search the keybox inventory, printing matches as JSON lines",
+    )
+    parser.add_argument(
+        "database",
+        help="Inventory file, as written by --inventory",
+    )
+    parser.add_argument(
+        "--scan",
+        metavar="PATH",
+        help="Index new or changed keybox files below PATH before searching",
+    )
+    query = parser.add_mutually_exclusive_group()
+    query.add_argument("--device-id", help="Find keys of the keybox with this DeviceID")
+    query.add_argument("--algorithm", help="Find keys using this algorithm")
+    query.add_argument(
+        "--fingerprint",
+        metavar="SHA256",
+        help="Find keys whose certificate chain contains this certificate",
+    )
     return parser
 
 
+def run_inventory(argv: Sequence[str]) -> int:
+    """Update and query a keybox inventory, returning non-zero if nothing matched."""
+
+    parser = build_inventory_parser()
+    args = parser.parse_args(argv)
+    with Inventory(Path(args.database)) as inventory:
+        if args.scan:
+            root = Path(args.scan)
+            if not root.exists():
+                parser.error(f"{root} does not exist")
+            indexed, skipped = inventory.update(iter_keybox_files(root))
+            pruned = inventory.prune()
+            print(
+                f"Indexed {indexed} file(s), {skipped} unchanged, {pruned} removed",
+                file=sys.stderr,
+            )
+
+        if args.device_id is not None:
+            entries = inventory.by_device_id(args.device_id)
+        elif args.algorithm is not None:
+            entries = inventory.by_algorithm(args.algorithm)
+        elif args.fingerprint is not None:
+            entries = inventory.by_fingerprint(args.fingerprint)
+        else:
+            return 0
+
+    for entry in entries:
+        sys.stdout.write(json.dumps(asdict(entry)) + "\n")
+    return 0 if entries else 1
+
+
+def _build_transport(args: argparse.Namespace) -> Transport:
+    """Create the device transport selected on the command line."""
+
+    if args.transport == "socket":
+        return SocketTransport(adb_path=args.adb, timeout=args.command_timeout)
+    return SubprocessTransport(args.adb, timeout=args.command_timeout)
+
+
 def run(argv: Sequence[str] | None = None) -> int:
     """Execute the extraction workflow and return the exit status."""
 
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] == "validate":
+        return run_validate(argv[1:])
+    if argv and argv[0] == "inventory":
+        return run_inventory(argv[1:])
+
     parser = build_parser()
     args = parser.parse_args(argv)
+    if args.sink != DIRECTORY_SINK and (args.incremental or args.store or args.inventory):
+        parser.error(
+            "--incremental, --store and --inventory need loose files; use --sink directory"
+        )
 
-    extractor = Extractor(output=args.output, adb_path=args.adb)
+    extractor = Extractor(
+        output=args.output,
+        adb_path=args.adb,
+        stream_directories=args.stream,
+        transport=_build_transport(args),
+        incremental=args.incremental,
+        resumable=args.resumable,
+        compression=args.compress,
+        prefilter=DEFAULT_RULES if args.prefilter else None,
+        sink=args.sink,
+        store=ContentStore(Path(args.store)) if args.store else None,
+        root_cache=RootCache(Path(args.root_cache) if args.root_cache else None),
+        inventory=Inventory(Path(args.inventory)) if args.inventory else None,
+        profiles=ProfileCache(
+            Path(args.profile_cache) if args.profile_cache else None, args.rediscover
+        ),
+        retrier=Retrier(RetryPolicy(attempts=max(1, args.retries))),
+    )
+    if args.all_devices or args.watch:
+        extractor.scheduler = TransferScheduler(
+            extractor.transport,
+            args.hub_jobs,
+            args.hub_bandwidth * 1024 * 1024 if args.hub_bandwidth else None,
+        )
+    locations = list(args.locations) or None
 
     print("Instantiating extraction process...")
+    if args.watch:
+        status = _run_watch(parser, args, extractor, locations)
+    elif args.all_devices:
+        status = _run_fleet(parser, args, extractor, locations)
+    else:
+        status = _run_single(parser, extractor, locations)
+
+    if args.metrics_json:
+        extractor.metrics.write_json(Path(args.metrics_json))
+        print(f"Metrics written to: {args.metrics_json}")
+    return status
+
+
+def _run_single(
+    parser: argparse.ArgumentParser,
+    extractor: Extractor,
+    locations: List[str] | None,
+) -> int:
+    """Extract from the first connected device."""
+
     try:
         extractor.adb_stat()
         extractor.obtain_root()
         extractor.ensure_output_directory()
+        if locations is None:
+            locations = extractor.discover_locations()
     except ExtractionError as exc:
         parser.error(str(exc))
 
-    locations = list(args.locations) if args.locations else list(DEVICE_LOCATIONS)
     successes = extractor.extract_all(locations)
 
     if not successes:
@@ -59,10 +366,107 @@ def run(argv: Sequence[str] | None = None) -> int:
     print(f"Extracted keybox data from {len(successes)} location(s):")
     for location in successes:
         print(f"  - {location}")
-    print(f"\nExtraction saved to: {extractor.output}")
+    print(f"\nExtraction saved to: {extractor.sink.path}")
     return 0
 
 
+def _run_fleet(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    extractor: Extractor,
+    locations: List[str] | None,
+) -> int:
+    """Extract from every connected device and print a per-device summary."""
+
+    try:
+        serials = extractor.list_devices()
+    except ExtractionError as exc:
+        parser.error(str(exc))
+
+    print(f"Extracting from {len(serials)} device(s) with up to {args.jobs} at once")
+    results = extract_fleet(
+        serials,
+        locations,
+        transport=extractor.transport,
+        max_workers=args.jobs,
+        **_device_options(args, extractor),
+    )
+
+    print("\nFleet summary:")
+    for result in results:
+        _print_result(result)
+    return 0 if all(result.ok for result in results) else 1
+
+
+def _run_watch(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    extractor: Extractor,
+    locations: List[str] | None,
+) -> int:
+    """Extract from devices as they are attached until interrupted."""
+
+    try:
+        extractor.transport.start_server()
+    except (FileNotFoundError, TransportError) as exc:
+        parser.error(f"failed to start ADB server: {exc}")
+
+    print(
+        f"Watching for devices with up to {args.jobs} extraction(s) at once; "
+        "press Ctrl+C to stop"
+    )
+    watcher = DeviceWatcher(
+        extractor.transport,
+        locations,
+        max_workers=args.jobs,
+        on_result=_print_result,
+        **_device_options(args, extractor),
+    )
+    try:
+        results = watcher.run()
+    except ExtractionError as exc:
+        print(f"Stopped watching: {exc}")
+        results, failed = watcher.results, True
+    else:
+        failed = False
+    succeeded = sum(result.ok for result in results)
+    print(f"\nExtracted from {succeeded} of {len(results)} device(s)")
+    return 1 if failed or not all(result.ok for result in results) else 0
+
+
+def _device_options(args: argparse.Namespace, extractor: Extractor) -> Dict[str, Any]:
+    """Return the per-device options, sharing the extractor's warm state."""
+
+    return {
+        "output": args.output,
+        "adb_path": args.adb,
+        "stream_directories": args.stream,
+        "incremental": args.incremental,
+        "resumable": args.resumable,
+        "compression": args.compress,
+        "prefilter": extractor.prefilter,
+        "sink": args.sink,
+        "scheduler": extractor.scheduler,
+        "retrier": extractor.retrier,
+        "store": extractor.store,
+        "root_cache": extractor.root_cache,
+        "profiles": extractor.profiles,
+        "inventory": extractor.inventory,
+        "metrics": extractor.metrics,
+    }
+
+
+def _print_result(result: DeviceResult) -> None:
+    if result.error is not None:
+        print(f"  {result.serial}: failed ({result.error})")
+    elif not result.successes:
+        print(f"  {result.serial}: keybox extraction failed")
+    else:
+        print(f"  {result.serial}: {len(result.successes)} location(s) -> {result.output}")
+    if set(result.attempts) - {OK}:
+        print(f"    {format_outcomes(result.attempts)}")
+
+
 def main() -> None:
     """Entrypoint used by ``python -m`` and console scripts."""
 
@@ -0,0 +1,95 @@
+"""On-device compression of transfer streams.
+
+The device compresses with whichever supported tool it has and the host
+decompresses incrementally while unpacking, so only compressed bytes cross
+the USB or Wi-Fi link.
+"""
+
+from __future__ import annotations
+
+import bz2
+import gzip
+import lzma
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Dict, Iterable
+
+AUTO = "auto"
+
+# Raised by the decoders when a compressed stream is truncated or corrupt.
+DECODE_ERRORS = (EOFError, OSError, lzma.LZMAError)
+
+
+@dataclass(frozen=True)
+class Codec:
+    """A compressor available on the device and its host-side decoder.
+
+    ``command`` compresses stdin, or the files named after it, to stdout;
+    ``tar_mode`` is the :mod:`tarfile` stream mode for a compressed archive.
+    """
+
+    name: str
+    command: str
+    tar_mode: str
+    decoder: Callable[[BinaryIO], BinaryIO]
+
+    def decompress(self, stream: BinaryIO) -> BinaryIO:
+        """Wrap ``stream`` so that reads return decompressed data."""
+
+        return self.decoder(stream)
+
+
+CODECS: Dict[str, Codec] = {
+    codec.name: codec
+    for codec in (
+        Codec("gzip", "gzip -c", "r|gz", lambda stream: gzip.GzipFile(fileobj=stream)),
+        Codec("xz", "xz -c", "r|xz", lzma.LZMAFile),
+        Codec("bzip2", "bzip2 -c", "r|bz2", bz2.BZ2File),
+    )
+}
+
+# Preferred first: gzip is in toybox and cheap on phone CPUs.
+PREFERENCE = ("gzip", "xz", "bzip2")
+
+
+def probe_command() -> str:
+    """Return a shell command listing the supported compressors on the device."""
+
+    return (
+        f"for c in {' '.join(PREFERENCE)}; do "
+        'command -v "$c" >/dev/null 2>&1 && echo "$c"; done'
+    )
+
+
+def pick_codec(available: Iterable[str], requested: str = AUTO) -> Codec | None:
+    """Return the codec to use given the compressors the device reported.
+
+    ``requested`` is either :data:`AUTO` or a codec name; ``None`` is
+    returned when the device has no suitable compressor.
+    """
+
+    available = set(available)
+    candidates = PREFERENCE if requested == AUTO else (requested,)
+    for name in candidates:
+        if name in available:
+            return CODECS[name]
+    return None
+
+
+class CountingReader:
+    """File-like wrapper counting the bytes read from ``stream``."""
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self.stream = stream
+        self.count = 0
+
+    def read(self, size: int = -1) -> bytes:
+        """Read from the wrapped stream and count the result."""
+
+        data = self.stream.read(size)
+        self.count += len(data)
+        return data
+
+    def readable(self) -> bool:
+        """Report the wrapper as readable for the decompressor classes."""
+
+        return True
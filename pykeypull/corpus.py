@@ -0,0 +1,102 @@
+"""Bulk validation of keybox files stored on the local filesystem."""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from .keybox import Keybox, KeyboxValidationError, iter_document
+from .verify import Verifier
+
+# Files handed to each worker per round-trip; amortises pickling overhead.
+_CHUNK_SIZE = 32
+
+# One verifier per worker process so its certificate cache spans every file
+# that worker handles.
+_VERIFIER: Verifier | None = None
+
+
+def _verifier() -> Verifier:
+    global _VERIFIER  # pylint: disable=global-statement
+    if _VERIFIER is None:
+        _VERIFIER = Verifier()
+    return _VERIFIER
+
+
+def iter_keybox_files(root: Path) -> Iterator[Path]:
+    """Yield every ``.xml`` file below ``root`` in a stable order."""
+
+    if root.is_file():
+        yield root
+        return
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".xml"):
+                yield Path(directory) / filename
+
+
+def summarize_file(path: Path, deep: bool = False) -> Dict[str, Any]:
+    """Parse one keybox file and return a JSON-serialisable summary.
+
+    With ``deep`` the keyboxes are also checked by :class:`Verifier` and any
+    problems are listed under ``issues``.
+    """
+
+    device_ids: List[str] = []
+    algorithms: List[str] = []
+    issues: List[str] = []
+    error: str | None = None
+    declared = 0
+    try:
+        for item in iter_document(path):
+            if not isinstance(item, Keybox):
+                declared = item
+                continue
+            keybox = item
+            device_ids.append(keybox.device_id)
+            for key in keybox.keys:
+                if key.algorithm and key.algorithm not in algorithms:
+                    algorithms.append(key.algorithm)
+            if deep:
+                result = _verifier().verify_keybox(keybox)
+                issues.extend(f"{keybox.device_id}: {issue}" for issue in result.issues)
+    except KeyboxValidationError as exc:
+        error = str(exc)
+    if deep and error is None and declared != len(device_ids):
+        issues.insert(
+            0, f"NumberOfKeyboxes declares {declared} keybox(es) but {len(device_ids)} found"
+        )
+    summary: Dict[str, Any] = {
+        "path": str(path),
+        "keyboxes": len(device_ids),
+        "device_ids": device_ids,
+        "algorithms": algorithms,
+        "error": error,
+    }
+    if deep:
+        summary["issues"] = issues
+    return summary
+
+
+def validate_corpus(
+    root: Path,
+    workers: int | None = None,
+    deep: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Validate every keybox file below ``root`` across a process pool.
+
+    Summaries are yielded in file order as soon as they are available.
+    ``workers`` defaults to the number of CPUs.
+    """
+
+    files = iter_keybox_files(root)
+    summarize = partial(summarize_file, deep=deep)
+    if workers == 1:
+        yield from map(summarize, files)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(summarize, files, chunksize=_CHUNK_SIZE)
@@ -1,104 +1,315 @@
 """Core extraction logic for the Python port of KeyPull."""
 
+# pylint: disable=too-many-lines
+
 from __future__ import annotations
 
-import subprocess
+import copy
+import hashlib
+import posixpath
+import shlex
+import shutil
+import tarfile
+import threading
 import time
 from pathlib import Path
-from typing import Iterable, List
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Sequence, Set, Tuple
 
+from .compression import DECODE_ERRORS, Codec, CountingReader, pick_codec, probe_command
+from .inventory import Inventory
+from .keystoredb import (
+    INDEX_SUFFIX,
+    SHM_SUFFIX,
+    WAL_SUFFIX,
+    KeyIndex,
+    KeystoreIndexError,
+    consolidate,
+)
 from .keybox import KeyboxValidationError, validate as validate_keybox
+from .locations import DEVICE_LOCATIONS, IDENTITY_COMMAND, merge_found, search_command
+from .manifest import (
+    Manifest,
+    RemoteFileState,
+    TransferStats,
+    parse_state_output,
+    state_commands,
+)
+from .metrics import (
+    DISCOVER,
+    EXTRACT,
+    LIST,
+    LOCATE,
+    PLAN,
+    ROOT,
+    TRANSFER,
+    VALIDATE,
+    Measurement,
+    Metrics,
+)
+from .plan import DIRECTORY, MISSING, LocationPlan, PlanEntry, parse_plan_output, plan_command
+from .prefilter import Rule, filter_command, parse_filter_output
+from .profiles import ProfileCache
+from .resume import (
+    RESUME_THRESHOLD,
+    Checkpoint,
+    chunk_ranges,
+    digest_command,
+    discard,
+    partial_path,
+    prefix_digest,
+    ranged_read_command,
+)
+from .retry import OK, Retrier, format_outcomes
+from .rootcache import ROOT_ADBD, ROOT_SU, RootCache
+from .scheduler import TransferScheduler, smallest_first, transfer_order
+from .sinks import DIRECTORY as DIRECTORY_SINK, SINKS, Sink
+from .store import ContentStore
+from .transport import SocketTransport, SubprocessTransport, Transport, TransportError
+
+
+# Upper bound on how long to wait for adbd to come back after ``adb root``.
+ROOT_WAIT_TIMEOUT = 10.0
+
+# Longest member list handed to one device-side ``tar``, in bytes; shells and
+# ``su -c`` reject command lines long before a keystore tree runs out of files.
+TAR_MEMBERS_LIMIT = 32 * 1024
+
+ROOT_UNAVAILABLE = (
+    "root access required but not available. Enable Developer Options "
+    "root access or root the device."
+)
 
 
 class ExtractionError(RuntimeError):
     """Raised when a high-level extraction step fails."""
 
 
-class Extractor:
+class _StreamUnavailable(ExtractionError):
+    """Raised when the device cannot produce a tar stream for a directory."""
+
+
+def _flatten_remote_path(remote_file: str) -> str:
+    """Return the flat local file name used for a remote path."""
+
+    return remote_file.strip("/").replace("/", "_")
+
+
+def _is_journal_of(remote_file: str, databases: Set[str]) -> bool:
+    """Return whether ``remote_file`` is the WAL or shared memory of one of ``databases``."""
+
+    database, suffix = remote_file[:-4], remote_file[-4:]
+    return suffix in (WAL_SUFFIX, SHM_SUFFIX) and database in databases
+
+
+def _is_database_part(remote_file: str) -> bool:
+    """Return whether ``remote_file`` is an SQLite database or one of its journals."""
+
+    return remote_file.endswith((".sqlite", ".sqlite" + WAL_SUFFIX, ".sqlite" + SHM_SUFFIX))
+
+
+def _with_journals(files: Sequence[str]) -> List[str]:
+    """Return ``files`` plus the WAL of each database, so both travel in one stream."""
+
+    members: List[str] = []
+    for remote_file in files:
+        members.append(remote_file)
+        if remote_file.endswith(".sqlite"):
+            members.append(remote_file + WAL_SUFFIX)
+    return members
+
+
+def _member_batches(members: Sequence[str]) -> List[List[str]]:
+    """Split tar ``members`` into lists of at most :data:`TAR_MEMBERS_LIMIT` bytes.
+
+    A database's WAL stays in the batch of its database, so both still
+    travel in one stream.
+    """
+
+    batches: List[List[str]] = [[]]
+    size = 0
+    for member in members:
+        length = len(shlex.quote(member)) + 1
+        journal = bool(batches[-1]) and member == batches[-1][-1] + WAL_SUFFIX
+        if batches[-1] and not journal and size + length > TAR_MEMBERS_LIMIT:
+            batches.append([])
+            size = 0
+        batches[-1].append(member)
+        size += length
+    return batches
+
+
+def _local_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+class Extractor:  # pylint: disable=too-many-instance-attributes
     """Replicates the behaviour of the Go extractor in Python."""
 
-    def __init__(self, output: str = "output", adb_path: str = "adb") -> None:
+    def __init__(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        output: str = "output",
+        adb_path: str = "adb",
+        *,
+        stream_directories: bool = False,
+        device: str | None = None,
+        transport: Transport | None = None,
+        incremental: bool = False,
+        store: ContentStore | None = None,
+        root_cache: RootCache | None = None,
+        metrics: Metrics | None = None,
+        resumable: bool = False,
+        compression: str | None = None,
+        inventory: Inventory | None = None,
+        profiles: ProfileCache | None = None,
+        prefilter: Sequence[Rule] | None = None,
+        sink: str = DIRECTORY_SINK,
+        scheduler: TransferScheduler | None = None,
+        retrier: Retrier | None = None,
+    ) -> None:
         self.adb_path = adb_path
-        self.device: str | None = None
+        self.device: str | None = device
         self.output = Path.cwd() / output
+        self.stream_directories = stream_directories
+        self.transport = transport or SubprocessTransport(adb_path)
+        self.incremental = incremental
+        self.store = store
+        self.root_cache = root_cache or RootCache()
+        self.root_method: str | None = None
+        self.stats = TransferStats()
+        self.metrics = metrics or Metrics()
+        self.resumable = resumable
+        self.compression = compression
+        self.inventory = inventory
+        self.profiles = profiles or ProfileCache()
+        self.prefilter = prefilter
+        self.sink: Sink = SINKS[sink](self.output)
+        # Finished files per owning location, handed to the sink once it succeeds.
+        self._pending: Dict[str | None, Dict[str, Path]] = {}
+        self.scheduler = scheduler
+        self.retrier = retrier or Retrier()
+        self._identity: Tuple[str, str] | None = None
+        self._codec_probed = False
+        self._active_codec: Codec | None = None
+        self._manifest: Manifest | None = None
+        self._location: str | None = None
+        self._sink_lock = threading.Lock()
 
     # ------------------------------------------------------------------
     # ADB helpers
     def adb_stat(self) -> None:
         """Detect a connected device and ensure the ADB server is running."""
 
+        self.device = self.list_devices()[0]
+        print(f"Connected to device: {self.device}")
+
+    def list_devices(self) -> List[str]:
+        """Start the ADB server and return the serials of all ready devices."""
+
+        with self.metrics.measure(DISCOVER):
+            return self._discover()
+
+    def _discover(self) -> List[str]:
         try:
-            subprocess.run(
-                [self.adb_path, "start-server"],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
+            self.transport.start_server()
         except FileNotFoundError as exc:
             raise ExtractionError("ADB executable not found in PATH") from exc
-        except subprocess.CalledProcessError as exc:
-            error = exc.stderr.decode().strip()
-            raise ExtractionError(f"failed to start ADB server: {error}") from exc
+        except TransportError as exc:
+            raise ExtractionError(f"failed to start ADB server: {exc}") from exc
 
         try:
-            result = subprocess.run(
-                [self.adb_path, "devices"],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-        except subprocess.CalledProcessError as exc:
-            error = exc.stderr.strip()
-            raise ExtractionError(f"failed to fetch connected devices: {error}") from exc
-
-        connected: List[str] = []
-        for line in result.stdout.splitlines():
-            line = line.strip()
-            if not line or line.startswith("List of devices"):
-                continue
-            parts = line.split()
-            if len(parts) >= 2 and parts[1] == "device":
-                connected.append(parts[0])
+            devices = self.transport.devices()
+        except TransportError as exc:
+            raise ExtractionError(f"failed to fetch connected devices: {exc}") from exc
 
+        connected = [serial for serial, state in devices if state == "device"]
         if not connected:
             raise ExtractionError("could not find any connected devices via ADB")
 
-        self.device = connected[0]
-        print(f"Connected to device: {self.device}")
+        return connected
 
     def obtain_root(self) -> None:
-        """Attempt to elevate privileges on the connected device."""
+        """Attempt to elevate privileges on the connected device.
+
+        The privilege path that worked (adbd root or ``su``) is stored in
+        :attr:`root_method` and in :attr:`root_cache`, so later runs against
+        the same serial skip the probing. A cached path is checked with one
+        cheap command first and forgotten if it no longer grants root, for
+        example after a reboot.
+        """
 
         self._ensure_device()
+        with self._measure(ROOT):
+            self._elevate()
 
-        try:
-            subprocess.run(
-                [self.adb_path, "-s", self.device, "root"],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-        except subprocess.CalledProcessError as exc:
-            print(f"ADB root failed: {exc.stderr.decode().strip()}")
-            print("Attempting via SU")
-            try:
-                subprocess.run(
-                    [self.adb_path, "-s", self.device, "shell", "su", "-c", "id"],
-                    check=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                )
-            except subprocess.CalledProcessError:
-                raise ExtractionError(
-                    "root access required but not available. Enable Developer Options "
-                    "root access or root the device."
-                ) from None
-            print("Obtained root via SU")
+    def _elevate(self) -> None:
+        cached = self.root_cache.get(self.device)
+        if cached is not None:
+            if self._still_root(cached):
+                self.root_method = cached
+                print(f"Using cached root method for {self.device}: {cached}")
+                return
+            print(f"Cached root method {cached} no longer works for {self.device}; probing again")
+            self.root_cache.forget(self.device)
+
+        if self._current_uid() == "0":
+            print("ADB is already running as root")
+            self._remember_root(ROOT_ADBD)
             return
 
-        print("Obtained root via ADB")
-        time.sleep(2)
+        try:
+            self.transport.root(self.device)
+        except TransportError as exc:
+            print(f"ADB root failed: {exc}")
+        else:
+            if self._wait_for_root():
+                print("Obtained root via ADB")
+                self._remember_root(ROOT_ADBD)
+                return
+            print("ADB root failed: adbd did not restart as root")
+
+        print("Attempting via SU")
+        try:
+            self.transport.shell(self.device, ["su", "-c", "id"])
+        except TransportError:
+            raise ExtractionError(ROOT_UNAVAILABLE) from None
+        print("Obtained root via SU")
+        self._remember_root(ROOT_SU)
+
+    def _still_root(self, method: str) -> bool:
+        if method == ROOT_ADBD:
+            return self._current_uid() == "0"
+        try:
+            self.transport.shell(self.device, ["su", "-c", "id"])
+        except TransportError:
+            return False
+        return True
+
+    def _current_uid(self) -> str:
+        try:
+            return self.transport.shell(self.device, ["id", "-u"]).strip()
+        except TransportError:
+            return ""
+
+    def _wait_for_root(self) -> bool:
+        """Poll with backoff until adbd is back as root, returning whether it is."""
+
+        delay = 0.1
+        deadline = time.monotonic() + ROOT_WAIT_TIMEOUT
+        while True:
+            if self._current_uid() == "0":
+                return True
+            if time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def _remember_root(self, method: str) -> None:
+        self.root_method = method
+        self.root_cache.set(self.device, method)
 
     # ------------------------------------------------------------------
     # File operations
@@ -107,15 +318,84 @@ class Extractor:
 
         self.output.mkdir(parents=True, exist_ok=True)
 
-    def extract_from_location(self, location: str) -> None:
-        """Extract data from a specific device path."""
+    def discover_locations(self, candidates: Sequence[str] = DEVICE_LOCATIONS) -> List[str]:
+        """Return the locations worth extracting from the device.
+
+        A device whose build fingerprint or model is in :attr:`profiles` goes
+        straight to the locations that held data last time. Otherwise
+        ``candidates`` are extended with the files a single bounded ``find``
+        turns up, and :meth:`extract_all` records which were productive.
+        """
+
+        self._ensure_device()
+        with self._measure(LOCATE) as measurement:
+            model, fingerprint = self._identity = self._device_identity()
+            known = self.profiles.lookup(model, fingerprint)
+            if known is not None:
+                print(f"Using {len(known)} location(s) learned for {model or self.device}")
+                measurement.files = len(known)
+                return known
+
+            try:
+                output = self._shell([search_command()])
+            except TransportError as exc:
+                print(f"Location search failed, using the known locations: {exc}")
+                output = ""
+            found = [line.strip() for line in output.splitlines() if line.strip()]
+            locations = merge_found(candidates, found)
+            measurement.files = len(locations)
+        if len(locations) > len(candidates):
+            print(f"Found {len(locations) - len(candidates)} additional location(s)")
+        return locations
+
+    def _device_identity(self) -> Tuple[str, str]:
+        """Return the device model and build fingerprint (empty when unknown)."""
+
+        try:
+            output = self._shell([IDENTITY_COMMAND])
+        except TransportError:
+            return "", ""
+        lines = [line.strip() for line in output.splitlines()] + ["", ""]
+        return lines[0], lines[1]
+
+    def plan_locations(self, locations: Iterable[str]) -> Dict[str, LocationPlan]:
+        """Expand and stat every location in a single shell round-trip."""
+
+        self._ensure_device()
+        locations = list(locations)
+        if not locations:
+            return {}
+        with self._measure(PLAN) as measurement:
+            try:
+                output = self._shell([plan_command(locations)])
+            except TransportError as exc:
+                raise ExtractionError(f"failed to plan extraction: {exc}") from exc
+            plans = parse_plan_output(output)
+            measurement.files = sum(len(plan.files) for plan in plans.values())
+        return plans
+
+    def extract_from_location(self, location: str, plan: LocationPlan | None = None) -> None:
+        """Extract data from a specific device path.
+
+        When a ``plan`` from :meth:`plan_locations` is supplied, missing paths
+        are skipped without touching the device and directories reuse the
+        planned file list instead of listing the directory again.
+        """
+
+        if plan is not None and plan.kind == MISSING:
+            raise ExtractionError(f"{location} does not exist on the device")
 
+        entry = plan.files[0] if plan is not None and plan.files else None
         if location.endswith(".xml"):
-            self._pull_keybox(location)
+            self._pull_keybox(location, entry)
         elif location.endswith(".sqlite"):
-            self._pull_keystore(location)
+            self._pull_keystore(location, entry)
         else:
-            self._pull_directory(location)
+            files = None
+            if plan is not None:
+                entries = plan.files if self.scheduler is None else smallest_first(plan.files)
+                files = [entry.path for entry in entries]
+            self._pull_directory(location, files)
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -125,86 +405,912 @@ class Extractor:
         if not self.device:
             raise ExtractionError("ADB device not initialised; call adb_stat() first")
 
+    def _measure(self, phase: str) -> AbstractContextManager[Measurement]:
+        """Time ``phase`` for this device and the location being extracted."""
+
+        return self.metrics.measure(phase, self.device, self._location)
+
+    def _transfer_slot(self) -> AbstractContextManager[None]:
+        """Hold a transfer slot on this device's hub while :attr:`scheduler` is set.
+
+        Only the pull or stream itself holds the slot; validation and key
+        indexing afterwards leave it free for other devices on the hub.
+        """
+
+        if self.scheduler is None or self.device is None:
+            return nullcontext()
+        return self.scheduler.slot(self.device)
+
+    @property
+    def _via_su(self) -> bool:
+        return self.root_method == ROOT_SU
+
+    def _privileged(self, command: str) -> str:
+        """Wrap ``command`` in ``su -c`` when root was obtained through su."""
+
+        if self._via_su:
+            return f"su -c {shlex.quote(command)}"
+        return command
+
+    def _shell(self, args: Sequence[str]) -> str:
+        if self._via_su:
+            args = ["su", "-c", shlex.quote(" ".join(args))]
+        return self.retrier.call(self.device, lambda: self.transport.shell(self.device, args))
+
+    def _exec_out(self, command: str) -> AbstractContextManager[BinaryIO]:
+        return self.transport.exec_out(self.device, self._privileged(command))
+
+    def _codec(self) -> Codec | None:
+        """Return the compression codec for this device, probing it once."""
+
+        if self.compression is None:
+            return None
+        if not self._codec_probed:
+            self._codec_probed = True
+            try:
+                available = self._shell([probe_command()]).split()
+            except TransportError:
+                available = []
+            self._active_codec = pick_codec(available, self.compression)
+            if self._active_codec is None:
+                print(f"No {self.compression} compressor on the device; transferring raw")
+            else:
+                print(f"Compressing transfers with {self._active_codec.name}")
+        return self._active_codec
+
+    def _report_compression(self, codec: Codec, wire: int, payload: int) -> None:
+        self.stats.record_compression(wire, payload)
+        ratio = payload / wire if wire else 1.0
+        print(f"  {codec.name}: {payload} bytes in {wire} on the wire ({ratio:.1f}x)")
+
     def _adb_pull(self, remote: str, local: Path) -> None:
-        """Pull a file from the device to the local filesystem."""
+        """Pull a file from the device to the local filesystem.
+
+        ``adb pull`` runs as the shell user and cannot compress, so when root
+        came from ``su`` or compression is enabled the file is streamed
+        through ``exec-out`` instead.
+        """
 
         self._ensure_device()
 
+        with self._transfer_slot(), self._measure(TRANSFER) as measurement:
+            if self._via_su or self._codec() is not None:
+                self._exec_read(remote, local)
+            else:
+                self._transport_pull(remote, local)
+            measurement.bytes = _local_size(local)
+            measurement.files = 1
+
+    def _transport_pull(self, remote: str, local: Path) -> None:
         local.parent.mkdir(parents=True, exist_ok=True)
+        # Never write through an existing file: it may be a hardlink into the store.
+        local.unlink(missing_ok=True)
+        store = self.store
+        # A socket pull can be deduplicated while it streams instead of re-read afterwards.
+        streamed = store is not None and isinstance(self.transport, SocketTransport)
+
+        def pull() -> None:
+            if streamed:
+                with store.writer(local) as handle:
+                    self.transport.pull_stream(self.device, remote, handle)
+            else:
+                self.transport.pull(self.device, remote, local)
+
         try:
-            subprocess.run(
-                [self.adb_path, "-s", self.device, "pull", remote, str(local)],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-        except subprocess.CalledProcessError as exc:
-            error = exc.stderr.decode().strip()
-            raise ExtractionError(f"ADB pull failed for {remote}: {error}") from exc
+            self.retrier.call(self.device, pull)
+        except TransportError as exc:
+            raise ExtractionError(f"ADB pull failed for {remote}: {exc}") from exc
+        if store is not None and not streamed and local.exists():
+            store.adopt(local)
+
+    def _exec_read(self, remote: str, local: Path) -> None:
+        codec = self._codec()
+        reader = codec.command if codec is not None else "cat"
+
+        def read() -> CountingReader:
+            with self._exec_out(f"{reader} {shlex.quote(remote)} 2>/dev/null") as stream:
+                wire = CountingReader(stream)
+                self._write_stream(codec.decompress(wire) if codec else stream, local)
+            return wire
 
-    def _pull_keybox(self, remote: str) -> None:
+        try:
+            wire = self.retrier.call(self.device, read)
+        except TransportError as exc:
+            raise ExtractionError(f"read failed for {remote}: {exc}") from exc
+        except DECODE_ERRORS as exc:
+            local.unlink(missing_ok=True)
+            raise ExtractionError(f"corrupt {reader} stream for {remote}: {exc}") from exc
+        # exec-out carries no exit status, so ask the device whether empty is right.
+        if _local_size(local) == 0 and not self._is_empty_file(remote):
+            local.unlink(missing_ok=True)
+            raise ExtractionError(f"read returned no data for {remote}")
+        if codec is not None:
+            self._report_compression(codec, wire.count, _local_size(local))
+
+    def _is_empty_file(self, remote: str) -> bool:
+        """Return whether ``remote`` is a readable, empty file on the device."""
+
+        quoted = shlex.quote(remote)
+        try:
+            self._shell([f"test -r {quoted} && test ! -s {quoted}"])
+        except TransportError:
+            return False
+        return True
+
+    def _write_stream(self, source: BinaryIO, destination: Path) -> None:
+        """Write a streamed file, deduplicating it through the store if enabled."""
+
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        if self.store is not None:
+            self.store.write_stream(source, destination)
+            return
+        destination.unlink(missing_ok=True)
+        with destination.open("wb") as handle:
+            shutil.copyfileobj(source, handle)
+
+    def _pull_keybox(self, remote: str, entry: PlanEntry | None = None) -> None:
         destination = self.output / Path(remote).name
-        self._adb_pull(remote, destination)
+        if not self._pull_file(remote, destination, entry):
+            print(f"Keybox unchanged: {destination}")
+            return
         print(f"Keybox extracted: {destination}")
         try:
-            validate_keybox(destination)
+            self._validate(destination)
         except KeyboxValidationError as exc:
             raise ExtractionError(f"downloaded keybox failed validation: {exc}") from exc
 
-    def _pull_keystore(self, remote: str) -> None:
+    def _pull_keystore(self, remote: str, entry: PlanEntry | None = None) -> None:
         destination = self.output / Path(remote).name
-        self._adb_pull(remote, destination)
+        if not self._pull_file(remote, destination, entry):
+            print(f"Keystore unchanged: {destination}")
+            return
         print(f"Keystore extracted: {destination}")
+        self._index_keys(remote, destination)
 
-    def _pull_directory(self, remote_dir: str) -> None:
-        self._ensure_device()
+    def _index_keys(self, remote: str, destination: Path, location: str | None = None) -> None:
+        """Build the key index sidecar of a database snapshot."""
 
+        index = KeyIndex(destination)
         try:
-            result = subprocess.run(
-                [self.adb_path, "-s", self.device, "shell", "find", remote_dir, "-type", "f"],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-        except subprocess.CalledProcessError as exc:
-            raise ExtractionError(
-                f"failed to list directory contents for {remote_dir}: {exc.stderr.strip()}"
-            ) from exc
+            count = index.build()
+        except KeystoreIndexError as exc:
+            print(f"  Key index skipped for {destination.name}: {exc}")
+        else:
+            print(f"  Indexed {count} key(s) of {destination.name}")
+            owner = location if location is not None else self._location
+            self._pending.setdefault(owner, {})[remote + INDEX_SUFFIX] = index.path
+
+    def _pull_file(self, remote: str, destination: Path, entry: PlanEntry | None = None) -> bool:
+        """Pull a single file unless it is unchanged, returning whether it was pulled.
 
-        files = [line.strip() for line in result.stdout.splitlines() if line.strip()]
+        SQLite databases are fetched as a consistent snapshot together with
+        their WAL. With :attr:`resumable` set, files of at least
+        :data:`~pykeypull.resume.RESUME_THRESHOLD` bytes are copied in
+        checkpointed chunks.
+        """
+
+        database = remote.endswith(".sqlite")
+        states = self._probe_states([remote, remote + WAL_SUFFIX] if database else [remote])
+        if self._is_unchanged(remote, destination, states):
+            return False
+        if database:
+            self._snapshot_database(remote, destination, entry)
+        elif self.resumable and entry is not None and entry.size >= RESUME_THRESHOLD:
+            self._resumable_pull(remote, destination, entry)
+        else:
+            self._adb_pull(remote, destination)
+        self._record_with_journal(remote, destination, states)
+        return True
+
+    # ------------------------------------------------------------------
+    # SQLite snapshots
+    def _snapshot_database(self, remote: str, local: Path, entry: PlanEntry | None) -> None:
+        """Copy an SQLite database with its WAL and fold the WAL in locally.
+
+        Both files travel in one tar stream so keystore2 has as little time
+        as possible to checkpoint between them; the merged copy is then
+        integrity-checked. A resumable chunked copy cannot share a stream
+        with its WAL, so on that path the snapshot is only best-effort.
+        """
+
+        wal_local = local.with_name(local.name + WAL_SUFFIX)
+        wal_local.unlink(missing_ok=True)
+        directory, name = posixpath.split(remote)
+        # SQLite must rewrite the copy, which the store's shared read-only blobs forbid.
+        store, self.store = self.store, None
+        try:
+            if self.resumable and entry is not None and entry.size >= RESUME_THRESHOLD:
+                self._resumable_pull(remote, local, entry)
+                print(f"  {name} was copied in chunks; its WAL follows separately (best-effort)")
+                self._pull_optional(remote + WAL_SUFFIX, wal_local)
+            else:
+                try:
+                    self._stream_tar(
+                        directory,
+                        [name, name + WAL_SUFFIX],
+                        {remote: local, remote + WAL_SUFFIX: wal_local},
+                    )
+                except _StreamUnavailable:
+                    self._adb_pull(remote, local)
+                    self._pull_optional(remote + WAL_SUFFIX, wal_local)
+        finally:
+            self.store = store
+        if not local.exists():
+            raise ExtractionError(f"no data received for {remote}")
+
+        if not consolidate(local):
+            print(f"Warning: {local} failed the SQLite integrity check; the copy may be torn")
+        if self.store is not None:
+            self.store.adopt(local)
+
+    def _fold_streamed_databases(
+        self,
+        extracted: Dict[str, Path],
+        states: Dict[str, RemoteFileState],
+        owners: Dict[str, str] | None = None,
+    ) -> None:
+        """Fold the WAL into every database that arrived in a tar stream and record it.
+
+        The database and its WAL came through the same tar stream, so the
+        merged copy is as consistent as a :meth:`_snapshot_database` one.
+        A journal whose database did not arrive is kept as a plain file.
+        """
+
+        owners = owners or {}
+        for remote, local in extracted.items():
+            if not _is_database_part(remote) or not local.exists():
+                continue
+            location = owners.get(remote)
+            if not remote.endswith(".sqlite"):
+                if remote[:-4] not in extracted:
+                    self._record_transfer(remote, local, states.get(remote), location)
+                continue
+            if self.store is not None:
+                # SQLite rewrites the copy, so detach it from the shared store blob first.
+                private = local.with_name(local.name + ".tmp")
+                shutil.copyfile(local, private)
+                private.replace(local)
+            if not consolidate(local):
+                print(f"Warning: {local} failed the SQLite integrity check; the copy may be torn")
+            if self.store is not None:
+                self.store.adopt(local)
+            self._record_with_journal(remote, local, states, location)
+            self._index_keys(remote, local, location)
+
+    def _pull_optional(self, remote: str, local: Path) -> None:
+        try:
+            self._adb_pull(remote, local)
+        except ExtractionError:
+            local.unlink(missing_ok=True)
+
+    # ------------------------------------------------------------------
+    # Resumable transfers
+    def _resumable_pull(self, remote: str, local: Path, entry: PlanEntry) -> None:
+        """Copy ``remote`` in checkpointed chunks, resuming an earlier partial copy."""
+
+        local.parent.mkdir(parents=True, exist_ok=True)
+        partial = partial_path(local)
+        offset, digest = self._resume_offset(remote, partial, entry)
+        with self._transfer_slot(), self._measure(TRANSFER) as measurement:
+            with partial.open("r+b" if offset else "wb") as handle:
+                handle.truncate(offset)
+                handle.seek(offset)
+                for start, length in chunk_ranges(offset, entry.size):
+                    received = self._read_chunk(remote, start, length, handle, digest)
+                    measurement.bytes += received
+                    if received != length:
+                        raise ExtractionError(
+                            f"transfer of {remote} interrupted at byte {start + received}; "
+                            "run again to resume"
+                        )
+                    handle.flush()
+                    Checkpoint(
+                        remote, entry.size, entry.mtime, start + length, digest.hexdigest()
+                    ).save(partial)
+            measurement.files = 1
+
+        self._verify_remote_digest(remote, partial, digest.hexdigest())
+        local.unlink(missing_ok=True)
+        partial.replace(local)
+        Checkpoint.path_for(partial).unlink(missing_ok=True)
+        if self.store is not None:
+            self.store.adopt(local)
+
+    def _resume_offset(self, remote: str, partial: Path, entry: PlanEntry) -> Tuple[int, Any]:
+        """Return where to resume and the running hash of the bytes already copied."""
+
+        checkpoint = Checkpoint.load(partial)
+        if (
+            checkpoint is not None
+            and partial.exists()
+            and (checkpoint.remote, checkpoint.size, checkpoint.mtime)
+            == (remote, entry.size, entry.mtime)
+        ):
+            digest, read = prefix_digest(partial, checkpoint.offset)
+            if read == checkpoint.offset and digest.hexdigest() == checkpoint.digest:
+                print(f"Resuming {remote} at byte {checkpoint.offset} of {entry.size}")
+                return checkpoint.offset, digest
+        discard(partial)
+        return 0, hashlib.sha256()
+
+    def _read_chunk(
+        self,
+        remote: str,
+        start: int,
+        length: int,
+        handle: BinaryIO,
+        digest: Any,
+    ) -> int:
+        """Append up to ``length`` bytes of ``remote`` from ``start``, returning the count."""
+
+        received = 0
+        try:
+            with self._exec_out(ranged_read_command(remote, start, length)) as stream:
+                while received < length:
+                    chunk = stream.read(min(1024 * 1024, length - received))
+                    if not chunk:
+                        break
+                    handle.write(chunk)
+                    digest.update(chunk)
+                    received += len(chunk)
+        except (TransportError, OSError) as exc:
+            print(f"Chunk read failed for {remote}: {exc}")
+        return received
+
+    def _verify_remote_digest(self, remote: str, partial: Path, local_digest: str) -> None:
+        try:
+            output = self._shell([digest_command(remote)])
+        except TransportError as exc:
+            print(f"Could not hash {remote} on the device; keeping unverified copy: {exc}")
+            return
+        fields = output.split()
+        if not fields or fields[0] != local_digest:
+            discard(partial)
+            raise ExtractionError(f"{remote} changed or was corrupted in transit (sha256 mismatch)")
+
+    def _pull_directory(self, remote_dir: str, files: Sequence[str] | None = None) -> None:
+        self._ensure_device()
+
+        stream = self.stream_directories or self._via_su or self.compression is not None
+        if stream and not self.incremental and self.prefilter is None:
+            try:
+                self._stream_directory(remote_dir)
+                return
+            except _StreamUnavailable:
+                print(f"tar unavailable for {remote_dir}; falling back to per-file pulls")
+
+        if files is None and self.prefilter is not None:
+            files = sorted(self._select_files([remote_dir]))
+        elif files is None:
+            files = self._list_directory(remote_dir)
         if not files:
             raise ExtractionError(f"no files found in {remote_dir}")
 
-        for remote_file in files:
-            safe_name = remote_file.strip("/").replace("/", "_")
-            destination = self.output / safe_name
+        destinations = {
+            remote_file: self.output / _flatten_remote_path(remote_file) for remote_file in files
+        }
+        pending, states = self._changed_files(destinations)
+
+        if stream and pending:
+            try:
+                self._stream_directory(remote_dir, _with_journals(pending), states)
+                return
+            except _StreamUnavailable:
+                print(f"tar unavailable for {remote_dir}; falling back to per-file pulls")
+
+        for remote_file in pending:
             try:
-                self._adb_pull(remote_file, destination)
+                self._pull_directory_file(remote_file, destinations[remote_file], states)
             except ExtractionError as exc:
                 print(f"Failed to pull {remote_file}: {exc}")
+
+    def _pull_directory_file(
+        self,
+        remote_file: str,
+        destination: Path,
+        states: Dict[str, RemoteFileState],
+    ) -> None:
+        """Pull one file of a directory location; databases come with their WAL."""
+
+        if remote_file.endswith(".sqlite"):
+            self._snapshot_database(remote_file, destination, None)
+            self._record_with_journal(remote_file, destination, states)
+            self._index_keys(remote_file, destination)
+        else:
+            self._adb_pull(remote_file, destination)
+            self._record_transfer(remote_file, destination, states.get(remote_file))
+            self._validate_directory_file(remote_file, destination)
+
+    def _select_files(self, directories: Sequence[str]) -> Set[str]:
+        """Return the files below ``directories`` that match :attr:`prefilter`.
+
+        Names, sizes and leading bytes are checked on the device in one shell
+        pass, so files that do not match are never transferred.
+        """
+
+        with self._measure(LIST) as measurement:
+            try:
+                output = self._shell([filter_command(directories, self.prefilter)])
+            except TransportError as exc:
+                raise ExtractionError(f"failed to pre-filter directories: {exc}") from exc
+            kept, examined = parse_filter_output(output)
+            measurement.files = len(kept)
+        print(f"Pre-filter kept {len(kept)} of {examined} file(s)")
+        return set(kept)
+
+    def _prefilter_plans(self, plans: Dict[str, LocationPlan]) -> None:
+        """Drop the planned directory files that do not match :attr:`prefilter`."""
+
+        directories = [plan for plan in plans.values() if plan.kind == DIRECTORY]
+        if self.prefilter is None or not directories:
+            return
+        kept = self._select_files([plan.location for plan in directories])
+        for plan in directories:
+            plan.files = [entry for entry in plan.files if entry.path in kept]
+
+    def _list_directory(self, remote_dir: str) -> List[str]:
+        with self._measure(LIST) as measurement:
+            try:
+                listing = self._shell(["find", remote_dir, "-type", "f"])
+            except TransportError as exc:
+                raise ExtractionError(
+                    f"failed to list directory contents for {remote_dir}: {exc}"
+                ) from exc
+            files = [line.strip() for line in listing.splitlines() if line.strip()]
+            measurement.files = len(files)
+        return files
+
+    def _stream_directory(
+        self,
+        remote_dir: str,
+        files: Sequence[str] | None = None,
+        states: Dict[str, RemoteFileState] | None = None,
+    ) -> None:
+        """Pull a whole directory as a single tar stream over ``exec-out``.
+
+        When ``files`` is given only those paths are archived. Members are
+        unpacked as they arrive, so nothing is staged on either side.
+        :class:`_StreamUnavailable` is raised when the device produced no
+        archive at all (typically because it has no ``tar``).
+        """
+
+        if files is None:
+            extracted = self._stream_tar(remote_dir, ["."])
+        else:
+            members = [remote_file.lstrip("/") for remote_file in files]
+            extracted = self._stream_tar("/", members)
+
+        if not extracted:
+            raise ExtractionError(f"no files found in {remote_dir}")
+        states = states or {}
+        for remote_file, destination in extracted.items():
+            # Databases and their journals are recorded once the WAL is folded in.
+            if not _is_database_part(remote_file):
+                self._record_transfer(remote_file, destination, states.get(remote_file))
+                self._validate_directory_file(remote_file, destination)
+        self._fold_streamed_databases(extracted, states)
+
+    def _stream_tar(
+        self,
+        base: str,
+        members: Sequence[str],
+        targets: Dict[str, Path] | None = None,
+    ) -> Dict[str, Path]:
+        """Archive ``members`` of ``base`` on the device and unpack them locally.
+
+        Long member lists are split over several streams so no ``tar``
+        command line grows past :data:`TAR_MEMBERS_LIMIT`. If a later stream
+        fails, the files that already arrived are returned.
+        """
+
+        extracted: Dict[str, Path] = {}
+        for batch in _member_batches(members):
+            try:
+                extracted.update(self._stream_tar_batch(base, batch, targets))
+            except _StreamUnavailable as exc:
+                if not extracted:
+                    raise
+                print(f"Stream for {base} ended early: {exc}")
+                break
+        return extracted
+
+    def _stream_tar_batch(
+        self,
+        base: str,
+        members: Sequence[str],
+        targets: Dict[str, Path] | None,
+    ) -> Dict[str, Path]:
+        codec = self._codec()
+        quoted = " ".join(shlex.quote(member) for member in members)
+        command = f"tar -cf - -C {shlex.quote(base)} {quoted} 2>/dev/null"
+        if codec is not None:
+            command += f" | {codec.command}"
+        with self._transfer_slot(), self._measure(TRANSFER) as measurement:
+            try:
+                with self._exec_out(command) as stream:
+                    wire = CountingReader(stream)
+                    extracted = self._unpack_stream(
+                        base, wire, targets, codec.tar_mode if codec else "r|"
+                    )
+            except TransportError as exc:
+                raise _StreamUnavailable(str(exc)) from exc
+            measurement.files = len(extracted)
+            measurement.bytes = sum(_local_size(local) for local in extracted.values())
+        if codec is not None:
+            self._report_compression(codec, wire.count, measurement.bytes)
+        return extracted
+
+    @contextmanager
+    def _count_transfers(self, measurement: Measurement) -> Iterator[None]:
+        """Copy the transfer counters accumulated inside the block into ``measurement``."""
+
+        files, size = self.stats.transferred_files, self.stats.transferred_bytes
+        try:
+            yield
+        finally:
+            measurement.files = self.stats.transferred_files - files
+            measurement.bytes = self.stats.transferred_bytes - size
+
+    def _unpack_stream(
+        self,
+        base: str,
+        stream: BinaryIO,
+        targets: Dict[str, Path] | None = None,
+        mode: str = "r|",
+    ) -> Dict[str, Path]:
+        """Unpack a tar ``stream`` rooted at ``base``, mapping remote to local paths.
+
+        Members listed in ``targets`` are written to the given local path and
+        anything else uses the flattened directory layout. Recording and
+        validation are left to the caller, which runs them once the transfer
+        slot is released.
+        """
+
+        extracted: Dict[str, Path] = {}
+        targets = targets or {}
+        try:
+            with tarfile.open(fileobj=stream, mode=mode) as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    source = archive.extractfile(member)
+                    if source is None:
+                        continue
+                    remote_file = posixpath.normpath(posixpath.join(base, member.name))
+                    destination = targets.get(remote_file)
+                    if destination is None:
+                        destination = self.output / _flatten_remote_path(remote_file)
+                    self._write_stream(source, destination)
+                    extracted[remote_file] = destination
+        except tarfile.ReadError as exc:
+            if not extracted:
+                raise _StreamUnavailable(str(exc)) from exc
+            print(f"Stream for {base} ended early: {exc}")
+        return extracted
+
+    def _validate(self, path: Path) -> None:
+        with self._measure(VALIDATE) as measurement:
+            measurement.bytes = _local_size(path)
+            measurement.files = 1
+            attestation = validate_keybox(path)
+        if self.inventory is not None:
+            self.inventory.add(path, attestation, self.device)
+
+    def _validate_directory_file(self, remote_file: str, destination: Path) -> None:
+        if "keybox" in remote_file or remote_file.endswith(".xml"):
+            try:
+                self._validate(destination)
+            except KeyboxValidationError:
+                # Ignore invalid XML files pulled during directory traversal
+                pass
+
+    # ------------------------------------------------------------------
+    # Privileged bulk transfer
+    def _location_destination(self, location: str, remote_file: str) -> Path:
+        if location.endswith(".xml"):
+            return self.output / Path(remote_file).name
+        return self.output / _flatten_remote_path(remote_file)
+
+    def _stream_privileged(
+        self,
+        locations: Sequence[str],
+        plans: Dict[str, LocationPlan],
+    ) -> Dict[str, bool]:
+        """Pull every planned location through a single ``su`` tar stream.
+
+        Returns, for each location the stream covered, whether any of its
+        files were transferred (``False`` when all were unchanged). Locations
+        missing from the result go through :meth:`extract_from_location`.
+        """
+
+        targets: Dict[str, Path] = {}
+        owners: Dict[str, str] = {}
+        for location in locations:
+            plan = plans.get(location)
+            if plan is None or plan.kind == MISSING:
+                continue
+            if location.endswith(".sqlite") or (
+                self.resumable
+                and plan.total_size >= RESUME_THRESHOLD
+                and location.endswith(".xml")
+            ):
+                # Databases need a WAL-consistent snapshot and large keyboxes
+                # a resumable transfer, both handled per location.
                 continue
+            for entry in plan.files:
+                targets[entry.path] = self._location_destination(location, entry.path)
+                owners[entry.path] = location
+        if not targets:
+            return {}
 
-            if "keybox" in remote_file or remote_file.endswith(".xml"):
-                try:
-                    validate_keybox(destination)
-                except KeyboxValidationError:
-                    # Ignore invalid XML files pulled during directory traversal
-                    continue
+        pending, states = self._changed_files(targets)
+        streamed = {location: False for location in owners.values()}
+        if not pending:
+            return streamed
+
+        print(f"Streaming {len(pending)} file(s) through su")
+        try:
+            extracted = self._stream_tar(
+                "/", [remote.lstrip("/") for remote in _with_journals(pending)], targets
+            )
+        except _StreamUnavailable as exc:
+            print(f"tar unavailable through su ({exc}); falling back to per-location reads")
+            return {}
+
+        for remote, local in extracted.items():
+            location = owners.get(remote)
+            if location is not None:
+                streamed[location] = True
+            if location is None or _is_database_part(remote):
+                continue
+            self._record_transfer(remote, local, states.get(remote), location)
+            if not location.endswith(".xml"):
+                self._validate_directory_file(remote, local)
+        self._fold_streamed_databases(extracted, states, owners)
+        # A location whose files did not all arrive is retried on its own.
+        for remote in set(pending) - set(extracted):
+            streamed.pop(owners[remote], None)
+        return streamed
+
+    def _finish_streamed(self, location: str, transferred: bool) -> None:
+        """Report and validate a location pulled by :meth:`_stream_privileged`."""
+
+        destination = self.output / Path(location).name
+        if location.endswith(".xml"):
+            if not transferred:
+                print(f"Keybox unchanged: {destination}")
+                return
+            print(f"Keybox extracted: {destination}")
+            try:
+                self._validate(destination)
+            except KeyboxValidationError as exc:
+                raise ExtractionError(f"downloaded keybox failed validation: {exc}") from exc
+
+    # ------------------------------------------------------------------
+    # Incremental extraction
+    def _load_manifest(self) -> Manifest:
+        if self._manifest is None:
+            self._ensure_device()
+            self._manifest = Manifest.for_device(self.output, self.device)
+        return self._manifest
+
+    def _probe_states(self, files: Sequence[str]) -> Dict[str, RemoteFileState]:
+        """Stat and hash ``files`` on the device in as few shell calls as possible."""
+
+        if not self.incremental or not files:
+            return {}
+        states: Dict[str, RemoteFileState] = {}
+        try:
+            for command in state_commands(files):
+                states.update(parse_state_output(self._shell([command])))
+        except TransportError as exc:
+            print(f"Could not read remote file state, pulling everything: {exc}")
+            return {}
+        return states
+
+    def _changed_files(
+        self,
+        destinations: Dict[str, Path],
+    ) -> Tuple[List[str], Dict[str, RemoteFileState]]:
+        """Return the files of ``destinations`` that changed, with their probed states.
+
+        A database and its WAL are one unit: the WAL is probed alongside but
+        never returned on its own, and the database is returned when either
+        of them changed.
+        """
+
+        databases = {remote for remote in destinations if remote.endswith(".sqlite")}
+        files = [remote for remote in destinations if not _is_journal_of(remote, databases)]
+        journals = [database + WAL_SUFFIX for database in sorted(databases)]
+        states = self._probe_states(files + journals)
+        pending = [
+            remote
+            for remote in files
+            if not self._is_unchanged(remote, destinations[remote], states)
+        ]
+        return pending, states
+
+    def _is_unchanged(
+        self,
+        remote: str,
+        destination: Path,
+        states: Dict[str, RemoteFileState],
+    ) -> bool:
+        """Return whether ``remote``, and a database's WAL, still match the manifest."""
+
+        wal_state = states.get(remote + WAL_SUFFIX) if remote.endswith(".sqlite") else None
+        if wal_state is not None and not self._load_manifest().is_unchanged(
+            remote + WAL_SUFFIX, wal_state, destination
+        ):
+            return False
+        return self._skip_unchanged(remote, destination, states.get(remote))
+
+    def _skip_unchanged(
+        self,
+        remote: str,
+        destination: Path,
+        state: RemoteFileState | None,
+    ) -> bool:
+        if not self.incremental or state is None:
+            return False
+        if not self._load_manifest().is_unchanged(remote, state, destination):
+            return False
+        self.stats.record_skip(state.size)
+        return True
+
+    def _record_transfer(
+        self,
+        remote: str,
+        destination: Path,
+        state: RemoteFileState | None,
+        location: str | None = None,
+    ) -> None:
+        size = _local_size(destination)
+        self.stats.record_transfer(size)
+        if self.scheduler is not None and self.device is not None:
+            self.scheduler.consume(self.device, size)
+        if self.incremental and state is not None:
+            self._load_manifest().record(remote, state, destination)
+        owner = location if location is not None else self._location
+        self._pending.setdefault(owner, {})[remote] = destination
+
+    def _record_with_journal(
+        self,
+        remote: str,
+        destination: Path,
+        states: Dict[str, RemoteFileState],
+        location: str | None = None,
+    ) -> None:
+        """Record a transfer together with the state of the WAL it was folded with."""
+
+        self._record_transfer(remote, destination, states.get(remote), location)
+        wal_state = states.get(remote + WAL_SUFFIX) if remote.endswith(".sqlite") else None
+        if self.incremental and wal_state is not None:
+            self._load_manifest().record(remote + WAL_SUFFIX, wal_state, destination)
+
+    def _flush_sink(self, location: str | None) -> None:
+        """Hand the files of ``location``, which has been validated, to :attr:`sink`."""
+
+        with self._sink_lock:
+            for remote, local in self._pending.pop(location, {}).items():
+                if local.exists():
+                    self.sink.add(remote, local)
 
     # ------------------------------------------------------------------
     # Convenience methods
     def extract_all(self, locations: Iterable[str]) -> List[str]:
         """Extract from a series of locations, returning the successful ones."""
 
-        successes: List[str] = []
-        for location in locations:
-            print(f"Attempting extraction: {location}")
-            try:
-                self.extract_from_location(location)
-            except ExtractionError as exc:
-                print(f"  Failed: {exc}")
-                continue
-            successes.append(location)
-            print(f"  Success: {location}")
+        locations = list(locations)
+        plans = self.prepare(locations)
+        order = locations if self.scheduler is None else transfer_order(locations, plans)
+        streamed: Dict[str, bool] = {}
+        if self._via_su:
+            streamed = self._stream_privileged(order, plans)
+
+        succeeded = {
+            location
+            for location in order
+            if self.try_location(location, plans.get(location), streamed.get(location))
+        }
+        return self.finish_run(locations, plans, succeeded)
+
+    def prepare(self, locations: Sequence[str]) -> Dict[str, LocationPlan]:
+        """Plan ``locations`` and apply :attr:`prefilter` to the plans.
+
+        Returns an empty mapping when either step fails, in which case each
+        location is probed and filtered on its own when it is extracted.
+        """
+
+        try:
+            plans = self.plan_locations(locations)
+        except ExtractionError as exc:
+            print(f"Planning failed, probing locations one by one: {exc}")
+            return {}
+        try:
+            self._prefilter_plans(plans)
+        except ExtractionError as exc:
+            print(f"{exc}; filtering locations one by one")
+            return {}
+        return plans
+
+    def spawn(self) -> Extractor:
+        """Return an extractor that shares this one's run, for use on another thread.
+
+        The copy writes to the same sink, manifest, counters and caches, so
+        several locations of one device can be extracted at once with
+        :meth:`try_location`; :meth:`finish_run` on either then completes
+        the run for all of them.
+        """
+
+        if self.incremental:
+            self._load_manifest()
+        self._codec()
+        return copy.copy(self)
+
+    def try_location(
+        self,
+        location: str,
+        plan: LocationPlan | None = None,
+        streamed: bool | None = None,
+    ) -> bool:
+        """Extract ``location`` as one step of a run, returning whether it succeeded.
+
+        ``streamed`` is the outcome of a batched ``su`` stream that already
+        fetched the location, if any. Files of a successful location go to
+        :attr:`sink`; a failure is reported and leaves them where they are.
+        """
+
+        print(f"Attempting extraction: {location}")
+        if not self.retrier.available(self.device):
+            print(f"  Skipped: {self.device} stopped responding")
+            return False
+        self._location = location
+        try:
+            with self._measure(EXTRACT) as measurement, self._count_transfers(measurement):
+                if streamed is not None:
+                    self._finish_streamed(location, streamed)
+                else:
+                    self.extract_from_location(location, plan)
+        except ExtractionError as exc:
+            print(f"  Failed: {exc}")
+            # Whatever arrived stays in the output directory for inspection.
+            self._pending.pop(location, None)
+            return False
+        finally:
+            self._location = None
+        self._flush_sink(location)
+        print(f"  Success: {location}")
+        return True
+
+    def finish_run(
+        self,
+        locations: Sequence[str],
+        plans: Dict[str, LocationPlan],
+        succeeded: Set[str],
+    ) -> List[str]:
+        """Complete a run over ``locations`` and return the successful ones in order."""
+
+        successes = [location for location in locations if location in succeeded]
+        # Only locations the plan found missing or empty are dropped from the profile.
+        absent = [
+            location for location in locations if location in plans and not plans[location].files
+        ]
+        self._finish_run(successes, absent)
         return successes
+
+    def _finish_run(self, successes: List[str], absent: List[str]) -> None:
+        """Persist what the run learned, close the sink and print the summaries."""
+
+        if self._identity is not None:
+            self.profiles.learn(*self._identity, successes, absent)
+        if self._manifest is not None:
+            self._manifest.save()
+        self._flush_sink(None)
+        self._pending.clear()
+        self.sink.close()
+        if self.incremental or self.stats.wire_bytes:
+            print(self.stats.summary())
+        outcomes = self.retrier.outcomes(self.device)
+        if set(outcomes) - {OK}:
+            print(format_outcomes(outcomes))
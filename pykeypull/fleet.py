@@ -0,0 +1,109 @@
+"""Concurrent extraction across every attached ADB device."""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from .extractor import ExtractionError, Extractor
+
+DEFAULT_MAX_WORKERS = 4
+
+
+@dataclass
+class DeviceResult:
+    """Outcome of the extraction workflow for a single device."""
+
+    serial: str
+    output: Path
+    successes: List[str] = field(default_factory=list)
+    error: str | None = None
+    attempts: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        """Return whether the device yielded data from at least one location."""
+
+        return self.error is None and bool(self.successes)
+
+
+def device_directory(serial: str) -> str:
+    """Return a filesystem-safe directory name for a device serial."""
+
+    return serial.replace(":", "_").replace("/", "_")
+
+
+def extract_device(
+    serial: str,
+    locations: Iterable[str] | None,
+    output: str = "output",
+    **options: Any,
+) -> DeviceResult:
+    """Root a single device and extract ``locations`` into its own subdirectory.
+
+    Extra keyword ``options`` are forwarded to :class:`Extractor`. With
+    ``locations`` set to ``None`` they are discovered on the device.
+    """
+
+    extractor = Extractor(
+        output=str(Path(output) / device_directory(serial)),
+        device=serial,
+        **options,
+    )
+    result = DeviceResult(serial=serial, output=extractor.sink.path)
+    try:
+        extractor.obtain_root()
+        extractor.ensure_output_directory()
+    except ExtractionError as exc:
+        result.error = str(exc)
+        return result
+
+    if locations is None:
+        locations = extractor.discover_locations()
+    result.successes = extractor.extract_all(locations)
+    result.attempts = extractor.retrier.outcomes(serial)
+    return result
+
+
+def extract_fleet(
+    serials: Iterable[str],
+    locations: Iterable[str] | None,
+    output: str = "output",
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    **options: Any,
+) -> List[DeviceResult]:
+    """Extract from every serial concurrently, returning results in input order.
+
+    ``max_workers`` caps how many devices are processed at once so that the
+    ADB server and shared USB hubs are not overwhelmed. An unexpected error
+    on one device is reported as that device's :attr:`DeviceResult.error`.
+    """
+
+    serials = list(serials)
+    locations = None if locations is None else list(locations)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [
+            pool.submit(
+                extract_device,
+                serial,
+                locations,
+                output=output,
+                **options,
+            )
+            for serial in serials
+        ]
+        return [_collect(serial, future, output) for serial, future in zip(serials, futures)]
+
+
+def _collect(serial: str, future: Future, output: str) -> DeviceResult:
+    """Return the result of ``future``, turning an unexpected failure into an error."""
+
+    try:
+        return future.result()
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        # One device failing in an unforeseen way must not cost the others their results.
+        return DeviceResult(
+            serial=serial, output=Path(output) / device_directory(serial), error=str(exc)
+        )
@@ -0,0 +1,231 @@
+"""Persistent index of every keybox seen across extraction runs.
+
+Each parsed keybox file is recorded in a small SQLite database together with
+its keyboxes, keys and certificate fingerprints, so questions such as "which
+devices share this attestation root" or "where have we seen DeviceID X" are
+answered by indexed lookups instead of re-parsing the whole corpus. Files are
+re-indexed only when their size or modification time changes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+from .keybox import Attestation, CertificateChain, KeyboxValidationError, parse
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    serial TEXT,
+    size INTEGER,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS keys (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    device_id TEXT,
+    algorithm TEXT
+);
+CREATE TABLE IF NOT EXISTS certificates (
+    key_id INTEGER NOT NULL REFERENCES keys (id) ON DELETE CASCADE,
+    position INTEGER,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS keys_file ON keys (file_id);
+CREATE INDEX IF NOT EXISTS keys_device_id ON keys (device_id);
+CREATE INDEX IF NOT EXISTS keys_algorithm ON keys (algorithm);
+CREATE INDEX IF NOT EXISTS certificates_key ON certificates (key_id);
+CREATE INDEX IF NOT EXISTS certificates_fingerprint ON certificates (fingerprint);
+"""
+
+_ENTRY_QUERY = """
+SELECT DISTINCT f.path, f.serial, k.device_id, k.algorithm
+FROM keys AS k
+JOIN files AS f ON f.id = k.file_id
+{join}
+WHERE {where}
+ORDER BY f.path, k.id
+"""
+
+
+@dataclass(frozen=True)
+class InventoryEntry:
+    """A key of an indexed keybox file and where it came from.
+
+    ``serial`` is the device the file was pulled from, when known.
+    """
+
+    path: str
+    serial: str | None
+    device_id: str
+    algorithm: str
+
+
+def fingerprint(der: bytes) -> str:
+    """Return the SHA-256 fingerprint used for certificates in the index."""
+
+    return hashlib.sha256(der).hexdigest()
+
+
+def _normalize_fingerprint(value: str) -> str:
+    return value.replace(":", "").strip().lower()
+
+
+class Inventory:
+    """SQLite-backed keybox inventory stored at ``path``.
+
+    The inventory may be shared by several extractors (for example across a
+    fleet run); every operation holds a lock, so concurrent use is safe.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> "Inventory":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying database."""
+
+        with self._lock:
+            self._connection.close()
+
+    # ------------------------------------------------------------------
+    # Updates
+    def add(self, path: Path, attestation: Attestation, serial: str | None = None) -> None:
+        """Record the parsed contents of ``path``, replacing any earlier entry."""
+
+        path = Path(path).resolve()
+        stat = path.stat()
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM files WHERE path = ?", (str(path),))
+            file_id = self._connection.execute(
+                "INSERT INTO files (path, serial, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                (str(path), serial, stat.st_size, stat.st_mtime_ns),
+            ).lastrowid
+            for keybox in attestation.keyboxes:
+                for key in keybox.keys:
+                    key_id = self._connection.execute(
+                        "INSERT INTO keys (file_id, device_id, algorithm) VALUES (?, ?, ?)",
+                        (file_id, keybox.device_id, key.algorithm),
+                    ).lastrowid
+                    self._connection.executemany(
+                        "INSERT INTO certificates VALUES (?, ?, ?)",
+                        [
+                            (key_id, position, digest)
+                            for position, digest in _fingerprints(key.certificate_chain)
+                        ],
+                    )
+
+    def remove(self, path: Path) -> None:
+        """Forget everything recorded for ``path``."""
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM files WHERE path = ?", (str(Path(path).resolve()),)
+            )
+
+    def is_current(self, path: Path) -> bool:
+        """Return whether ``path`` is indexed with its current size and mtime."""
+
+        path = Path(path).resolve()
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns FROM files WHERE path = ?", (str(path),)
+            ).fetchone()
+        return row == (stat.st_size, stat.st_mtime_ns)
+
+    def update(self, files: Iterable[Path], serial: str | None = None) -> Tuple[int, int]:
+        """Index every changed file in ``files``.
+
+        Unchanged files are not parsed again and files that no longer parse
+        are dropped. Returns how many files were indexed and how many skipped.
+        """
+
+        indexed = skipped = 0
+        for path in files:
+            if self.is_current(path):
+                skipped += 1
+                continue
+            try:
+                attestation = parse(path)
+            except KeyboxValidationError:
+                self.remove(path)
+                continue
+            self.add(path, attestation, serial)
+            indexed += 1
+        return indexed, skipped
+
+    def prune(self) -> int:
+        """Drop entries whose file no longer exists, returning how many."""
+
+        with self._lock:
+            paths = [row[0] for row in self._connection.execute("SELECT path FROM files")]
+        missing = [path for path in paths if not Path(path).exists()]
+        for path in missing:
+            self.remove(Path(path))
+        return len(missing)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    def by_device_id(self, device_id: str) -> List[InventoryEntry]:
+        """Return every key recorded for keybox ``device_id``."""
+
+        return self._select("", "k.device_id = ?", (device_id,))
+
+    def by_algorithm(self, algorithm: str) -> List[InventoryEntry]:
+        """Return every key using ``algorithm`` (for example ``ecdsa``)."""
+
+        return self._select("", "k.algorithm = ?", (algorithm,))
+
+    def by_fingerprint(self, value: str) -> List[InventoryEntry]:
+        """Return every key whose chain contains the certificate ``value``.
+
+        ``value`` is a SHA-256 fingerprint in hex, with or without colons.
+        """
+
+        return self._select(
+            "JOIN certificates AS c ON c.key_id = k.id",
+            "c.fingerprint = ?",
+            (_normalize_fingerprint(value),),
+        )
+
+    def _select(
+        self, join: str, where: str, parameters: Tuple[object, ...]
+    ) -> List[InventoryEntry]:
+        with self._lock:
+            cursor = self._connection.execute(
+                _ENTRY_QUERY.format(join=join, where=where), parameters
+            )
+            return [InventoryEntry(*row) for row in cursor]
+
+
+def _fingerprints(chain: CertificateChain) -> List[Tuple[int, str]]:
+    """Return ``(position, fingerprint)`` for each decodable certificate of ``chain``."""
+
+    result = []
+    for position, certificate in enumerate(chain.certificates):
+        try:
+            result.append((position, fingerprint(certificate.der)))
+        except KeyboxValidationError:
+            # Undecodable certificates are still found through their keybox.
+            continue
+    return result
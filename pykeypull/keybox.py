@@ -2,21 +2,52 @@
 
 from __future__ import annotations
 
+import base64
+import binascii
+import sys
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, Iterator, List, Union
 import xml.etree.ElementTree as ET
 
 
-@dataclass
+class KeyboxValidationError(RuntimeError):
+    """Raised when a keybox file cannot be parsed."""
+
+
+def _pem_to_der(data: str) -> bytes:
+    """Decode PEM (or bare base64) text to DER bytes."""
+
+    body = "".join(
+        line.strip() for line in data.splitlines() if line.strip() and not line.startswith("-----")
+    )
+    try:
+        return base64.b64decode(body, validate=True)
+    except (binascii.Error, ValueError) as exc:
+        raise KeyboxValidationError(f"Invalid base64 payload: {exc}") from exc
+
+
+@dataclass(slots=True)
 class Certificate:
-    """Represent a single certificate element in the XML structure."""
+    """Represent a single certificate element in the XML structure.
+
+    ``data`` keeps the PEM text; :attr:`der` decodes it on first access.
+    """
 
     format: str
     data: str
+    _der: bytes | None = field(default=None, init=False, repr=False, compare=False)
 
+    @property
+    def der(self) -> bytes:
+        """Return the DER encoding of the certificate, decoding it once."""
 
-@dataclass
+        if self._der is None:
+            self._der = _pem_to_der(self.data)
+        return self._der
+
+
+@dataclass(slots=True)
 class CertificateChain:
     """Container for the certificates associated with a key."""
 
@@ -24,15 +55,27 @@ class CertificateChain:
     certificates: List[Certificate] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class PrivateKey:
-    """Hold the private key metadata referenced by a key entry."""
+    """Hold the private key metadata referenced by a key entry.
+
+    ``data`` keeps the PEM text; :attr:`der` decodes it on first access.
+    """
 
     format: str
     data: str
+    _der: bytes | None = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def der(self) -> bytes:
+        """Return the DER encoding of the private key, decoding it once."""
 
+        if self._der is None:
+            self._der = _pem_to_der(self.data)
+        return self._der
 
-@dataclass
+
+@dataclass(slots=True)
 class Key:
     """Full key entry combining algorithm, private key, and certificates."""
 
@@ -41,7 +84,7 @@ class Key:
     certificate_chain: CertificateChain
 
 
-@dataclass
+@dataclass(slots=True)
 class Keybox:
     """Group of keys tied to a specific device identifier."""
 
@@ -49,7 +92,7 @@ class Keybox:
     keys: List[Key] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class Attestation:
     """Root element representing the contents of a keybox file."""
 
@@ -57,14 +100,16 @@ class Attestation:
     keyboxes: List[Keybox] = field(default_factory=list)
 
 
-class KeyboxValidationError(RuntimeError):
-    """Raised when a keybox file cannot be parsed."""
+def _text(element: ET.Element) -> str:
+    # Interning shares identical PEM blobs (common intermediates and roots)
+    # between every keybox that references them.
+    return sys.intern((element.text or "").strip())
 
 
 def _parse_certificate(element: ET.Element) -> Certificate:
     return Certificate(
-        format=element.get("format", ""),
-        data=(element.text or "").strip(),
+        format=sys.intern(element.get("format", "")),
+        data=_text(element),
     )
 
 
@@ -85,8 +130,8 @@ def _parse_certificate_chain(element: ET.Element) -> CertificateChain:
 
 def _parse_private_key(element: ET.Element) -> PrivateKey:
     return PrivateKey(
-        format=element.get("format", ""),
-        data=(element.text or "").strip(),
+        format=sys.intern(element.get("format", "")),
+        data=_text(element),
     )
 
 
@@ -96,7 +141,7 @@ def _parse_key(element: ET.Element) -> Key:
     if private_key_el is None or certificate_chain_el is None:
         raise KeyboxValidationError("Key entry is missing PrivateKey or CertificateChain element")
     return Key(
-        algorithm=element.get("algorithm", ""),
+        algorithm=sys.intern(element.get("algorithm", "")),
         private_key=_parse_private_key(private_key_el),
         certificate_chain=_parse_certificate_chain(certificate_chain_el),
     )
@@ -109,35 +154,70 @@ def _parse_keybox(element: ET.Element) -> Keybox:
     )
 
 
-def _parse_attestation(root: ET.Element) -> Attestation:
-    count_text = root.findtext("NumberOfKeyboxes", default="0")
+def _parse_keybox_count(element: ET.Element) -> int:
+    count_text = element.text or "0"
     try:
-        number_of_keyboxes = int(count_text)
+        return int(count_text)
     except ValueError:
         raise KeyboxValidationError(f"Invalid NumberOfKeyboxes value: {count_text!r}") from None
-    keyboxes = [_parse_keybox(kb_el) for kb_el in root.findall("Keybox")]
-    return Attestation(number_of_keyboxes=number_of_keyboxes, keyboxes=keyboxes)
 
 
-def validate(path: Path) -> Attestation:
-    """Validate a keybox XML file and return its parsed contents.
+def iter_document(source: Union[Path, BinaryIO]) -> Iterator[Union[int, Keybox]]:
+    """Stream a keybox document, yielding the keybox count and each keybox.
 
-    The function mirrors the Go implementation by printing a concise summary
-    of the extracted metadata. The parsed :class:`Attestation` object is
-    returned for further processing.
+    Top-level elements are detached from the tree once parsed, so memory use
+    stays bounded by the size of a single ``<Keybox>`` entry.
     """
 
+    stack: List[ET.Element] = []
     try:
-        data = path.read_bytes()
+        for event, element in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                continue
+            stack.pop()
+            if len(stack) != 1:
+                continue
+            if element.tag == "NumberOfKeyboxes":
+                yield _parse_keybox_count(element)
+            elif element.tag == "Keybox":
+                yield _parse_keybox(element)
+            stack[0].remove(element)
     except OSError as exc:
         raise KeyboxValidationError(f"Failed to read keybox file: {exc}") from exc
-
-    try:
-        root = ET.fromstring(data)
     except ET.ParseError as exc:
         raise KeyboxValidationError(f"XML is invalid: {exc}") from exc
 
-    attestation = _parse_attestation(root)
+
+def iter_keyboxes(source: Union[Path, BinaryIO]) -> Iterator[Keybox]:
+    """Yield the keyboxes of a file one at a time without loading it whole."""
+
+    for item in iter_document(source):
+        if isinstance(item, Keybox):
+            yield item
+
+
+def parse(source: Union[Path, BinaryIO]) -> Attestation:
+    """Parse a keybox file into an :class:`Attestation` without printing."""
+
+    attestation = Attestation(number_of_keyboxes=0)
+    for item in iter_document(source):
+        if isinstance(item, Keybox):
+            attestation.keyboxes.append(item)
+        else:
+            attestation.number_of_keyboxes = item
+    return attestation
+
+
+def validate(path: Path) -> Attestation:
+    """Validate a keybox XML file and return its parsed contents.
+
+    The function mirrors the Go implementation by printing a concise summary
+    of the extracted metadata. The parsed :class:`Attestation` object is
+    returned for further processing.
+    """
+
+    attestation = parse(path)
 
     print(f"Keyboxes found: {attestation.number_of_keyboxes}")
     for index, keybox in enumerate(attestation.keyboxes, start=1):
@@ -0,0 +1,221 @@
+"""Consistent snapshots of keystore2 databases and a sidecar key index.
+
+keystore2 keeps ``persistent.sqlite`` in WAL mode, so recent rows may only
+exist in ``persistent.sqlite-wal``. :func:`consolidate` folds a pulled WAL
+into the local copy and checks the result. :class:`KeyIndex` then records
+every key's alias, owner and blob sizes in a small indexed SQLite file next
+to the snapshot, so lookups never touch the blobs themselves.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+WAL_SUFFIX = "-wal"
+SHM_SUFFIX = "-shm"
+INDEX_SUFFIX = ".keyindex"
+
+# Bumped whenever the sidecar layout changes so stale indexes are rebuilt.
+_INDEX_VERSION = 1
+
+_INDEX_SCHEMA = """
+CREATE TABLE meta (version INTEGER, snapshot_size INTEGER, snapshot_mtime_ns INTEGER);
+CREATE TABLE keys (
+    key_id INTEGER PRIMARY KEY,
+    alias TEXT,
+    uid INTEGER,
+    domain INTEGER,
+    key_type INTEGER,
+    blob_count INTEGER,
+    blob_bytes INTEGER
+);
+CREATE INDEX keys_alias ON keys (alias);
+CREATE INDEX keys_uid ON keys (uid);
+"""
+
+# length() on a BLOB reads the size from the record header, so the blobs are
+# never loaded while the index is built.
+_KEY_QUERY = """
+SELECT k.id, k.alias, k.namespace, k.domain, k.key_type,
+       COUNT(b.id), COALESCE(SUM(length(b.blob)), 0)
+FROM snapshot.keyentry AS k
+LEFT JOIN snapshot.blobentry AS b ON b.keyentryid = k.id
+GROUP BY k.id
+"""
+
+
+class KeystoreIndexError(RuntimeError):
+    """Raised when a snapshot is not a readable keystore2 database."""
+
+
+def consolidate(path: Path) -> bool:
+    """Fold ``path``'s pulled WAL into it and return whether it is intact.
+
+    The copy is switched to rollback-journal mode, which checkpoints the WAL
+    and leaves a single self-contained file.
+    """
+
+    # A leftover shared-memory index could describe a different WAL.
+    path.with_name(path.name + SHM_SUFFIX).unlink(missing_ok=True)
+    try:
+        connection = sqlite3.connect(path)
+        try:
+            connection.execute("PRAGMA journal_mode=DELETE")
+            (result,) = connection.execute("PRAGMA integrity_check").fetchone()
+        finally:
+            connection.close()
+    except sqlite3.DatabaseError:
+        return False
+    for suffix in (WAL_SUFFIX, SHM_SUFFIX):
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+    return result == "ok"
+
+
+@dataclass(frozen=True)
+class KeyRecord:
+    """A key entry of a keystore2 snapshot, without its blobs.
+
+    For app keys (``domain`` 0) ``uid`` is the owning app's UID; for other
+    domains it is the keystore namespace.
+    """
+
+    key_id: int
+    alias: str | None
+    uid: int
+    domain: int
+    key_type: int
+    blob_count: int
+    blob_bytes: int
+
+
+def _text(value: object) -> str | None:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return None if value is None else str(value)
+
+
+class KeyIndex:
+    """Lazily built sidecar index for one ``persistent.sqlite`` snapshot.
+
+    The index lives at ``<snapshot>.keyindex`` and is rebuilt automatically
+    when the snapshot's size or modification time changes.
+    """
+
+    def __init__(self, snapshot: Path) -> None:
+        self.snapshot = Path(snapshot)
+        self.path = self.snapshot.with_name(self.snapshot.name + INDEX_SUFFIX)
+        self._connection: sqlite3.Connection | None = None
+
+    def __enter__(self) -> "KeyIndex":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def build(self) -> int:
+        """(Re)build the sidecar from the snapshot, returning the key count."""
+
+        self.close()
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.unlink(missing_ok=True)
+        stat = self.snapshot.stat()
+        connection = sqlite3.connect(temporary.resolve().as_uri(), uri=True)
+        try:
+            connection.executescript(_INDEX_SCHEMA)
+            connection.execute(
+                "ATTACH DATABASE ? AS snapshot", (f"{self.snapshot.resolve().as_uri()}?mode=ro",)
+            )
+            rows = [
+                (key_id, _text(alias), *rest)
+                for key_id, alias, *rest in connection.execute(_KEY_QUERY)
+            ]
+            connection.executemany("INSERT INTO keys VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            connection.execute(
+                "INSERT INTO meta VALUES (?, ?, ?)",
+                (_INDEX_VERSION, stat.st_size, stat.st_mtime_ns),
+            )
+            connection.commit()
+        except sqlite3.DatabaseError as exc:
+            connection.close()
+            temporary.unlink(missing_ok=True)
+            raise KeystoreIndexError(f"{self.snapshot} is not a keystore2 database: {exc}") from exc
+        connection.close()
+        temporary.replace(self.path)
+        return len(rows)
+
+    def by_alias(self, alias: str) -> List[KeyRecord]:
+        """Return the keys named ``alias``."""
+
+        return self._select("WHERE alias = ?", (alias,))
+
+    def by_uid(self, uid: int) -> List[KeyRecord]:
+        """Return the keys owned by ``uid``."""
+
+        return self._select("WHERE uid = ?", (uid,))
+
+    def keys(self) -> List[KeyRecord]:
+        """Return every key in the snapshot."""
+
+        return self._select("", ())
+
+    def close(self) -> None:
+        """Close the sidecar connection, if open."""
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _select(self, where: str, parameters: Tuple[object, ...]) -> List[KeyRecord]:
+        cursor = self._connect().execute(
+            "SELECT key_id, alias, uid, domain, key_type, blob_count, blob_bytes "
+            f"FROM keys {where} ORDER BY key_id",
+            parameters,
+        )
+        return [KeyRecord(*row) for row in cursor]
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if not self._is_current():
+                self.build()
+            self._connection = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        return self._connection
+
+    def _is_current(self) -> bool:
+        try:
+            stat = self.snapshot.stat()
+            connection = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        except (OSError, sqlite3.DatabaseError):
+            return False
+        try:
+            meta = connection.execute("SELECT * FROM meta").fetchone()
+        except sqlite3.DatabaseError:
+            return False
+        finally:
+            connection.close()
+        return meta == (_INDEX_VERSION, stat.st_size, stat.st_mtime_ns)
+
+
+def find_keys(
+    snapshots: Iterable[Path],
+    alias: str | None = None,
+    uid: int | None = None,
+) -> Iterator[Tuple[Path, KeyRecord]]:
+    """Yield ``(snapshot, key)`` pairs matching ``alias`` and/or ``uid``.
+
+    Each snapshot's sidecar index is used, and built on first use.
+    """
+
+    for snapshot in snapshots:
+        with KeyIndex(snapshot) as index:
+            if alias is not None:
+                records = index.by_alias(alias)
+            elif uid is not None:
+                records = index.by_uid(uid)
+            else:
+                records = index.keys()
+        for record in records:
+            if uid is None or record.uid == uid:
+                yield snapshot, record
@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from typing import Tuple
+import shlex
+from typing import Iterable, List, Sequence, Tuple
 
 DEVICE_LOCATIONS: Tuple[str, ...] = (
     "/data/misc/keystore/",
@@ -13,3 +14,49 @@ DEVICE_LOCATIONS: Tuple[str, ...] = (
     "/system/etc/security/keystore/",
     "/vendor/etc/keystore/",
 )
+
+# Directories searched for the file name patterns below when a device model
+# has not been seen before. Vendors move keyboxes around between SoC families,
+# so these are broader than the fixed locations above.
+SEARCH_ROOTS: Tuple[str, ...] = (
+    "/data/adb",
+    "/data/misc/keystore",
+    "/mnt/vendor",
+    "/persist",
+    "/vendor/etc",
+    "/system/etc/security",
+)
+
+SEARCH_PATTERNS: Tuple[str, ...] = ("*keybox*.xml", "persistent.sqlite")
+
+# Bounds for the search so a deep or huge tree cannot stall a run.
+SEARCH_MAX_DEPTH = 4
+SEARCH_MAX_RESULTS = 64
+
+IDENTITY_COMMAND = "getprop ro.product.model; getprop ro.build.fingerprint"
+
+
+def search_command(
+    roots: Sequence[str] = SEARCH_ROOTS,
+    patterns: Sequence[str] = SEARCH_PATTERNS,
+) -> str:
+    """Return one bounded ``find`` over ``roots`` for files matching ``patterns``."""
+
+    names = " -o ".join(f"-name {shlex.quote(pattern)}" for pattern in patterns)
+    quoted = " ".join(shlex.quote(root) for root in roots)
+    return (
+        f"find {quoted} -maxdepth {SEARCH_MAX_DEPTH} -type f \\( {names} \\) 2>/dev/null "
+        f"| head -n {SEARCH_MAX_RESULTS}"
+    )
+
+
+def merge_found(candidates: Iterable[str], found: Iterable[str]) -> List[str]:
+    """Append the ``found`` paths that no candidate location already covers."""
+
+    locations = list(candidates)
+    directories = [location for location in locations if location.endswith("/")]
+    for path in found:
+        covered = path in locations or any(path.startswith(d) for d in directories)
+        if not covered:
+            locations.append(path)
+    return locations
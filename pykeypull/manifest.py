@@ -0,0 +1,215 @@
+"""Per-device content manifests used for incremental re-extraction."""
+
+from __future__ import annotations
+
+import json
+import shlex
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+MANIFEST_PREFIX = ".keypull-manifest-"
+
+# Separates the stat section from the digest section in the probe output.
+_DIGEST_MARKER = "--keypull-digests--"
+
+# Longest probe command sent in one shell call, in bytes. Every path appears
+# three times, and adb and the device shell both cap the command length.
+STATE_COMMAND_LIMIT = 32 * 1024
+
+
+@dataclass(frozen=True)
+class RemoteFileState:
+    """Size, modification time and on-device digest of a remote file."""
+
+    size: int
+    mtime: int
+    digest: str | None = None
+
+
+@dataclass
+class TransferStats:
+    """Counters describing how much data a run moved or skipped.
+
+    The counters may be updated from several threads extracting one device.
+    """
+
+    transferred_files: int = 0
+    transferred_bytes: int = 0
+    skipped_files: int = 0
+    skipped_bytes: int = 0
+    wire_bytes: int = 0
+    payload_bytes: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_transfer(self, size: int) -> None:
+        """Count a file that was copied from the device."""
+
+        with self._lock:
+            self.transferred_files += 1
+            self.transferred_bytes += size
+
+    def record_skip(self, size: int) -> None:
+        """Count a file that was left alone because it had not changed."""
+
+        with self._lock:
+            self.skipped_files += 1
+            self.skipped_bytes += size
+
+    def record_compression(self, wire: int, payload: int) -> None:
+        """Count a compressed stream of ``wire`` bytes carrying ``payload`` bytes."""
+
+        with self._lock:
+            self.wire_bytes += wire
+            self.payload_bytes += payload
+
+    @property
+    def compression_ratio(self) -> float:
+        """Return how many payload bytes each byte on the wire carried."""
+
+        return self.payload_bytes / self.wire_bytes if self.wire_bytes else 1.0
+
+    def summary(self) -> str:
+        """Return a one-line human readable summary."""
+
+        summary = (
+            f"Transferred {self.transferred_files} file(s) ({self.transferred_bytes} bytes); "
+            f"skipped {self.skipped_files} unchanged file(s) ({self.skipped_bytes} bytes)"
+        )
+        if self.wire_bytes:
+            summary += (
+                f"; compressed streams carried {self.payload_bytes} bytes in "
+                f"{self.wire_bytes} ({self.compression_ratio:.1f}x)"
+            )
+        return summary
+
+
+def state_command(files: Iterable[str]) -> str:
+    """Return a shell command that stats and hashes ``files`` in one round-trip.
+
+    ``sha256sum`` is preferred and ``md5sum`` is used on devices without it.
+    """
+
+    quoted = " ".join(shlex.quote(name) for name in files)
+    return (
+        f"stat -c '%s %Y %n' {quoted} 2>/dev/null; echo {_DIGEST_MARKER}; "
+        f"if command -v sha256sum >/dev/null; then sha256sum {quoted}; "
+        f"else md5sum {quoted}; fi 2>/dev/null"
+    )
+
+
+def state_commands(files: Iterable[str], limit: int = STATE_COMMAND_LIMIT) -> List[str]:
+    """Split the probe of ``files`` into :func:`state_command` calls of bounded length.
+
+    Each command stays within ``limit`` bytes unless a single path is too
+    long on its own. The outputs can be parsed separately and merged.
+    """
+
+    budget = (limit - len(state_command([]))) // 3
+    commands: List[str] = []
+    batch: List[str] = []
+    size = 0
+    for name in files:
+        length = len(shlex.quote(name)) + 1
+        if batch and size + length > budget:
+            commands.append(state_command(batch))
+            batch, size = [], 0
+        batch.append(name)
+        size += length
+    if batch:
+        commands.append(state_command(batch))
+    return commands
+
+
+def parse_state_output(output: str) -> Dict[str, RemoteFileState]:
+    """Parse the output of :func:`state_command` into per-path states."""
+
+    stat_text, _, digest_text = output.partition(_DIGEST_MARKER)
+    digests: Dict[str, str] = {}
+    for line in digest_text.splitlines():
+        digest, _, name = line.strip().partition(" ")
+        if digest and name:
+            digests[name.lstrip(" *")] = digest
+
+    states: Dict[str, RemoteFileState] = {}
+    for line in stat_text.splitlines():
+        parts = line.strip().split(" ", 2)
+        if len(parts) != 3:
+            continue
+        try:
+            size, mtime = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        states[parts[2]] = RemoteFileState(size=size, mtime=mtime, digest=digests.get(parts[2]))
+    return states
+
+
+class Manifest:
+    """JSON record of what was last pulled from a device.
+
+    Each remote path maps to its :class:`RemoteFileState` and the name of the
+    local file it was written to.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict[str, object]] = {}
+
+    @classmethod
+    def for_device(cls, output: Path, serial: str) -> "Manifest":
+        """Load the manifest stored in ``output`` for ``serial``."""
+
+        safe_serial = serial.replace(":", "_").replace("/", "_")
+        manifest = cls(output / f"{MANIFEST_PREFIX}{safe_serial}.json")
+        manifest.load()
+        return manifest
+
+    def load(self) -> None:
+        """Read the manifest from disk, starting empty if it is missing or corrupt."""
+
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict):
+            self.entries = data.get("files", {})
+
+    def save(self) -> None:
+        """Atomically write the manifest to disk."""
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(
+            json.dumps({"files": self.entries}, indent=2, sort_keys=True),
+            encoding="utf-8",
+        )
+        temporary.replace(self.path)
+
+    def is_unchanged(self, remote: str, state: RemoteFileState | None, local: Path) -> bool:
+        """Return whether ``remote`` matches the manifest and ``local`` is intact."""
+
+        entry = self.entries.get(remote)
+        if state is None or entry is None:
+            return False
+        if entry.get("local") != local.name:
+            return False
+        if asdict(state) != {key: entry.get(key) for key in ("size", "mtime", "digest")}:
+            return False
+        try:
+            return local.stat().st_size == entry.get("local_size", state.size)
+        except OSError:
+            return False
+
+    def record(self, remote: str, state: RemoteFileState, local: Path) -> None:
+        """Remember that ``remote`` in ``state`` was written to ``local``.
+
+        The local size is kept as well, since post-processing (such as folding
+        a WAL into a database) may legitimately change it.
+        """
+
+        try:
+            local_size = local.stat().st_size
+        except OSError:
+            local_size = state.size
+        self.entries[remote] = {**asdict(state), "local": local.name, "local_size": local_size}
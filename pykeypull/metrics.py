@@ -0,0 +1,177 @@
+"""Per-phase timing and throughput metrics for extraction runs."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+DISCOVER = "discover"
+ROOT = "root"
+LOCATE = "locate"
+PLAN = "plan"
+LIST = "list"
+TRANSFER = "transfer"
+VALIDATE = "validate"
+EXTRACT = "extract"
+
+
+@dataclass(frozen=True)
+class PhaseEvent:
+    """One timed step of a run, as delivered to :class:`Metrics` listeners.
+
+    ``device`` is ``None`` for steps that are not tied to a device (such as
+    discovery) and ``location`` is ``None`` for device-wide steps.
+    """
+
+    phase: str
+    device: str | None
+    location: str | None
+    duration: float
+    bytes: int = 0
+    files: int = 0
+    error: str | None = None
+
+
+@dataclass
+class PhaseTotals:
+    """Accumulated figures for one phase of one location on one device."""
+
+    count: int = 0
+    duration: float = 0.0
+    bytes: int = 0
+    files: int = 0
+    failures: int = 0
+
+    @property
+    def throughput(self) -> float:
+        """Return the transfer rate in bytes per second."""
+
+        return self.bytes / self.duration if self.duration > 0 else 0.0
+
+    def add(self, event: PhaseEvent) -> None:
+        """Fold ``event`` into the totals."""
+
+        self.count += 1
+        self.duration += event.duration
+        self.bytes += event.bytes
+        self.files += event.files
+        if event.error is not None:
+            self.failures += 1
+
+
+@dataclass
+class Measurement:
+    """Mutable counters filled in while a phase is running."""
+
+    bytes: int = 0
+    files: int = 0
+
+
+Listener = Callable[[PhaseEvent], None]
+
+
+class Metrics:
+    """Collect :class:`PhaseEvent` records and aggregate them per location.
+
+    A single instance may be shared by several extractors running on
+    different threads. Listeners registered with :meth:`subscribe` are called
+    synchronously with every event, so they should return quickly.
+    """
+
+    def __init__(self) -> None:
+        self._totals: Dict[Tuple[str | None, str | None, str], PhaseTotals] = {}
+        self._listeners: List[Listener] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Listener) -> None:
+        """Call ``listener`` with every event recorded from now on."""
+
+        with self._lock:
+            self._listeners.append(listener)
+
+    def record(self, event: PhaseEvent) -> None:
+        """Aggregate ``event`` and pass it to the listeners."""
+
+        with self._lock:
+            key = (event.device, event.location, event.phase)
+            self._totals.setdefault(key, PhaseTotals()).add(event)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(event)
+
+    @contextmanager
+    def measure(
+        self,
+        phase: str,
+        device: str | None = None,
+        location: str | None = None,
+    ) -> Iterator[Measurement]:
+        """Time the body of a ``with`` block as one ``phase`` event.
+
+        The yielded :class:`Measurement` lets the block report bytes and
+        files. Exceptions are recorded as failures and propagated.
+        """
+
+        measurement = Measurement()
+        error: str | None = None
+        started = time.perf_counter()
+        try:
+            yield measurement
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+            raise
+        finally:
+            self.record(
+                PhaseEvent(
+                    phase=phase,
+                    device=device,
+                    location=location,
+                    duration=time.perf_counter() - started,
+                    bytes=measurement.bytes,
+                    files=measurement.files,
+                    error=error,
+                )
+            )
+
+    def totals(self) -> Dict[Tuple[str | None, str | None, str], PhaseTotals]:
+        """Return a snapshot of the totals keyed by (device, location, phase)."""
+
+        with self._lock:
+            return {key: PhaseTotals(**asdict(value)) for key, value in self._totals.items()}
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serialisable view with per-location and per-phase totals."""
+
+        rows: List[Dict[str, Any]] = []
+        phases: Dict[str, PhaseTotals] = {}
+        for (device, location, phase), totals in self.totals().items():
+            rows.append(
+                {
+                    "device": device,
+                    "location": location,
+                    "phase": phase,
+                    **asdict(totals),
+                    "throughput": totals.throughput,
+                }
+            )
+            combined = phases.setdefault(phase, PhaseTotals())
+            for field_name, value in asdict(totals).items():
+                setattr(combined, field_name, getattr(combined, field_name) + value)
+        return {
+            "entries": rows,
+            "phases": {
+                phase: {**asdict(totals), "throughput": totals.throughput}
+                for phase, totals in phases.items()
+            },
+        }
+
+    def write_json(self, path: Path) -> None:
+        """Write :meth:`as_dict` to ``path``."""
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.as_dict(), indent=2), encoding="utf-8")
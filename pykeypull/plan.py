@@ -0,0 +1,85 @@
+"""Batched enumeration of device locations ahead of the transfer phase."""
+
+from __future__ import annotations
+
+import posixpath
+import shlex
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List
+
+FILE = "file"
+DIRECTORY = "directory"
+MISSING = "missing"
+
+_KINDS = {"f": FILE, "d": DIRECTORY, "m": MISSING}
+
+
+@dataclass(frozen=True)
+class PlanEntry:
+    """A regular file discovered on the device."""
+
+    path: str
+    size: int
+    mtime: int
+
+
+@dataclass
+class LocationPlan:
+    """What a requested location turned out to be on the device.
+
+    ``kind`` is one of :data:`FILE`, :data:`DIRECTORY` or :data:`MISSING`;
+    ``files`` lists every regular file the location expands to.
+    """
+
+    location: str
+    kind: str
+    files: List[PlanEntry] = field(default_factory=list)
+
+    @property
+    def total_size(self) -> int:
+        """Return the combined size of every planned file."""
+
+        return sum(entry.size for entry in self.files)
+
+
+def plan_command(locations: Iterable[str]) -> str:
+    """Return a shell command that expands and stats every location at once.
+
+    Each location produces an ``L|<kind>|<location>`` header followed by one
+    ``F|<size>|<mtime>|<path>`` line per regular file. Locations that cannot
+    be read are reported as missing.
+    """
+
+    quoted = " ".join(shlex.quote(location) for location in locations)
+    return (
+        f"for p in {quoted}; do "
+        'if [ -d "$p" ]; then echo "L|d|$p"; '
+        "find \"$p\" -type f -exec stat -c 'F|%s|%Y|%n' {} + 2>/dev/null; "
+        'elif [ -f "$p" ]; then echo "L|f|$p"; '
+        "stat -c 'F|%s|%Y|%n' \"$p\" 2>/dev/null; "
+        'else echo "L|m|$p"; fi; done'
+    )
+
+
+def parse_plan_output(output: str) -> Dict[str, LocationPlan]:
+    """Parse the output of :func:`plan_command`, keyed by requested location."""
+
+    plans: Dict[str, LocationPlan] = {}
+    current: LocationPlan | None = None
+    for line in output.splitlines():
+        if line.startswith("L|"):
+            _, kind, location = line.split("|", 2)
+            current = LocationPlan(location=location, kind=_KINDS.get(kind, MISSING))
+            plans[location] = current
+        elif line.startswith("F|") and current is not None:
+            parts = line.split("|", 3)
+            if len(parts) != 4:
+                continue
+            try:
+                size, mtime = int(parts[1]), int(parts[2])
+            except ValueError:
+                continue
+            current.files.append(
+                PlanEntry(path=posixpath.normpath(parts[3]), size=size, mtime=mtime)
+            )
+    return plans
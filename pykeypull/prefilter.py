@@ -0,0 +1,101 @@
+"""On-device selection of the files worth transferring from directory locations.
+
+Keystore trees often hold far more than keys and keyboxes. A single shell
+pass walks the directories on the device and checks each file's name, size
+and leading bytes against a rule set; only the files that match are pulled.
+"""
+
+from __future__ import annotations
+
+import posixpath
+import shlex
+from dataclasses import dataclass
+from typing import Iterable, List, Sequence, Set, Tuple
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Select files whose base name matches one of ``patterns``.
+
+    ``patterns`` are shell ``case`` globs and must not contain whitespace,
+    ``|`` or ``)``. When ``magic`` is set it must occur within the first
+    ``window`` bytes of the file; ``max_size`` caps the file size in bytes.
+    A kept file brings along the files next to it named with one of the
+    ``companions`` suffixes, such as the journals of a database.
+    """
+
+    name: str
+    patterns: Tuple[str, ...]
+    magic: str | None = None
+    window: int = 0
+    max_size: int | None = None
+    companions: Tuple[str, ...] = ()
+
+
+DEFAULT_RULES: Tuple[Rule, ...] = (
+    Rule("keybox", ("*.xml", "*keybox*"), "<AndroidAttestation", 4096, 64 * 1024 * 1024),
+    # Recent writes may only exist in the WAL, so it must travel with its database.
+    Rule("sqlite", ("*.sqlite", "*.db"), "SQLite format 3", 16, companions=("-wal", "-journal")),
+    # Legacy keystore blobs have no magic; their names encode uid and type.
+    Rule(
+        "keystore-blob",
+        ("*_USRPKEY_*", "*_USRSKEY_*", "*_USRCERT_*", "*_CACERT_*", ".masterkey"),
+        max_size=1024 * 1024,
+    ),
+)
+
+
+def _branch(rule: Rule) -> str:
+    checks = []
+    if rule.max_size is not None:
+        checks.append(f'[ "$s" -le {rule.max_size} ]')
+    if rule.magic is not None:
+        checks.append(
+            f'head -c {rule.window} "$f" 2>/dev/null | grep -qF {shlex.quote(rule.magic)}'
+        )
+    keep = 'echo "K|$f"'
+    if rule.companions:
+        suffixes = " ".join(shlex.quote(suffix) for suffix in rule.companions)
+        keep = f'{{ {keep}; for c in {suffixes}; do [ -f "$f$c" ] && echo "K|$f$c"; done; }}'
+    checks.append(keep)
+    return f"{'|'.join(rule.patterns)}) {' && '.join(checks)};;"
+
+
+def filter_command(roots: Iterable[str], rules: Sequence[Rule] = DEFAULT_RULES) -> str:
+    """Return one shell command selecting the files below ``roots`` that match ``rules``.
+
+    The first rule whose pattern matches a file decides whether it is kept,
+    together with its companions. Every kept file is printed as
+    ``K|<path>`` and the number of files examined as a final ``T|<count>``
+    line.
+    """
+
+    quoted = " ".join(shlex.quote(root) for root in roots)
+    branches = " ".join(_branch(rule) for rule in rules)
+    return (
+        f"find {quoted} -type f 2>/dev/null | {{ n=0; while IFS= read -r f; do "
+        "n=$((n+1)); "
+        's=$(stat -c %s "$f" 2>/dev/null) || continue; '
+        f'case "${{f##*/}}" in {branches} esac; done; echo "T|$n"; }}'
+    )
+
+
+def parse_filter_output(output: str) -> Tuple[List[str], int]:
+    """Parse :func:`filter_command` output into the kept paths and the examined count."""
+
+    kept: List[str] = []
+    seen: Set[str] = set()
+    examined = 0
+    for line in output.splitlines():
+        if line.startswith("K|"):
+            path = posixpath.normpath(line[2:])
+            # A companion is listed again if a rule also matches it directly.
+            if path not in seen:
+                seen.add(path)
+                kept.append(path)
+        elif line.startswith("T|"):
+            try:
+                examined = int(line[2:])
+            except ValueError:
+                continue
+    return kept, examined
@@ -0,0 +1,98 @@
+"""Cache of the locations that held data on each device model and build."""
+
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+
+class ProfileCache:
+    """Remember which locations were productive per build fingerprint and model.
+
+    Lookups prefer the exact build fingerprint and fall back to the model, so
+    a device that received an update still benefits from what was learned on
+    its previous build. Like :class:`~pykeypull.rootcache.RootCache`, the
+    cache is thread-safe and, when ``path`` is given, persisted after every
+    change. With ``refresh`` set lookups find nothing, so every device is
+    searched again and its profile extended with what the search turns up.
+    """
+
+    def __init__(self, path: Path | None = None, refresh: bool = False) -> None:
+        self.path = path
+        self.refresh = refresh
+        self._profiles: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            self._read()
+
+    def lookup(self, model: str, fingerprint: str) -> List[str] | None:
+        """Return the productive locations learned for this device, if any."""
+
+        if self.refresh:
+            return None
+        with self._lock:
+            for key in (_key("fingerprint", fingerprint), _key("model", model)):
+                locations = self._profiles.get(key)
+                if locations:
+                    return list(locations)
+        return None
+
+    def learn(
+        self,
+        model: str,
+        fingerprint: str,
+        productive: Sequence[str],
+        absent: Sequence[str] = (),
+    ) -> None:
+        """Record that ``productive`` held data on this model and build.
+
+        Locations learned earlier are kept unless they appear in ``absent``,
+        the locations confirmed missing or empty on the device, so a run in
+        which a location failed transiently does not forget it.
+        """
+
+        with self._lock:
+            changed = False
+            for key in (_key("fingerprint", fingerprint), _key("model", model)):
+                if not key:
+                    continue
+                known = self._profiles.get(key, [])
+                merged = [location for location in known if location not in absent]
+                merged += [location for location in productive if location not in merged]
+                if known != merged:
+                    self._profiles[key] = merged
+                    changed = True
+            if changed:
+                self._write()
+
+    def _read(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        profiles = data.get("profiles") if isinstance(data, dict) else None
+        if isinstance(profiles, dict):
+            self._profiles = {
+                str(key): [str(location) for location in locations]
+                for key, locations in profiles.items()
+                if isinstance(locations, list)
+            }
+
+    def _write(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.write_text(
+            json.dumps({"profiles": self._profiles}, indent=2, sort_keys=True),
+            encoding="utf-8",
+        )
+        temporary.replace(self.path)
+
+
+def _key(kind: str, value: str) -> str:
+    """Return the cache key for ``value``, or ``""`` when the property is unknown."""
+
+    return f"{kind}:{value}" if value else ""
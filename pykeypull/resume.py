@@ -0,0 +1,123 @@
+"""Checkpoints and ranged reads for resumable transfers of large files.
+
+A large file is copied in fixed-size chunks read on the device with ``dd``.
+After every chunk the partial local file's length and SHA-256 are saved in
+a checkpoint next to it, so an interrupted transfer resumes from the last
+complete chunk instead of from byte zero.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import shlex
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Iterator, Tuple
+
+# ``dd`` block size; chunk offsets are always a multiple of it.
+BLOCK_SIZE = 1024 * 1024
+
+CHUNK_SIZE = 8 * BLOCK_SIZE
+
+# Files at least this large are transferred in resumable chunks.
+RESUME_THRESHOLD = 32 * 1024 * 1024
+
+PARTIAL_SUFFIX = ".part"
+
+_HASH_CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    """Progress of a chunked transfer of ``remote`` into a partial file.
+
+    ``size`` and ``mtime`` identify the remote version being copied;
+    ``digest`` is the SHA-256 of the first ``offset`` bytes of the partial.
+    """
+
+    remote: str
+    size: int
+    mtime: int
+    offset: int
+    digest: str
+
+    @staticmethod
+    def path_for(partial: Path) -> Path:
+        """Return where the checkpoint for ``partial`` is stored."""
+
+        return partial.with_name(partial.name + ".json")
+
+    @classmethod
+    def load(cls, partial: Path) -> "Checkpoint | None":
+        """Read the checkpoint for ``partial``, or ``None`` if absent or corrupt."""
+
+        try:
+            data = json.loads(cls.path_for(partial).read_text(encoding="utf-8"))
+            return cls(**data)
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def save(self, partial: Path) -> None:
+        """Atomically write the checkpoint next to ``partial``."""
+
+        path = self.path_for(partial)
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(asdict(self)), encoding="utf-8")
+        temporary.replace(path)
+
+
+def partial_path(destination: Path) -> Path:
+    """Return the partial file used while ``destination`` is being transferred."""
+
+    return destination.with_name(destination.name + PARTIAL_SUFFIX)
+
+
+def discard(partial: Path) -> None:
+    """Remove ``partial`` and its checkpoint."""
+
+    partial.unlink(missing_ok=True)
+    Checkpoint.path_for(partial).unlink(missing_ok=True)
+
+
+def prefix_digest(path: Path, length: int) -> Tuple[Any, int]:
+    """Hash the first ``length`` bytes of ``path``, returning the hash and bytes read."""
+
+    digest = hashlib.sha256()
+    remaining = length
+    with path.open("rb") as handle:
+        while remaining > 0:
+            chunk = handle.read(min(_HASH_CHUNK, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest, length - remaining
+
+
+def chunk_ranges(offset: int, size: int) -> Iterator[Tuple[int, int]]:
+    """Yield ``(offset, length)`` pairs covering ``size`` bytes from ``offset``."""
+
+    while offset < size:
+        length = min(CHUNK_SIZE, size - offset)
+        yield offset, length
+        offset += length
+
+
+def ranged_read_command(remote: str, offset: int, length: int) -> str:
+    """Return a device command printing ``length`` bytes of ``remote`` from ``offset``.
+
+    ``offset`` must be a multiple of :data:`BLOCK_SIZE`.
+    """
+
+    blocks = -(-length // BLOCK_SIZE)
+    return (
+        f"dd if={shlex.quote(remote)} bs={BLOCK_SIZE} skip={offset // BLOCK_SIZE} "
+        f"count={blocks} 2>/dev/null"
+    )
+
+
+def digest_command(remote: str) -> str:
+    """Return a device command printing the SHA-256 of ``remote``."""
+
+    return f"sha256sum {shlex.quote(remote)}"
@@ -0,0 +1,195 @@
+"""Retries, error classification and a per-device circuit breaker for ADB calls.
+
+Transport failures fall into a few classes. Transient ones (a device going
+offline, a timeout, a dropped connection) are worth retrying after a short
+backoff. Permission errors, missing paths and ordinary command failures will
+fail the same way again, so they are raised at once. A device that keeps
+failing transiently trips its circuit breaker. Further calls then fail
+immediately instead of each waiting for a timeout, so one dead handset does
+not hold up the rest of a batch.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Tuple, TypeVar
+
+from .transport import TransportError
+
+OK = "ok"
+TRANSIENT = "transient"
+PERMISSION = "permission"
+MISSING = "missing"
+FAILED = "failed"
+CIRCUIT_OPEN = "circuit-open"
+
+# Checked in order; the first class with a matching fragment wins.
+_PATTERNS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    (
+        TRANSIENT,
+        (
+            "device offline",
+            "device not found",
+            "device '",  # error: device 'SERIAL' not found
+            "no devices",
+            "timed out",
+            "timeout",
+            "connection reset",
+            "connection refused",
+            "connection closed",
+            "error: closed",
+            "broken pipe",
+            "protocol fault",
+        ),
+    ),
+    (
+        PERMISSION,
+        (
+            "permission denied",
+            "operation not permitted",
+            "insufficient permissions",
+            "unauthorized",
+        ),
+    ),
+    (MISSING, ("no such file", "does not exist", "not found")),
+)
+
+T = TypeVar("T")
+
+
+def classify(error: BaseException | str) -> str:
+    """Return the failure class of a transport error or its message.
+
+    The result is :data:`TRANSIENT`, :data:`PERMISSION`, :data:`MISSING` or,
+    for anything else, :data:`FAILED`.
+    """
+
+    message = str(error).lower()
+    for kind, fragments in _PATTERNS:
+        if any(fragment in message for fragment in fragments):
+            return kind
+    return FAILED
+
+
+def format_outcomes(outcomes: Dict[str, int]) -> str:
+    """Return a one-line summary of attempt outcome counts."""
+
+    order = (OK, TRANSIENT, PERMISSION, MISSING, FAILED, CIRCUIT_OPEN)
+    parts = [f"{outcomes[kind]} {kind}" for kind in order if outcomes.get(kind)]
+    return "ADB attempts: " + (", ".join(parts) if parts else "none")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often to retry and when to give up on a device.
+
+    ``attempts`` bounds the tries per call, with delays growing from
+    ``base_delay`` up to ``max_delay`` seconds. After ``breaker_threshold``
+    transient failures in a row a device is skipped for ``breaker_cooldown``
+    seconds.
+    """
+
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    breaker_threshold: int = 5
+    breaker_cooldown: float = 60.0
+
+    def delay(self, attempt: int) -> float:
+        """Return the pause after failed attempt number ``attempt`` (from 0)."""
+
+        return min(self.max_delay, self.base_delay * 2**attempt)
+
+
+class DeviceUnavailableError(TransportError):
+    """Raised without contacting the device while its circuit breaker is open."""
+
+
+class Retrier:
+    """Run transport calls with retries, keeping breaker state per serial.
+
+    One instance can be shared by every extraction in a fleet run; it is
+    safe to use from several threads.
+    """
+
+    def __init__(self, policy: RetryPolicy | None = None) -> None:
+        self.policy = policy or RetryPolicy()
+        self._failures: Dict[str, int] = {}
+        self._opened: Dict[str, float] = {}
+        self._outcomes: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def available(self, serial: str) -> bool:
+        """Return whether calls to ``serial`` are currently allowed."""
+
+        with self._lock:
+            opened = self._opened.get(serial)
+        return opened is None or time.monotonic() - opened >= self.policy.breaker_cooldown
+
+    def call(self, serial: str, operation: Callable[[], T]) -> T:
+        """Return ``operation()``, retrying it while it fails transiently.
+
+        Non-transient :class:`TransportError` failures are raised on the
+        first attempt; :class:`DeviceUnavailableError` is raised while the
+        breaker for ``serial`` is open.
+        """
+
+        attempt = 0
+        while True:
+            if not self.available(serial):
+                self._record(serial, CIRCUIT_OPEN)
+                raise DeviceUnavailableError(
+                    f"{serial} stopped responding; skipping it for "
+                    f"{self.policy.breaker_cooldown:g}s"
+                )
+            try:
+                result = operation()
+            except TransportError as exc:
+                kind = classify(exc)
+                self._record(serial, kind)
+                if kind != TRANSIENT:
+                    self._reset(serial)
+                    raise
+                self._trip(serial)
+                attempt += 1
+                if attempt >= self.policy.attempts:
+                    raise
+                time.sleep(self.policy.delay(attempt - 1))
+                continue
+            self._record(serial, OK)
+            self._reset(serial)
+            return result
+
+    def reset(self, serial: str) -> None:
+        """Close the breaker of ``serial`` and clear its attempt counts.
+
+        Used when a device is re-attached, which makes earlier failures stale.
+        """
+
+        self._reset(serial)
+        with self._lock:
+            self._outcomes.pop(serial, None)
+
+    def outcomes(self, serial: str) -> Dict[str, int]:
+        """Return how many attempts against ``serial`` ended in each outcome."""
+
+        with self._lock:
+            return dict(self._outcomes.get(serial, {}))
+
+    def _record(self, serial: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._outcomes.setdefault(serial, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+    def _trip(self, serial: str) -> None:
+        with self._lock:
+            self._failures[serial] = self._failures.get(serial, 0) + 1
+            if self._failures[serial] >= self.policy.breaker_threshold:
+                self._opened[serial] = time.monotonic()
+
+    def _reset(self, serial: str) -> None:
+        with self._lock:
+            self._failures.pop(serial, None)
+            self._opened.pop(serial, None)
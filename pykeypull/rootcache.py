@@ -0,0 +1,76 @@
+"""Cache of the privilege path that works for each device serial."""
+
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict
+
+ROOT_ADBD = "adbd"
+ROOT_SU = "su"
+
+
+class RootCache:
+    """Remember whether each device is rooted through adbd or ``su``.
+
+    The cache is shared safely between threads. When ``path`` is given it is
+    loaded on creation and rewritten after every change, so the knowledge
+    survives between runs. :meth:`~pykeypull.extractor.Extractor.obtain_root`
+    checks an entry before relying on it and forgets it once it no longer
+    grants root, for example after the device rebooted out of adbd root.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path
+        self._methods: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            self._load()
+
+    def get(self, serial: str) -> str | None:
+        """Return the cached privilege path for ``serial``, if any."""
+
+        with self._lock:
+            return self._methods.get(serial)
+
+    def set(self, serial: str, method: str) -> None:
+        """Record that ``method`` grants root on ``serial``."""
+
+        with self._lock:
+            if self._methods.get(serial) == method:
+                return
+            self._methods[serial] = method
+            self._save()
+
+    def forget(self, serial: str) -> None:
+        """Drop the cached entry for ``serial``."""
+
+        with self._lock:
+            if self._methods.pop(serial, None) is not None:
+                self._save()
+
+    def _load(self) -> None:
+        try:
+            with self.path.open(encoding="utf-8") as handle:
+                methods = json.load(handle).get("devices", {})
+        except (OSError, ValueError, AttributeError):
+            return
+        if not isinstance(methods, dict):
+            return
+        self._methods = {
+            str(serial): method
+            for serial, method in methods.items()
+            if method in (ROOT_ADBD, ROOT_SU)
+        }
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(
+            json.dumps({"devices": self._methods}, indent=2, sort_keys=True),
+            encoding="utf-8",
+        )
+        temporary.replace(self.path)
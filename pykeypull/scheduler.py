@@ -0,0 +1,149 @@
+"""Per-hub scheduling of transfers during fleet extraction.
+
+Devices behind the same USB hub share its bandwidth, so pulling from all of
+them at once only makes every transfer slower. :class:`TransferScheduler`
+groups serials by the hub their USB port hangs off (from ``adb devices -l``)
+and gives each group a bounded number of concurrent transfer slots and an
+optional byte-rate budget. Within a device, :func:`transfer_order` moves
+small locations ahead of large ones so that keyboxes are validated while the
+keystore databases of other devices are still streaming.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence
+
+from .plan import LocationPlan, PlanEntry
+from .transport import Transport, TransportError
+
+# Concurrent transfers per hub; two keep a USB 2.0 hub busy without thrashing it.
+DEFAULT_PER_HUB = 2
+
+# Group of every device when the USB topology cannot be read.
+SHARED_GROUP = "usb:unknown"
+
+
+def hub_of(port: str) -> str:
+    """Return the hub a USB ``port`` such as ``1-1.2`` hangs off (here ``1-1``).
+
+    Ports directly on a root hub (``1-4``) belong to their bus (``1``).
+    """
+
+    parent, _, _ = port.rpartition(".")
+    return parent or port.partition("-")[0]
+
+
+def transfer_order(locations: Sequence[str], plans: Dict[str, LocationPlan]) -> List[str]:
+    """Return ``locations`` with the smallest planned transfers first.
+
+    Locations without a plan keep their relative order after the planned ones.
+    """
+
+    def size(location: str) -> float:
+        plan = plans.get(location)
+        return float("inf") if plan is None else plan.total_size
+
+    return sorted(locations, key=size)
+
+
+def smallest_first(entries: Sequence[PlanEntry]) -> List[PlanEntry]:
+    """Return planned files ordered by size, smallest first."""
+
+    return sorted(entries, key=lambda entry: entry.size)
+
+
+class TransferScheduler:  # pylint: disable=too-many-instance-attributes
+    """Share transfer slots and bandwidth fairly between devices on each hub.
+
+    ``per_hub`` caps the transfers running at once behind one hub and
+    ``bandwidth`` (bytes per second, ``None`` for no limit) caps their
+    combined rate. Devices whose port is unknown, such as network devices,
+    each form their own group. The topology is re-read once for each serial
+    it did not list, so devices attached later are grouped correctly. If it
+    cannot be read at all, every device shares a single group.
+    """
+
+    def __init__(
+        self,
+        transport: Transport,
+        per_hub: int = DEFAULT_PER_HUB,
+        bandwidth: float | None = None,
+    ) -> None:
+        self.transport = transport
+        self.per_hub = max(1, per_hub)
+        self.bandwidth = bandwidth
+        self._ports: Dict[str, str] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._ready: Dict[str, float] = {}
+        self._topology_failed = False
+        self._lock = threading.Lock()
+        # Serialises topology reads without blocking lookups of known serials.
+        self._refresh_lock = threading.Lock()
+
+    def group(self, serial: str) -> str:
+        """Return the scheduling group of ``serial``."""
+
+        with self._lock:
+            known = serial in self._ports or self._topology_failed
+        if not known:
+            with self._refresh_lock:
+                self._refresh(serial)
+        with self._lock:
+            if self._topology_failed:
+                return SHARED_GROUP
+            port = self._ports.get(serial, "")
+        return f"usb:{hub_of(port)}" if port else f"device:{serial}"
+
+    @contextmanager
+    def slot(self, serial: str) -> Iterator[None]:
+        """Hold one of the transfer slots of ``serial``'s group.
+
+        With a :attr:`bandwidth` budget, the slot is only taken once the
+        bytes already transferred in the group fit the budget, so pacing
+        happens before a transfer and never while holding a slot.
+        """
+
+        group = self.group(serial)
+        with self._lock:
+            semaphore = self._slots.setdefault(
+                group, threading.BoundedSemaphore(self.per_hub)
+            )
+            delay = self._ready.get(group, 0.0) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        with semaphore:
+            yield
+
+    def consume(self, serial: str, size: int) -> None:
+        """Account for ``size`` bytes transferred in ``serial``'s group.
+
+        Each group's bytes are spread over time at :attr:`bandwidth`; the
+        next :meth:`slot` in the group waits until that schedule catches up.
+        """
+
+        if not self.bandwidth or size <= 0:
+            return
+        group = self.group(serial)
+        now = time.monotonic()
+        with self._lock:
+            start = max(now, self._ready.get(group, now))
+            self._ready[group] = start + size / self.bandwidth
+
+    def _refresh(self, serial: str) -> None:
+        with self._lock:
+            if serial in self._ports or self._topology_failed:
+                return  # Another thread read the topology meanwhile.
+        try:
+            ports = self.transport.topology()
+        except TransportError as exc:
+            print(f"Could not read the USB topology, scheduling all devices together: {exc}")
+            with self._lock:
+                self._topology_failed = True
+            return
+        # Remember unlisted serials too, so they do not trigger another read.
+        ports.setdefault(serial, "")
+        with self._lock:
+            self._ports.update(ports)
@@ -0,0 +1,210 @@
+"""Output sinks deciding where finished extraction files end up.
+
+Files are always pulled and validated in the extractor's output directory.
+The default :class:`DirectorySink` leaves them there; the archive sinks move
+each file into one archive per device as soon as its location is done, keyed
+by the original remote path, so a fleet run produces a handful of archives
+instead of millions of small files. Both archive formats carry an index that
+lets :func:`read_member` fetch a single file without unpacking the rest.
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Type
+
+DIRECTORY = "directory"
+INDEX_SUFFIX = ".index.json"
+
+
+class Sink:
+    """Receives each finished file together with the remote path it came from."""
+
+    def __init__(self, output: Path) -> None:
+        self.output = Path(output)
+
+    @property
+    def path(self) -> Path:
+        """Return where the extraction ends up."""
+
+        return self.output
+
+    def add(self, remote: str, local: Path) -> None:
+        """Take ownership of ``local``, which holds the contents of ``remote``."""
+
+    def close(self) -> None:
+        """Finish writing; called once the extraction is complete."""
+
+
+class DirectorySink(Sink):
+    """Keep every file as a loose file in the output directory."""
+
+
+def _member_name(remote: str) -> str:
+    return remote.lstrip("/")
+
+
+class ZipSink(Sink):
+    """Write every file into ``<output>.zip``; the central directory is the index.
+
+    The archive is rebuilt on every run: members written again replace their
+    old copies and the rest are carried over when the sink is closed.
+    """
+
+    suffix = ".zip"
+
+    def __init__(self, output: Path) -> None:
+        super().__init__(output)
+        self._archive: zipfile.ZipFile | None = None
+
+    @property
+    def path(self) -> Path:
+        return self.output.with_name(self.output.name + self.suffix)
+
+    def add(self, remote: str, local: Path) -> None:
+        if self._archive is None:
+            # Kept open across add() calls and closed in close().
+            self._archive = zipfile.ZipFile(  # pylint: disable=consider-using-with
+                _partial(self.path), "w", zipfile.ZIP_DEFLATED
+            )
+        self._archive.write(local, _member_name(remote))
+        local.unlink()
+
+    def close(self) -> None:
+        if self._archive is not None:
+            written = set(self._archive.namelist())
+            if self.path.exists():
+                with zipfile.ZipFile(self.path) as previous:
+                    for info in previous.infolist():
+                        if info.filename not in written:
+                            self._archive.writestr(info, previous.read(info))
+            self._archive.close()
+            self._archive = None
+            _partial(self.path).replace(self.path)
+        _remove_if_empty(self.output)
+
+
+class TarSink(Sink):
+    """Write every file into ``<output>.tar`` with a JSON index of data offsets.
+
+    The index sits next to the archive as ``<output>.tar.index.json`` and maps
+    each member to the offset and size of its data. Like :class:`ZipSink`,
+    the archive is rebuilt on every run without duplicate members.
+    """
+
+    suffix = ".tar"
+
+    def __init__(self, output: Path) -> None:
+        super().__init__(output)
+        self._archive: tarfile.TarFile | None = None
+        self._index: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def path(self) -> Path:
+        return self.output.with_name(self.output.name + self.suffix)
+
+    @property
+    def index_path(self) -> Path:
+        """Return where the member index is written."""
+
+        return self.path.with_name(self.path.name + INDEX_SUFFIX)
+
+    def add(self, remote: str, local: Path) -> None:
+        if self._archive is None:
+            # Kept open across add() calls and closed in close().
+            self._archive = tarfile.open(  # pylint: disable=consider-using-with
+                _partial(self.path), "w", format=tarfile.PAX_FORMAT
+            )
+            self._index = {}
+        with local.open("rb") as handle:
+            self._append(self._archive.gettarinfo(local, _member_name(remote)), handle)
+        local.unlink()
+
+    def close(self) -> None:
+        if self._archive is not None:
+            if self.path.exists():
+                with tarfile.open(self.path) as previous:
+                    for info in previous:
+                        if info.isfile() and info.name not in self._index:
+                            self._append(info, previous.extractfile(info))
+            self._archive.close()
+            self._archive = None
+            _partial(self.path).replace(self.path)
+            temporary = _partial(self.index_path)
+            temporary.write_text(
+                json.dumps({"members": self._index}, indent=2, sort_keys=True),
+                encoding="utf-8",
+            )
+            temporary.replace(self.index_path)
+        _remove_if_empty(self.output)
+
+    def _append(self, info: tarfile.TarInfo, handle: BinaryIO) -> None:
+        header = info.tobuf(self._archive.format, self._archive.encoding, self._archive.errors)
+        offset = self._archive.offset + len(header)
+        self._archive.addfile(info, handle)
+        self._index[info.name] = {"offset": offset, "size": info.size}
+
+
+SINKS: Dict[str, Type[Sink]] = {
+    DIRECTORY: DirectorySink,
+    "zip": ZipSink,
+    "tar": TarSink,
+}
+
+
+def _partial(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def _remove_if_empty(directory: Path) -> None:
+    try:
+        directory.rmdir()
+    except OSError:
+        pass
+
+
+def _load_tar_index(path: Path) -> Dict[str, Dict[str, int]]:
+    try:
+        members = json.loads(path.read_text(encoding="utf-8")).get("members", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+    return members if isinstance(members, dict) else {}
+
+
+def list_members(archive: Path) -> List[str]:
+    """Return the remote paths (without the leading ``/``) stored in ``archive``."""
+
+    archive = Path(archive)
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as handle:
+            return sorted(handle.namelist())
+    return sorted(_load_tar_index(archive.with_name(archive.name + INDEX_SUFFIX)))
+
+
+def read_member(archive: Path, name: str, sink: BinaryIO) -> None:
+    """Copy member ``name`` of ``archive`` into ``sink`` without unpacking the rest.
+
+    ``name`` is the remote path, with or without its leading ``/``. Raises
+    :class:`KeyError` when the member does not exist.
+    """
+
+    archive = Path(archive)
+    name = _member_name(name)
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as handle, handle.open(name) as member:
+            shutil.copyfileobj(member, sink)
+        return
+    entry = _load_tar_index(archive.with_name(archive.name + INDEX_SUFFIX))[name]
+    with archive.open("rb") as handle:
+        handle.seek(entry["offset"])
+        remaining = entry["size"]
+        while remaining > 0:
+            chunk = handle.read(min(1024 * 1024, remaining))
+            if not chunk:
+                break
+            sink.write(chunk)
+            remaining -= len(chunk)
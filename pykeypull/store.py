@@ -0,0 +1,123 @@
+"""Content-addressed storage for extracted files.
+
+Blobs are saved once under their SHA-256 digest and every extracted file is
+a hardlink to its blob, so identical files pulled from many devices only use
+disk space once. Filesystems without hardlink support fall back to copies.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class _HashingWriter:  # pylint: disable=too-few-public-methods
+    """Writable file that hashes everything written through it."""
+
+    def __init__(self, output: BinaryIO) -> None:
+        self._output = output
+        self.digest = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        """Hash ``data`` and write it to the underlying file."""
+
+        self.digest.update(data)
+        return self._output.write(data)
+
+
+class ContentStore:
+    """Deduplicating blob store rooted at ``root``.
+
+    A store may be shared by several extractors (for example across a fleet
+    run); object creation is atomic, so concurrent writers are safe.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self.new_objects = 0
+        self.reused_objects = 0
+        self.reused_bytes = 0
+        self._lock = threading.Lock()
+
+    def object_path(self, digest: str) -> Path:
+        """Return where the blob with ``digest`` is (or would be) stored."""
+
+        return self.root / "objects" / digest[:2] / digest[2:]
+
+    def write_stream(self, source: BinaryIO, destination: Path) -> str:
+        """Store ``source`` while hashing it and link ``destination`` to the blob.
+
+        The data is written to a temporary file inside the store as it
+        arrives; once complete it either becomes a new blob or is discarded in
+        favour of an identical existing one. Returns the hex digest.
+        """
+
+        with self.writer(destination) as output:
+            shutil.copyfileobj(source, output, _CHUNK_SIZE)
+        return output.digest.hexdigest()
+
+    @contextmanager
+    def writer(self, destination: Path) -> Iterator[_HashingWriter]:
+        """Yield a file to write a blob into, for producers that push their data.
+
+        When the block finishes the blob is stored and ``destination`` linked
+        to it as in :meth:`write_stream`; if it raises, nothing is stored.
+        """
+
+        handle, temporary = tempfile.mkstemp(dir=self._staging())
+        try:
+            with os.fdopen(handle, "wb") as output:
+                writer = _HashingWriter(output)
+                yield writer
+            self._commit(Path(temporary), writer.digest.hexdigest(), destination)
+        finally:
+            Path(temporary).unlink(missing_ok=True)
+
+    def adopt(self, path: Path) -> str:
+        """Move an already written file into the store and link it back in place."""
+
+        digest = hashlib.sha256()
+        with path.open("rb") as source:
+            for chunk in iter(lambda: source.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        handle, temporary = tempfile.mkstemp(dir=self._staging())
+        os.close(handle)
+        try:
+            shutil.move(path, temporary)
+            return self._commit(Path(temporary), digest.hexdigest(), path)
+        finally:
+            Path(temporary).unlink(missing_ok=True)
+
+    def _staging(self) -> Path:
+        staging = self.root / "tmp"
+        staging.mkdir(parents=True, exist_ok=True)
+        return staging
+
+    def _commit(self, temporary: Path, digest: str, destination: Path) -> str:
+        target = self.object_path(digest)
+        size = temporary.stat().st_size
+        with self._lock:
+            if target.exists():
+                self.reused_objects += 1
+                self.reused_bytes += size
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                # Blobs are shared between devices, so they must never be edited in place.
+                temporary.chmod(0o444)
+                temporary.replace(target)
+                self.new_objects += 1
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.unlink(missing_ok=True)
+        try:
+            os.link(target, destination)
+        except OSError:
+            shutil.copyfile(target, destination)
+        return digest
@@ -0,0 +1,378 @@
+"""Transports used by :class:`~pykeypull.extractor.Extractor` to reach devices.
+
+:class:`SubprocessTransport` runs the ``adb`` executable for every operation,
+matching the behaviour of the original Go tool. :class:`SocketTransport`
+speaks the ADB host protocol directly to the local ADB server and reuses one
+sync connection per device.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Sequence, Tuple
+
+from .adbclient import DEFAULT_HOST, DEFAULT_PORT, AdbClient, AdbProtocolError
+
+
+class TransportError(RuntimeError):
+    """Raised when a device operation fails; the message describes the cause."""
+
+
+def parse_devices_output(output: str) -> List[Tuple[str, str]]:
+    """Parse ``adb devices`` output into ``(serial, state)`` pairs."""
+
+    devices: List[Tuple[str, str]] = []
+    for line in output.splitlines():
+        line = line.strip()
+        if not line or line.startswith("List of devices"):
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            devices.append((parts[0], parts[1]))
+    return devices
+
+
+def parse_topology_output(output: str) -> Dict[str, str]:
+    """Parse ``adb devices -l`` output into a serial to USB port mapping.
+
+    Ports look like ``1-1.2`` (bus 1, root port 1, hub port 2); devices
+    without a ``usb:`` field, such as network devices, map to ``""``.
+    """
+
+    ports: Dict[str, str] = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) < 2 or line.startswith("List of devices"):
+            continue
+        ports[parts[0]] = next(
+            (part[len("usb:"):] for part in parts[2:] if part.startswith("usb:")), ""
+        )
+    return ports
+
+
+class Transport:
+    """Interface shared by every device transport."""
+
+    def start_server(self) -> None:
+        """Make sure an ADB server is available."""
+
+        raise NotImplementedError
+
+    def devices(self) -> List[Tuple[str, str]]:
+        """Return ``(serial, state)`` pairs for every attached device."""
+
+        raise NotImplementedError
+
+    def topology(self) -> Dict[str, str]:
+        """Return the USB port of every attached device (see :func:`parse_topology_output`)."""
+
+        raise NotImplementedError
+
+    def root(self, serial: str) -> None:
+        """Restart adbd on ``serial`` with root privileges."""
+
+        raise NotImplementedError
+
+    def shell(self, serial: str, args: Sequence[str]) -> str:
+        """Run a shell command on ``serial`` and return its decoded stdout."""
+
+        raise NotImplementedError
+
+    def pull(self, serial: str, remote: str, local: Path) -> None:
+        """Copy the remote file ``remote`` to ``local``."""
+
+        raise NotImplementedError
+
+    def exec_out(self, serial: str, command: str) -> Iterator[BinaryIO]:
+        """Context manager yielding the raw stdout stream of ``command``."""
+
+        raise NotImplementedError
+
+    def track_devices(self) -> Iterator[List[Tuple[str, str]]]:
+        """Yield the full ``(serial, state)`` list each time it changes.
+
+        The first list describes the devices attached when tracking starts;
+        iteration ends when the ADB server goes away.
+        """
+
+        raise NotImplementedError
+
+
+def _timed_out(exc: subprocess.TimeoutExpired) -> TransportError:
+    return TransportError(f"adb {exc.cmd[3]} timed out after {exc.timeout:g}s")
+
+
+class _WatchedStream:
+    """Output of an ``adb exec-out`` process that is killed once it stalls.
+
+    A watchdog thread kills ``process`` when no read has returned for
+    ``timeout`` seconds; the read that was waiting then raises
+    :class:`TransportError`, which the retry policy treats as transient.
+    """
+
+    def __init__(self, process: subprocess.Popen, timeout: float) -> None:
+        self._process = process
+        self._timeout = timeout
+        self._last_read = time.monotonic()
+        self._expired = False
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def read(self, size: int = -1) -> bytes:
+        """Read from the process, failing if the watchdog had to kill it."""
+
+        data = self._process.stdout.read(size)
+        self._last_read = time.monotonic()
+        if self._expired:
+            raise TransportError(f"adb exec-out timed out after {self._timeout:g}s without data")
+        return data
+
+    def stop(self) -> None:
+        """Stop watching; the process is finished or about to be."""
+
+        self._done.set()
+        self._thread.join()
+
+    def _watch(self) -> None:
+        while not self._done.wait(max(0.0, self._last_read + self._timeout - time.monotonic())):
+            if time.monotonic() - self._last_read >= self._timeout:
+                self._expired = True
+                self._process.kill()
+                return
+
+
+class SubprocessTransport(Transport):
+    """Transport that forks the ``adb`` executable for each operation.
+
+    With ``timeout`` set, ``root``, ``shell`` and ``pull`` calls that take
+    longer than that many seconds are killed and fail as timed out, and so
+    are ``exec_out`` streams that deliver no data for that long.
+    """
+
+    def __init__(self, adb_path: str = "adb", timeout: float | None = None) -> None:
+        self.adb_path = adb_path
+        self.timeout = timeout
+
+    def start_server(self) -> None:
+        try:
+            subprocess.run(
+                [self.adb_path, "start-server"],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except subprocess.CalledProcessError as exc:
+            raise TransportError(exc.stderr.decode().strip()) from exc
+
+    def devices(self) -> List[Tuple[str, str]]:
+        try:
+            result = subprocess.run(
+                [self.adb_path, "devices"],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+        except subprocess.CalledProcessError as exc:
+            raise TransportError(exc.stderr.strip()) from exc
+        return parse_devices_output(result.stdout)
+
+    def topology(self) -> Dict[str, str]:
+        try:
+            result = subprocess.run(
+                [self.adb_path, "devices", "-l"],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+        except subprocess.CalledProcessError as exc:
+            raise TransportError(exc.stderr.strip()) from exc
+        return parse_topology_output(result.stdout)
+
+    def root(self, serial: str) -> None:
+        try:
+            subprocess.run(
+                [self.adb_path, "-s", serial, "root"],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=self.timeout,
+            )
+        except subprocess.CalledProcessError as exc:
+            raise TransportError(exc.stderr.decode().strip()) from exc
+        except subprocess.TimeoutExpired as exc:
+            raise _timed_out(exc) from exc
+
+    def shell(self, serial: str, args: Sequence[str]) -> str:
+        try:
+            result = subprocess.run(
+                [self.adb_path, "-s", serial, "shell", *args],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=self.timeout,
+            )
+        except subprocess.CalledProcessError as exc:
+            raise TransportError((exc.stderr or "").strip()) from exc
+        except subprocess.TimeoutExpired as exc:
+            raise _timed_out(exc) from exc
+        return result.stdout
+
+    def pull(self, serial: str, remote: str, local: Path) -> None:
+        try:
+            subprocess.run(
+                [self.adb_path, "-s", serial, "pull", remote, str(local)],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=self.timeout,
+            )
+        except subprocess.CalledProcessError as exc:
+            raise TransportError(exc.stderr.decode().strip()) from exc
+        except subprocess.TimeoutExpired as exc:
+            raise _timed_out(exc) from exc
+
+    @contextmanager
+    def exec_out(self, serial: str, command: str) -> Iterator[BinaryIO]:
+        with subprocess.Popen(
+            [self.adb_path, "-s", serial, "exec-out", command],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ) as process:
+            if self.timeout is None:
+                stream: BinaryIO | _WatchedStream = process.stdout
+            else:
+                stream = _WatchedStream(process, self.timeout)
+            try:
+                yield stream
+            finally:
+                try:
+                    # Drain anything left so adb can exit cleanly.
+                    stream.read()
+                finally:
+                    if isinstance(stream, _WatchedStream):
+                        stream.stop()
+
+    def track_devices(self) -> Iterator[List[Tuple[str, str]]]:
+        with subprocess.Popen(
+            [self.adb_path, "track-devices"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ) as process:
+            try:
+                # Each update is the device list prefixed with its length in hex.
+                while len(header := process.stdout.read(4)) == 4:
+                    payload = process.stdout.read(int(header, 16))
+                    yield parse_devices_output(payload.decode("utf-8", "replace"))
+            finally:
+                process.kill()
+
+
+class SocketTransport(Transport):
+    """Transport that talks to the ADB server socket without forking ``adb``.
+
+    ``start_server`` only falls back to running ``adb start-server`` when no
+    server is listening yet. ``timeout`` bounds, in seconds, how long any
+    single read from the server may stall. Protocol errors and socket errors
+    such as a reset connection are both raised as :class:`TransportError`.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        adb_path: str = "adb",
+        client: AdbClient | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        self.client = client or AdbClient(host=host, port=port, timeout=timeout)
+        self.adb_path = adb_path
+
+    def start_server(self) -> None:
+        try:
+            self.client.version()
+        except AdbProtocolError:
+            SubprocessTransport(self.adb_path).start_server()
+        except OSError as exc:
+            # The server accepted the connection but dropped or stalled the reply.
+            raise TransportError(str(exc)) from exc
+
+    def devices(self) -> List[Tuple[str, str]]:
+        try:
+            return self.client.devices()
+        except (AdbProtocolError, OSError) as exc:
+            raise TransportError(str(exc)) from exc
+
+    def topology(self) -> Dict[str, str]:
+        try:
+            return parse_topology_output(self.client.devices_long())
+        except (AdbProtocolError, OSError) as exc:
+            raise TransportError(str(exc)) from exc
+
+    def root(self, serial: str) -> None:
+        try:
+            self.client.root(serial)
+        except (AdbProtocolError, OSError) as exc:
+            raise TransportError(str(exc)) from exc
+        # adbd restarts after switching to root, invalidating open connections.
+        self.client.drop_sync(serial)
+
+    def shell(self, serial: str, args: Sequence[str]) -> str:
+        try:
+            status, stdout, stderr = self.client.shell(serial, " ".join(args))
+        except (AdbProtocolError, OSError) as exc:
+            raise TransportError(str(exc)) from exc
+        if status != 0:
+            raise TransportError(stderr.decode("utf-8", "replace").strip())
+        return stdout.decode("utf-8", "replace")
+
+    def pull(self, serial: str, remote: str, local: Path) -> None:
+        try:
+            with local.open("wb") as handle:
+                self.pull_stream(serial, remote, handle)
+        except OSError as exc:
+            raise TransportError(str(exc)) from exc
+        except TransportError:
+            local.unlink(missing_ok=True)
+            raise
+
+    def pull_stream(self, serial: str, remote: str, handle: BinaryIO) -> None:
+        """Write the remote file ``remote`` into ``handle`` as it arrives."""
+
+        try:
+            self.client.sync(serial).recv(remote, handle)
+        except (AdbProtocolError, OSError) as exc:
+            # A transfer broken mid-stream has already closed the connection.
+            raise TransportError(str(exc)) from exc
+
+    @contextmanager
+    def exec_out(self, serial: str, command: str) -> Iterator[BinaryIO]:
+        try:
+            sock = self.client.exec_out(serial, command)
+        except (AdbProtocolError, OSError) as exc:
+            raise TransportError(str(exc)) from exc
+        with sock, sock.makefile("rb") as stream:
+            try:
+                yield stream
+            except TimeoutError as exc:
+                raise TransportError(f"exec-out timed out: {exc}") from exc
+            except OSError as exc:
+                raise TransportError(f"exec-out failed: {exc}") from exc
+
+    def track_devices(self) -> Iterator[List[Tuple[str, str]]]:
+        try:
+            yield from self.client.track_devices()
+        except (AdbProtocolError, OSError) as exc:
+            raise TransportError(str(exc)) from exc
+
+    def close(self) -> None:
+        """Close every cached device connection."""
+
+        self.client.close()
@@ -0,0 +1,433 @@
+"""Structural and cryptographic consistency checks for parsed keyboxes.
+
+Validation in :mod:`pykeypull.keybox` only checks that a document parses.
+The :class:`Verifier` here goes further: declared counts must match the real
+elements, each certificate chain must link issuer to subject, and every
+private key must match the public key of its leaf certificate.
+
+Certificates are decoded with a small DER reader, so no third-party
+dependency is needed. Decoded certificates are memoised by SHA-256
+fingerprint in an LRU cache; shared intermediates and roots are therefore
+only parsed once per process no matter how many keyboxes reference them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, List, Tuple, Union
+
+from .keybox import (
+    Attestation,
+    Certificate,
+    Key,
+    Keybox,
+    KeyboxValidationError,
+    PrivateKey,
+    iter_document,
+)
+
+DEFAULT_CACHE_SIZE = 4096
+
+_SEQUENCE = 0x30
+_INTEGER = 0x02
+_BIT_STRING = 0x03
+_OCTET_STRING = 0x04
+_OBJECT_IDENTIFIER = 0x06
+_CONTEXT_0 = 0xA0
+_CONTEXT_1 = 0xA1
+
+_OID_RSA = bytes.fromhex("2a864886f70d010101")
+_OID_EC = bytes.fromhex("2a8648ce3d0201")
+
+
+class _DerError(ValueError):
+    """Raised when DER input is truncated or malformed."""
+
+
+@dataclass(frozen=True)
+class _Curve:
+    name: str
+    p: int
+    a: int
+    b: int
+    gx: int
+    gy: int
+
+    @property
+    def size(self) -> int:
+        """Return the coordinate length in bytes."""
+
+        return (self.p.bit_length() + 7) // 8
+
+
+_CURVES = {
+    bytes.fromhex("2a8648ce3d030107"): _Curve(
+        name="P-256",
+        p=2**256 - 2**224 + 2**192 + 2**96 - 1,
+        a=-3,
+        b=0x5AC635D8AA3A93E7B3EBBD55769886BC651D06B0CC53B0F63BCE3C3E27D2604B,
+        gx=0x6B17D1F2E12C4247F8BCE6E563A440F277037D812DEB33A0F4A13945D898C296,
+        gy=0x4FE342E2FE1A7F9B8EE7EB4A7C0F9E162BCE33576B315ECECBB6406837BF51F5,
+    ),
+    bytes.fromhex("2b81040022"): _Curve(
+        name="P-384",
+        p=2**384 - 2**128 - 2**96 + 2**32 - 1,
+        a=-3,
+        b=int(
+            "B3312FA7E23EE7E4988E056BE3F82D19181D9C6EFE8141120314088F"
+            "5013875AC656398D8A2ED19D2A85C8EDD3EC2AEF",
+            16,
+        ),
+        gx=int(
+            "AA87CA22BE8B05378EB1C71EF320AD746E1D3B628BA79B9859F741E0"
+            "82542A385502F25DBF55296C3A545E3872760AB7",
+            16,
+        ),
+        gy=int(
+            "3617DE4A96262C6F5D9E98BF9292DC29F8F41DBD289A147CE9DA3113"
+            "B5F0B8C00A60B1CE1D7E819D7A431D7C90EA0E5F",
+            16,
+        ),
+    ),
+}
+
+
+# ----------------------------------------------------------------------
+# DER decoding
+def _read_tlv(data: bytes, offset: int) -> Tuple[int, int, int]:
+    """Return ``(tag, content_start, content_end)`` for the TLV at ``offset``."""
+
+    if offset + 2 > len(data):
+        raise _DerError("truncated DER element")
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7F
+        if count == 0 or count > 4 or offset + count > len(data):
+            raise _DerError("unsupported DER length")
+        length = int.from_bytes(data[offset:offset + count], "big")
+        offset += count
+    end = offset + length
+    if end > len(data):
+        raise _DerError("truncated DER element")
+    return tag, offset, end
+
+
+def _children(data: bytes, start: int, end: int) -> List[Tuple[int, int, int, int]]:
+    """Return ``(tag, header_start, content_start, content_end)`` for each child."""
+
+    children = []
+    offset = start
+    while offset < end:
+        tag, content_start, content_end = _read_tlv(data, offset)
+        children.append((tag, offset, content_start, content_end))
+        offset = content_end
+    return children
+
+
+def _sequence(data: bytes, start: int = 0) -> List[Tuple[int, int, int, int]]:
+    tag, content_start, content_end = _read_tlv(data, start)
+    if tag != _SEQUENCE:
+        raise _DerError("expected a SEQUENCE")
+    return _children(data, content_start, content_end)
+
+
+def _integer(data: bytes, child: Tuple[int, int, int, int]) -> int:
+    tag, _, start, end = child
+    if tag != _INTEGER:
+        raise _DerError("expected an INTEGER")
+    return int.from_bytes(data[start:end], "big", signed=True)
+
+
+# ----------------------------------------------------------------------
+# Certificates and keys
+@dataclass(frozen=True, slots=True)
+class PublicKey:
+    """Public key material in a form that can be compared across encodings."""
+
+    algorithm: str
+    curve: bytes = b""
+    point: bytes = b""
+    modulus: int = 0
+    exponent: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class CertificateInfo:
+    """The parts of an X.509 certificate needed for chain and key checks."""
+
+    fingerprint: str
+    issuer: bytes
+    subject: bytes
+    public_key: PublicKey
+
+
+def _parse_public_key(data: bytes, start: int) -> PublicKey:
+    fields = _sequence(data, start)
+    algorithm, bit_string = fields[0], fields[1]
+    if bit_string[0] != _BIT_STRING:
+        raise _DerError("expected a BIT STRING public key")
+    key_bytes = data[bit_string[2] + 1:bit_string[3]]
+    identifier = _children(data, algorithm[2], algorithm[3])
+    oid = data[identifier[0][2]:identifier[0][3]]
+    if oid == _OID_EC:
+        curve = b""
+        if len(identifier) > 1 and identifier[1][0] == _OBJECT_IDENTIFIER:
+            curve = data[identifier[1][2]:identifier[1][3]]
+        return PublicKey(algorithm="ec", curve=curve, point=key_bytes)
+    if oid == _OID_RSA:
+        numbers = _sequence(key_bytes)
+        return PublicKey(
+            algorithm="rsa",
+            modulus=_integer(key_bytes, numbers[0]),
+            exponent=_integer(key_bytes, numbers[1]),
+        )
+    return PublicKey(algorithm=oid.hex(), point=key_bytes)
+
+
+def inspect_certificate(der: bytes) -> CertificateInfo:
+    """Decode the issuer, subject and public key of a DER certificate."""
+
+    try:
+        certificate = _sequence(der)
+        tbs = _children(der, certificate[0][2], certificate[0][3])
+        if tbs and tbs[0][0] == _CONTEXT_0:
+            tbs = tbs[1:]
+        if len(tbs) < 6:
+            raise _DerError("TBSCertificate is missing fields")
+        issuer, subject, spki = tbs[2], tbs[4], tbs[5]
+        return CertificateInfo(
+            fingerprint=hashlib.sha256(der).hexdigest(),
+            issuer=der[issuer[1]:issuer[3]],
+            subject=der[subject[1]:subject[3]],
+            public_key=_parse_public_key(der, spki[1]),
+        )
+    except (_DerError, IndexError) as exc:
+        raise KeyboxValidationError(f"Certificate is not valid DER X.509: {exc}") from exc
+
+
+def _ec_multiply(curve: _Curve, scalar: int) -> Tuple[int, int]:
+    """Return ``scalar * G`` on ``curve`` using double-and-add."""
+
+    def add(first, second):
+        if first is None:
+            return second
+        if second is None:
+            return first
+        if first[0] == second[0] and (first[1] + second[1]) % curve.p == 0:
+            return None
+        if first == second:
+            slope = (3 * first[0] * first[0] + curve.a) * pow(2 * first[1], -1, curve.p)
+        else:
+            slope = (second[1] - first[1]) * pow(second[0] - first[0], -1, curve.p)
+        slope %= curve.p
+        x = (slope * slope - first[0] - second[0]) % curve.p
+        return x, (slope * (first[0] - x) - first[1]) % curve.p
+
+    result = None
+    addend = (curve.gx, curve.gy)
+    while scalar:
+        if scalar & 1:
+            result = add(result, addend)
+        addend = add(addend, addend)
+        scalar >>= 1
+    if result is None:
+        raise _DerError("private scalar is zero")
+    return result
+
+
+def _encode_point(curve: _Curve, point: Tuple[int, int], compressed: bool) -> bytes:
+    x = point[0].to_bytes(curve.size, "big")
+    if compressed:
+        return bytes([2 + (point[1] & 1)]) + x
+    return b"\x04" + x + point[1].to_bytes(curve.size, "big")
+
+
+def _private_public_key(der: bytes, leaf: PublicKey) -> PublicKey:
+    """Derive the public half of a SEC1, PKCS#1 or PKCS#8 private key."""
+
+    fields = _sequence(der)
+    if len(fields) >= 3 and fields[1][0] == _SEQUENCE and fields[2][0] == _OCTET_STRING:
+        # PKCS#8 wrapper: unwrap and inspect the inner key.
+        return _private_public_key(der[fields[2][2]:fields[2][3]], leaf)
+    if len(fields) >= 9 and fields[1][0] == _INTEGER:
+        return PublicKey(
+            algorithm="rsa",
+            modulus=_integer(der, fields[1]),
+            exponent=_integer(der, fields[2]),
+        )
+    if len(fields) >= 2 and fields[1][0] == _OCTET_STRING:
+        curve_oid = leaf.curve
+        for tag, _, start, end in fields[2:]:
+            inner = _children(der, start, end)
+            if tag == _CONTEXT_0 and inner and inner[0][0] == _OBJECT_IDENTIFIER:
+                curve_oid = der[inner[0][2]:inner[0][3]]
+            if tag == _CONTEXT_1 and inner and inner[0][0] == _BIT_STRING:
+                point = der[inner[0][2] + 1:inner[0][3]]
+                return PublicKey(algorithm="ec", curve=curve_oid, point=point)
+        curve = _CURVES.get(curve_oid)
+        if curve is None:
+            raise _DerError("unsupported elliptic curve")
+        scalar = int.from_bytes(der[fields[1][2]:fields[1][3]], "big")
+        compressed = leaf.point[:1] in (b"\x02", b"\x03")
+        point = _encode_point(curve, _ec_multiply(curve, scalar), compressed)
+        return PublicKey(algorithm="ec", curve=curve_oid, point=point)
+    raise _DerError("unrecognised private key structure")
+
+
+def _keys_match(private: PublicKey, leaf: PublicKey) -> bool:
+    if private.algorithm != leaf.algorithm:
+        return False
+    if private.algorithm == "rsa":
+        return (private.modulus, private.exponent) == (leaf.modulus, leaf.exponent)
+    return private.point == leaf.point and (not private.curve or private.curve == leaf.curve)
+
+
+# ----------------------------------------------------------------------
+# Verification engine
+@dataclass
+class VerificationResult:
+    """Problems found while verifying one keybox."""
+
+    device_id: str
+    issues: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """Return whether the keybox passed every check."""
+
+        return not self.issues
+
+
+class Verifier:
+    """Verify keyboxes, memoising decoded certificates by fingerprint.
+
+    A single instance should be reused for a whole corpus so that the cache
+    can absorb the certificates shared between keyboxes.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, CertificateInfo | str]" = OrderedDict()
+
+    def certificate_info(self, certificate: Certificate) -> CertificateInfo:
+        """Return the decoded form of ``certificate``, consulting the LRU cache.
+
+        Decoding failures are cached too, so a broken shared certificate is
+        only reported once per fingerprint.
+        """
+
+        der = certificate.der
+        fingerprint = hashlib.sha256(der).hexdigest()
+        cached = self._cache.get(fingerprint)
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(fingerprint)
+        else:
+            self.misses += 1
+            try:
+                cached = inspect_certificate(der)
+            except KeyboxValidationError as exc:
+                cached = str(exc)
+            self._cache[fingerprint] = cached
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        if isinstance(cached, str):
+            raise KeyboxValidationError(cached)
+        return cached
+
+    def verify_key(self, key: Key) -> List[str]:
+        """Return the problems found in a single key entry."""
+
+        issues: List[str] = []
+        label = key.algorithm or "unknown"
+        chain = key.certificate_chain
+        if chain.number_of_certificates != len(chain.certificates):
+            issues.append(
+                f"{label} key declares {chain.number_of_certificates} certificate(s) "
+                f"but contains {len(chain.certificates)}"
+            )
+        if not chain.certificates:
+            issues.append(f"{label} key has an empty certificate chain")
+            return issues
+
+        infos: List[CertificateInfo | None] = []
+        for index, certificate in enumerate(chain.certificates, start=1):
+            try:
+                infos.append(self.certificate_info(certificate))
+            except KeyboxValidationError as exc:
+                issues.append(f"{label} certificate {index}: {exc}")
+                infos.append(None)
+
+        for index, (child, parent) in enumerate(zip(infos, infos[1:]), start=1):
+            if child is not None and parent is not None and child.issuer != parent.subject:
+                issues.append(
+                    f"{label} certificate {index} is not issued by certificate {index + 1}"
+                )
+
+        if infos[0] is not None:
+            issue = self._check_private_key(key.private_key, infos[0].public_key)
+            if issue:
+                issues.append(f"{label} {issue}")
+        return issues
+
+    def verify_keybox(self, keybox: Keybox) -> VerificationResult:
+        """Verify every key of ``keybox``."""
+
+        result = VerificationResult(device_id=keybox.device_id)
+        for key in keybox.keys:
+            result.issues.extend(self.verify_key(key))
+        return result
+
+    def verify_attestation(self, attestation: Attestation) -> List[VerificationResult]:
+        """Verify an already parsed attestation, including its keybox count."""
+
+        results = [self.verify_keybox(keybox) for keybox in attestation.keyboxes]
+        if attestation.number_of_keyboxes != len(attestation.keyboxes):
+            results.insert(0, _count_mismatch(attestation.number_of_keyboxes, len(results)))
+        return results
+
+    def verify_file(self, source: Union[Path, BinaryIO]) -> List[VerificationResult]:
+        """Stream and verify a keybox file without holding it in memory.
+
+        Only keyboxes with problems are returned, plus a leading result for
+        a ``NumberOfKeyboxes`` mismatch.
+        """
+
+        declared = 0
+        seen = 0
+        failures: List[VerificationResult] = []
+        for item in iter_document(source):
+            if isinstance(item, Keybox):
+                seen += 1
+                result = self.verify_keybox(item)
+                if not result.ok:
+                    failures.append(result)
+            else:
+                declared = item
+        if declared != seen:
+            failures.insert(0, _count_mismatch(declared, seen))
+        return failures
+
+    @staticmethod
+    def _check_private_key(private_key: PrivateKey, leaf: PublicKey) -> str | None:
+        try:
+            derived = _private_public_key(private_key.der, leaf)
+        except (_DerError, IndexError, KeyboxValidationError) as exc:
+            return f"private key could not be decoded: {exc}"
+        if not _keys_match(derived, leaf):
+            return "private key does not match the leaf certificate"
+        return None
+
+
+def _count_mismatch(declared: int, actual: int) -> VerificationResult:
+    return VerificationResult(
+        device_id="",
+        issues=[f"NumberOfKeyboxes declares {declared} keybox(es) but {actual} found"],
+    )
@@ -0,0 +1,129 @@
+"""Hot-plug mode: extract from each device as soon as it is attached.
+
+:class:`DeviceWatcher` follows ``track-devices`` on the ADB server and hands
+every newly attached serial to a bounded worker pool. Everything that is
+expensive to set up (the transport and its open connections, the root-method
+and location caches, the content store, the inventory and the metrics) is
+created once and shared by every extraction, so the time from plug-in to a
+validated extraction is dominated by the transfer itself. Per-device state
+that a re-attachment makes stale is not trusted: the device's circuit breaker
+is reset, and a cached root method is checked again before it is used.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Set
+
+from .extractor import ExtractionError
+from .fleet import DEFAULT_MAX_WORKERS, DeviceResult, device_directory, extract_device
+from .transport import Transport, TransportError
+
+# Seconds to wait before following the ADB server again after it went away.
+RECONNECT_DELAY = 1.0
+
+
+class DeviceWatcher:  # pylint: disable=too-many-instance-attributes,too-few-public-methods
+    """Extract from devices as they appear until interrupted.
+
+    ``options`` are forwarded to :class:`~pykeypull.extractor.Extractor` for
+    each device, together with ``transport``. A device is extracted again
+    only after it has been detached and re-attached; one that reconnects
+    while its extraction is still running is not queued twice.
+    """
+
+    def __init__(
+        self,
+        transport: Transport,
+        locations: Iterable[str] | None,
+        output: str = "output",
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        on_result: Callable[[DeviceResult], None] | None = None,
+        **options: Any,
+    ) -> None:
+        self.transport = transport
+        self.locations = None if locations is None else list(locations)
+        self.output = output
+        self.max_workers = max(1, max_workers)
+        self.on_result = on_result
+        self.options = options
+        self.results: List[DeviceResult] = []
+        self._present: Set[str] = set()
+        self._active: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def run(self, reconnect: bool = True) -> List[DeviceResult]:
+        """Watch for devices and return every result once watching stops.
+
+        Watching stops on :class:`KeyboardInterrupt`, or when the ADB server
+        goes away and ``reconnect`` is false. Running extractions are always
+        allowed to finish. :class:`~pykeypull.extractor.ExtractionError` is
+        raised, after they finish, if the ``adb`` executable cannot be found.
+        """
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            try:
+                self._follow(pool, reconnect)
+            except KeyboardInterrupt:
+                print("Stopping; waiting for running extractions to finish")
+            except FileNotFoundError as exc:
+                raise ExtractionError("ADB executable not found in PATH") from exc
+        return self.results
+
+    def _follow(self, pool: ThreadPoolExecutor, reconnect: bool) -> None:
+        while True:
+            try:
+                for devices in self.transport.track_devices():
+                    self._update(pool, {serial for serial, state in devices if state == "device"})
+            except TransportError as exc:
+                print(f"Lost the ADB server: {exc}")
+            if not reconnect:
+                return
+            time.sleep(RECONNECT_DELAY)
+            try:
+                self.transport.start_server()
+            except TransportError as exc:
+                print(f"Could not restart the ADB server: {exc}")
+
+    def _update(self, pool: ThreadPoolExecutor, ready: Set[str]) -> None:
+        for serial in sorted(self._present - ready):
+            print(f"Device detached: {serial}")
+        for serial in sorted(ready - self._present):
+            with self._lock:
+                if serial in self._active:
+                    continue
+                self._active.add(serial)
+            print(f"Device attached: {serial}; queued for extraction")
+            retrier = self.options.get("retrier")
+            if retrier is not None:
+                # Failures from before the device was re-plugged say nothing about it now.
+                retrier.reset(serial)
+            future = pool.submit(
+                extract_device,
+                serial,
+                self.locations,
+                output=self.output,
+                transport=self.transport,
+                **self.options,
+            )
+            future.add_done_callback(lambda done, serial=serial: self._finish(serial, done))
+        self._present = ready
+
+    def _finish(self, serial: str, future: Future) -> None:
+        try:
+            result = future.result()
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            # Keep watching even if one device hits an unexpected failure.
+            result = DeviceResult(
+                serial=serial,
+                output=Path(self.output) / device_directory(serial),
+                error=str(exc),
+            )
+        with self._lock:
+            self._active.discard(serial)
+            self.results.append(result)
+        if self.on_result is not None:
+            self.on_result(result)
@@ -0,0 +1,198 @@
+"""In-process stand-in for the ADB server used by the socket transport tests."""
+
+from __future__ import annotations
+
+import posixpath
+import socketserver
+import struct
+import threading
+from typing import Callable, Dict, List, Tuple
+
+ShellHandler = Callable[[str], Tuple[int, bytes, bytes]]
+
+
+def _recv_exact(request, length: int) -> bytes:
+    data = b""
+    while len(data) < length:
+        chunk = request.recv(length - len(data))
+        if not chunk:
+            raise ConnectionError("client closed connection")
+        data += chunk
+    return data
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """Serve a synthetic device filesystem over the ADB host protocol.
+
+    ``files`` maps absolute remote paths to their contents; directories are
+    implied by the paths. ``shell`` receives each shell/exec command string
+    and returns ``(status, stdout, stderr)``.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        files: Dict[str, bytes] | None = None,
+        serials: Tuple[str, ...] = ("FAKE123",),
+        shell: ShellHandler | None = None,
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), _FakeAdbHandler)
+        self.files = dict(files or {})
+        self.serials = serials
+        self.shell = shell or (lambda command: (0, b"", b""))
+        self.connections = 0
+        self.services: List[str] = []
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        """Return the TCP port the server is listening on."""
+
+        return self.server_address[1]
+
+    def start(self) -> None:
+        """Begin serving requests on a background thread."""
+
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving and release the listening socket."""
+
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "FakeAdbServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def stat(self, path: str) -> Tuple[int, int, int]:
+        """Return ``(mode, size, mtime)`` for ``path`` in the fake filesystem."""
+
+        path = posixpath.normpath(path)
+        if path in self.files:
+            return 0o100644, len(self.files[path]), 1_700_000_000
+        prefix = path.rstrip("/") + "/"
+        if any(name.startswith(prefix) for name in self.files):
+            return 0o040755, 4096, 1_700_000_000
+        return 0, 0, 0
+
+    def children(self, path: str) -> List[str]:
+        """Return the immediate child names of the directory ``path``."""
+
+        prefix = posixpath.normpath(path).rstrip("/") + "/"
+        names = {
+            name[len(prefix):].split("/", 1)[0]
+            for name in self.files
+            if name.startswith(prefix)
+        }
+        return sorted(names)
+
+
+class _FakeAdbHandler(socketserver.BaseRequestHandler):
+    server: FakeAdbServer
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        try:
+            while True:
+                length = int(_recv_exact(self.request, 4), 16)
+                service = _recv_exact(self.request, length).decode()
+                self.server.services.append(service)
+                if not self._dispatch(service):
+                    return
+        except ConnectionError:
+            return
+
+    def _okay(self, payload: bytes | None = None) -> None:
+        self.request.sendall(b"OKAY")
+        if payload is not None:
+            self.request.sendall(b"%04x" % len(payload) + payload)
+
+    def _fail(self, message: str) -> None:
+        encoded = message.encode()
+        self.request.sendall(b"FAIL" + b"%04x" % len(encoded) + encoded)
+
+    def _dispatch(self, service: str) -> bool:  # pylint: disable=too-many-return-statements
+        """Handle one request, returning whether the connection stays open."""
+
+        if service == "host:version":
+            self._okay(b"0029")
+            return False
+        if service == "host:devices":
+            listing = "".join(f"{serial}\tdevice\n" for serial in self.server.serials)
+            self._okay(listing.encode())
+            return False
+        if service == "host:devices-l":
+            listing = "".join(
+                f"{serial}\tdevice usb:1-1.{port} model:Fake transport_id:{port}\n"
+                for port, serial in enumerate(self.server.serials, 1)
+            )
+            self._okay(listing.encode())
+            return False
+        if service == "host:track-devices":
+            listing = "".join(f"{serial}\tdevice\n" for serial in self.server.serials)
+            self._okay(listing.encode())
+            return False
+        if service.startswith("host:transport:"):
+            if service.split(":", 2)[2] not in self.server.serials:
+                self._fail("device not found")
+                return False
+            self._okay()
+            return True
+        if service == "root:":
+            self._okay()
+            self.request.sendall(b"adbd is already running as root\n")
+            return False
+        if service.startswith("shell,v2,raw:"):
+            status, stdout, stderr = self.server.shell(service.split(":", 1)[1])
+            self._okay()
+            for ident, data in ((1, stdout), (2, stderr)):
+                if data:
+                    self.request.sendall(struct.pack("<BI", ident, len(data)) + data)
+            self.request.sendall(struct.pack("<BI", 3, 1) + bytes([status]))
+            return False
+        if service.startswith("exec:"):
+            _status, stdout, _stderr = self.server.shell(service.split(":", 1)[1])
+            self._okay()
+            self.request.sendall(stdout)
+            return False
+        if service == "sync:":
+            self._okay()
+            self._sync()
+            return False
+        self._fail(f"unknown service {service}")
+        return False
+
+    def _sync(self) -> None:
+        while True:
+            header = _recv_exact(self.request, 8)
+            ident = header[:4]
+            (length,) = struct.unpack("<I", header[4:])
+            if ident == b"QUIT":
+                return
+            path = _recv_exact(self.request, length).decode()
+            if ident == b"STAT":
+                self.request.sendall(b"STAT" + struct.pack("<III", *self.server.stat(path)))
+            elif ident == b"LIST":
+                for name in self.server.children(path):
+                    mode, size, mtime = self.server.stat(posixpath.join(path, name))
+                    encoded = name.encode()
+                    self.request.sendall(
+                        b"DENT" + struct.pack("<IIII", mode, size, mtime, len(encoded)) + encoded
+                    )
+                self.request.sendall(b"DONE" + struct.pack("<IIII", 0, 0, 0, 0))
+            elif ident == b"RECV":
+                data = self.server.files.get(posixpath.normpath(path))
+                if data is None:
+                    message = b"No such file or directory"
+                    self.request.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+                    continue
+                for offset in range(0, len(data), 4):
+                    chunk = data[offset:offset + 4]
+                    self.request.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                self.request.sendall(b"DONE" + struct.pack("<I", 0))
@@ -0,0 +1,180 @@
+"""Unit tests for the ADB host protocol client and socket transport."""
+
+import io
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from fake_adb_server import FakeAdbServer
+from pykeypull.adbclient import AdbClient, AdbProtocolError
+from pykeypull.extractor import Extractor
+from pykeypull.retry import TRANSIENT, classify
+from pykeypull.store import ContentStore
+from pykeypull.transport import SocketTransport, TransportError
+
+FILES = {
+    "/data/misc/keystore/user_0/blob": b"secret-bytes",
+    "/data/misc/keystore/persistent.sqlite": b"SQLite format 3\x00",
+}
+
+
+def _shell(command: str):
+    if command == "id -u":
+        return 0, b"0\n", b""
+    if command.startswith("find /data/misc/keystore"):
+        return 0, "\n".join(sorted(FILES)).encode() + b"\n", b""
+    return 1, b"", b"unknown command"
+
+
+class AdbClientTests(unittest.TestCase):
+    """Exercise :class:`AdbClient` against :class:`FakeAdbServer`."""
+
+    def setUp(self) -> None:
+        self.server = FakeAdbServer(files=FILES, shell=_shell)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.client = AdbClient(port=self.server.port, timeout=5)
+        self.addCleanup(self.client.close)
+
+    def test_devices_lists_serials(self) -> None:
+        """``host:devices`` should be parsed into serial/state pairs."""
+
+        self.assertEqual(self.client.devices(), [("FAKE123", "device")])
+
+    def test_track_devices_yields_updates_until_closed(self) -> None:
+        """``host:track-devices`` updates should be yielded until the server hangs up."""
+
+        self.assertEqual(list(self.client.track_devices()), [[("FAKE123", "device")]])
+
+    def test_topology_reports_usb_ports(self) -> None:
+        """``host:devices-l`` should map each serial to its USB port."""
+
+        transport = SocketTransport(port=self.server.port)
+        self.addCleanup(transport.close)
+        self.assertEqual(transport.topology(), {"FAKE123": "1-1.1"})
+
+    def test_shell_reports_status_and_streams(self) -> None:
+        """The v2 shell protocol should separate stdout, stderr and exit status."""
+
+        status, stdout, _ = self.client.shell("FAKE123", "find /data/misc/keystore -type f")
+        self.assertEqual(status, 0)
+        self.assertIn(b"/data/misc/keystore/user_0/blob", stdout)
+        self.assertEqual(self.client.shell("FAKE123", "bogus"), (1, b"", b"unknown command"))
+
+    def test_sync_connection_is_reused(self) -> None:
+        """STAT, LIST and RECV should share one connection per device."""
+
+        sync = self.client.sync("FAKE123")
+        self.assertTrue(sync.stat("/data/misc/keystore").is_directory)
+        self.assertFalse(sync.stat("/missing").exists)
+        names = [entry.name for entry in sync.list("/data/misc/keystore")]
+        self.assertEqual(names, ["persistent.sqlite", "user_0"])
+        buffer = io.BytesIO()
+        self.assertEqual(sync.recv("/data/misc/keystore/user_0/blob", buffer), 12)
+        self.assertEqual(buffer.getvalue(), b"secret-bytes")
+        with self.assertRaises(AdbProtocolError):
+            sync.recv("/missing", io.BytesIO())
+
+        self.assertIs(self.client.sync("FAKE123"), sync)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_oversized_requests_are_rejected(self) -> None:
+        """Requests past the four-hex-digit length prefix should fail cleanly."""
+
+        with self.assertRaisesRegex(AdbProtocolError, "exceeds the ADB limit"):
+            self.client.shell("FAKE123", "x" * 0x10000)
+        self.assertEqual(self.client.shell("FAKE123", "bogus")[0], 1)
+
+    def test_unknown_serial_is_rejected(self) -> None:
+        """Transport selection failures should surface the server message."""
+
+        with self.assertRaisesRegex(AdbProtocolError, "device not found"):
+            self.client.shell("OTHER", "id")
+
+
+class SocketTransportTests(unittest.TestCase):
+    """Drive :class:`Extractor` through :class:`SocketTransport`."""
+
+    def test_extractor_pulls_directory_over_socket(self) -> None:
+        """Directory extraction should work end to end without spawning adb."""
+
+        with (
+            FakeAdbServer(files=FILES, shell=_shell) as server,
+            tempfile.TemporaryDirectory() as tmp,
+            patch("pykeypull.transport.subprocess") as mock_subprocess,
+        ):
+            transport = SocketTransport(port=server.port)
+            extractor = Extractor(output=tmp, transport=transport)
+            extractor.adb_stat()
+            extractor.obtain_root()
+            with self.assertRaises(TransportError):
+                transport.pull("FAKE123", "/missing", Path(tmp) / "missing")
+            successes = extractor.extract_all(["/data/misc/keystore/"])
+            transport.close()
+
+            blob = Path(tmp) / "data_misc_keystore_user_0_blob"
+            self.assertEqual(blob.read_bytes(), b"secret-bytes")
+            self.assertFalse((Path(tmp) / "missing").exists())
+
+        self.assertEqual(successes, ["/data/misc/keystore/"])
+        mock_subprocess.run.assert_not_called()
+
+    def test_socket_pulls_deduplicate_while_streaming(self) -> None:
+        """With a store, socket pulls should be hashed as they arrive, not re-read."""
+
+        files = {"/data/keys/a": b"same-key", "/data/keys/b": b"same-key", "/data/keys/c": b"x"}
+
+        def shell(command: str):
+            if command.startswith("find /data/keys"):
+                return 0, "\n".join(sorted(files)).encode() + b"\n", b""
+            return 1, b"", b"unknown command"
+
+        with (
+            FakeAdbServer(files=files, shell=shell) as server,
+            tempfile.TemporaryDirectory() as tmp,
+            patch("pykeypull.store.ContentStore.adopt") as adopt,
+        ):
+            transport = SocketTransport(port=server.port)
+            self.addCleanup(transport.close)
+            store = ContentStore(Path(tmp) / "store")
+            extractor = Extractor(
+                output=str(Path(tmp) / "out"), device="FAKE123", transport=transport, store=store
+            )
+            with redirect_stdout(io.StringIO()):
+                successes = extractor.extract_all(["/data/keys/"])
+
+            self.assertEqual(successes, ["/data/keys/"])
+            self.assertEqual((Path(tmp) / "out" / "data_keys_b").read_bytes(), b"same-key")
+            self.assertEqual((store.new_objects, store.reused_objects), (2, 1))
+        adopt.assert_not_called()
+
+    def test_socket_errors_become_transient_transport_errors(self) -> None:
+        """A reset connection should be retried like any other dropped link."""
+
+        reset = ConnectionResetError(104, "Connection reset by peer")
+        client = MagicMock()
+        client.shell.side_effect = reset
+        client.exec_out.return_value.makefile.return_value.__enter__.return_value.read = (
+            MagicMock(side_effect=reset)
+        )
+        transport = SocketTransport(client=client)
+
+        with self.assertRaises(TransportError) as shell:
+            transport.shell("FAKE123", ["id"])
+        with self.assertRaises(TransportError) as exec_out:
+            with transport.exec_out("FAKE123", "cat /x") as stream:
+                stream.read()
+
+        self.assertEqual(classify(shell.exception), TRANSIENT)
+        self.assertEqual(classify(exec_out.exception), TRANSIENT)
+
+        client.version.side_effect = reset
+        with self.assertRaises(TransportError) as start:
+            transport.start_server()
+        self.assertEqual(classify(start.exception), TRANSIENT)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,197 @@
+"""Unit tests covering the asyncio extractor."""
+
+import asyncio
+import io
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+from fake_adb_server import FakeAdbServer
+from test_keybox import keybox_xml
+from pykeypull.aio import AsyncExtractor, claim_files
+from pykeypull.plan import parse_plan_output
+from pykeypull.rootcache import ROOT_SU, RootCache
+from pykeypull.transport import SocketTransport
+
+PLAN = (
+    "L|d|/data/\n"
+    + "".join(f"F|4|1|/data/file{index}\n" for index in range(8))
+    + "F|4|1|/data/keybox.xml\n"
+    "F|4|1|/data/sub/nested\n"
+    "L|d|/data/sub/\n"
+    "F|4|1|/data/sub/nested\n"
+    "L|f|/data/keybox.xml\n"
+    "F|4|1|/data/keybox.xml\n"
+    "L|m|/vendor/\n"
+)
+
+
+class _SlowTransport:
+    """Answer the plan over ``shell`` and record overlapping transfers."""
+
+    def __init__(self, plan: str) -> None:
+        self.plan = plan
+        self.pulled = []
+        self.commands = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def shell(self, _serial, args):
+        """Return ``uid=0`` for ``su -c id`` and the plan for anything else."""
+
+        if args == ["su", "-c", "id"]:
+            return "uid=0(root)"
+        return self.plan
+
+    def pull(self, _serial, remote, local):
+        """Write a placeholder file after a short delay."""
+
+        with self._lock:
+            self.pulled.append(remote)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.02)
+        Path(local).write_bytes(b"data")
+        with self._lock:
+            self.in_flight -= 1
+
+    @contextmanager
+    def exec_out(self, _serial, command):
+        """Stream a keybox for any command."""
+
+        self.commands.append(command)
+        yield io.BytesIO(keybox_xml(1))
+
+
+class AsyncExtractorTests(unittest.TestCase):
+    """Behavioural tests for :class:`AsyncExtractor`."""
+
+    def setUp(self) -> None:
+        """Create a throwaway output directory."""
+
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_claim_files_gives_each_file_one_owner(self) -> None:
+        """Overlapping locations should not fetch the same remote file twice."""
+
+        locations = ["/data/sub/", "/data/", "/data/keybox.xml", "/vendor/"]
+        reduced, covered = claim_files(locations, parse_plan_output(PLAN))
+
+        self.assertEqual(covered, {"/data/sub/": ["/data/"]})
+        self.assertEqual(
+            [entry.path for entry in reduced["/data/keybox.xml"].files], ["/data/keybox.xml"]
+        )
+        self.assertEqual(len(reduced["/data/"].files), 9)
+        self.assertNotIn("/data/keybox.xml", [entry.path for entry in reduced["/data/"].files])
+        self.assertEqual(reduced["/vendor/"].files, [])
+
+    def test_extract_all_overlaps_locations_and_pulls_each_file_once(self) -> None:
+        """Locations should run concurrently without duplicate transfers."""
+
+        transport = _SlowTransport(PLAN)
+        extractor = AsyncExtractor(
+            output=self.tmp.name, device="ABC123", max_pulls=2, transport=transport
+        )
+        validated = []
+
+        with (
+            patch("pykeypull.extractor.validate_keybox", side_effect=validated.append),
+            redirect_stdout(io.StringIO()),
+        ):
+            successes = asyncio.run(
+                extractor.extract_all(["/data/", "/data/sub/", "/data/keybox.xml", "/vendor/"])
+            )
+
+        self.assertEqual(successes, ["/data/", "/data/sub/", "/data/keybox.xml"])
+        self.assertEqual(len(transport.pulled), 10)
+        self.assertEqual(len(set(transport.pulled)), 10)
+        self.assertEqual(transport.peak, 2)
+        self.assertEqual(validated, [extractor.output / "keybox.xml"])
+        self.assertTrue((extractor.output / "data_sub_nested").exists())
+
+    def test_options_reach_the_run_and_the_sink_is_closed(self) -> None:
+        """Extractor options such as the sink should apply to every worker."""
+
+        transport = _SlowTransport(PLAN)
+        extractor = AsyncExtractor(
+            output=str(Path(self.tmp.name) / "ABC123"),
+            device="ABC123",
+            transport=transport,
+            sink="zip",
+        )
+
+        with (
+            patch("pykeypull.extractor.validate_keybox"),
+            redirect_stdout(io.StringIO()),
+        ):
+            asyncio.run(extractor.extract_all(["/data/", "/data/sub/", "/data/keybox.xml"]))
+
+        with zipfile.ZipFile(Path(self.tmp.name) / "ABC123.zip") as archive:
+            self.assertEqual(len(archive.namelist()), 10)
+        self.assertFalse((Path(self.tmp.name) / "ABC123").exists())
+
+    def test_cached_su_root_reads_through_su(self) -> None:
+        """A cached su method should be verified and used for every read."""
+
+        transport = _SlowTransport("L|f|/data/keybox.xml\nF|4|1|/data/keybox.xml\n")
+        cache = RootCache()
+        cache.set("ABC123", ROOT_SU)
+        extractor = AsyncExtractor(
+            output=self.tmp.name, device="ABC123", transport=transport, root_cache=cache
+        )
+
+        async def run():
+            await extractor.obtain_root()
+            return await extractor.extract_all(["/data/keybox.xml"])
+
+        with redirect_stdout(io.StringIO()):
+            successes = asyncio.run(run())
+
+        self.assertEqual(successes, ["/data/keybox.xml"])
+        self.assertEqual(transport.pulled, [])
+        self.assertEqual(transport.commands, ["su -c 'cat /data/keybox.xml 2>/dev/null'"])
+
+    def test_socket_transport_keeps_concurrent_pulls_apart(self) -> None:
+        """Workers sharing one device's sync connection should never mix files."""
+
+        files = {
+            f"/data/dir{directory}/file{index}": bytes([65 + directory * 8 + index]) * 4000
+            for directory in range(6)
+            for index in range(4)
+        }
+        directories = [f"/data/dir{directory}/" for directory in range(6)]
+        plan = "".join(
+            f"L|d|{directory}\n"
+            + "".join(
+                f"F|4000|1|{path}\n" for path in sorted(files) if path.startswith(directory)
+            )
+            for directory in directories
+        )
+
+        def shell(command):
+            return (0, b"0\n", b"") if command == "id -u" else (0, plan.encode(), b"")
+
+        with FakeAdbServer(files=files, shell=shell) as server:
+            transport = SocketTransport(port=server.port, timeout=5)
+            self.addCleanup(transport.close)
+            extractor = AsyncExtractor(
+                output=self.tmp.name, device="FAKE123", max_pulls=4, transport=transport
+            )
+            with redirect_stdout(io.StringIO()):
+                successes = asyncio.run(extractor.extract_all(directories))
+
+        self.assertEqual(successes, directories)
+        for remote, content in files.items():
+            local = extractor.output / remote.strip("/").replace("/", "_")
+            self.assertEqual(local.read_bytes(), content, remote)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Smoke tests for the benchmark harness and its fake adb executable."""
+
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from benchmarks.run import SCENARIOS, run_scenario
+from pykeypull.keybox import validate
+
+
+class BenchmarkTests(unittest.TestCase):
+    """Run tiny benchmark scenarios end to end."""
+
+    def test_small_files_scenario_pulls_every_file(self) -> None:
+        """Per-file pulls should go through one fake adb call per file."""
+
+        environment = dict(os.environ)
+        result = run_scenario("small-files", scale=0.005)
+
+        self.assertEqual(dict(os.environ), environment)
+        self.assertTrue(result["ok"])
+        self.assertEqual(result["files"], 10)
+        self.assertGreaterEqual(result["subprocesses"], 10)
+
+    def test_stream_scenario_uses_a_handful_of_calls(self) -> None:
+        """Streaming a directory should not scale adb calls with file count."""
+
+        result = run_scenario("small-files-stream", scale=0.005)
+
+        self.assertTrue(result["ok"])
+        self.assertEqual(result["files"], 10)
+        self.assertLess(result["subprocesses"], 5)
+
+    def test_keybox_tree_files_are_complete_keyboxes(self) -> None:
+        """Generated keybox files should parse like real ones."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            (location,) = SCENARIOS["keybox-tree"].build(Path(tmp), 0.005)
+            (path,) = (Path(tmp) / location.strip("/")).iterdir()
+            with redirect_stdout(io.StringIO()):
+                attestation = validate(path)
+
+        self.assertEqual(attestation.number_of_keyboxes, 1)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,65 @@
+"""Unit tests for bulk keybox validation."""
+
+import io
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from test_keybox import keybox_xml
+from pykeypull.cli import run
+from pykeypull.corpus import validate_corpus
+
+
+class CorpusTests(unittest.TestCase):
+    """Behavioural tests for :mod:`pykeypull.corpus` and ``validate``."""
+
+    def setUp(self) -> None:
+        """Create a small corpus with one valid and one broken keybox."""
+
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        (self.root / "device_a").mkdir()
+        (self.root / "device_a" / "keybox.xml").write_bytes(keybox_xml(2))
+        (self.root / "broken.xml").write_bytes(b"<AndroidAttestation>")
+        (self.root / "persistent.sqlite").write_bytes(b"SQLite format 3\x00")
+
+    def test_validate_corpus_summarises_each_xml_file(self) -> None:
+        """Each XML file should produce one summary, in a stable order."""
+
+        summaries = list(validate_corpus(self.root, workers=2))
+
+        self.assertEqual(
+            [Path(summary["path"]).name for summary in summaries], ["broken.xml", "keybox.xml"]
+        )
+        self.assertIn("XML is invalid", summaries[0]["error"])
+        self.assertEqual(summaries[1]["keyboxes"], 2)
+        self.assertEqual(summaries[1]["device_ids"], ["device-0", "device-1"])
+        self.assertEqual(summaries[1]["algorithms"], ["ecdsa"])
+        self.assertIsNone(summaries[1]["error"])
+
+    def test_validate_subcommand_prints_json_lines(self) -> None:
+        """``python -m pykeypull validate`` should emit JSON lines."""
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = run(["validate", str(self.root), "--jobs", "1"])
+
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(status, 1)
+        self.assertEqual(len(lines), 2)
+
+    def test_deep_validation_lists_issues(self) -> None:
+        """``--deep`` summaries should include verification issues."""
+
+        summaries = list(validate_corpus(self.root / "device_a", workers=1, deep=True))
+
+        self.assertEqual(len(summaries), 1)
+        self.assertTrue(summaries[0]["issues"])
+        self.assertTrue(summaries[0]["issues"][0].startswith("device-0: ecdsa certificate 1"))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
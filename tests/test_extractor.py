@@ -1,13 +1,24 @@
 """Unit tests covering the Extractor workflow."""
 
+import gzip
+import io
+import lzma
+import re
 import subprocess
+import tarfile
+import tempfile
 import unittest
-from unittest.mock import call, patch
+from pathlib import Path
+from unittest.mock import MagicMock, call, patch
 
 # Accessing protected members is acceptable in unit tests.
 # pylint: disable=protected-access
 
-from pykeypull.extractor import Extractor, ExtractionError
+from test_keybox import keybox_xml
+from test_keystoredb import keystore_files
+from pykeypull.extractor import TAR_MEMBERS_LIMIT, Extractor, ExtractionError, _member_batches
+from pykeypull.keystoredb import KeyIndex
+from pykeypull.rootcache import ROOT_ADBD, ROOT_SU, RootCache
 
 
 class ExtractorTests(unittest.TestCase):
@@ -32,7 +43,7 @@ class ExtractorTests(unittest.TestCase):
     def test_adb_stat_detects_device(self) -> None:
         """ADB device discovery should record the first connected device."""
 
-        with patch("pykeypull.extractor.subprocess.run") as mock_run:
+        with patch("pykeypull.transport.subprocess.run") as mock_run:
             mock_run.side_effect = [
                 subprocess.CompletedProcess(args=[], returncode=0, stdout=b"", stderr=b""),
                 subprocess.CompletedProcess(
@@ -65,40 +76,108 @@ class ExtractorTests(unittest.TestCase):
         )
 
     def test_obtain_root_via_adb(self) -> None:
-        """Rooting via ADB should succeed when the command runs cleanly."""
+        """Rooting via ADB should poll until adbd is back instead of sleeping."""
 
         self.extractor.device = "ABC123"
-        with patch("pykeypull.extractor.subprocess.run") as mock_run, patch(
+        with patch("pykeypull.transport.subprocess.run") as mock_run, patch(
             "pykeypull.extractor.time.sleep",
         ) as mock_sleep:
+            mock_run.side_effect = [
+                subprocess.CompletedProcess(args=[], returncode=0, stdout="2000\n", stderr=""),
+                subprocess.CompletedProcess(args=[], returncode=0, stdout=b"", stderr=b""),
+                subprocess.CalledProcessError(returncode=1, cmd="adb", stderr="device offline"),
+                subprocess.CompletedProcess(args=[], returncode=0, stdout="0\n", stderr=""),
+            ]
+
+            self.extractor.obtain_root()
+
+        self.assertEqual(
+            mock_run.mock_calls[1],
+            call(
+                [self.extractor.adb_path, "-s", "ABC123", "root"],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=None,
+            ),
+        )
+        mock_sleep.assert_called_once_with(0.1)
+        self.assertEqual(self.extractor.root_method, ROOT_ADBD)
+        self.assertEqual(self.extractor.root_cache.get("ABC123"), ROOT_ADBD)
+
+    def test_obtain_root_skips_restart_when_already_root(self) -> None:
+        """A device whose adbd already runs as root needs a single probe."""
+
+        self.extractor.device = "ABC123"
+        with patch("pykeypull.transport.subprocess.run") as mock_run:
             mock_run.return_value = subprocess.CompletedProcess(
-                args=[], returncode=0, stdout=b"", stderr=b""
+                args=[], returncode=0, stdout="0\n", stderr=""
             )
 
             self.extractor.obtain_root()
 
-        mock_run.assert_called_once_with(
-            [self.extractor.adb_path, "-s", "ABC123", "root"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        mock_sleep.assert_called_once_with(2)
+        mock_run.assert_called_once()
+        self.assertEqual(self.extractor.root_method, ROOT_ADBD)
+
+    def test_obtain_root_uses_cached_method(self) -> None:
+        """A cached privilege path should be reused after a single check."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "root.json"
+            RootCache(path).set("ABC123", ROOT_SU)
+            self.extractor.root_cache = RootCache(path)
+            self.extractor.device = "ABC123"
+            with patch("pykeypull.transport.subprocess.run") as mock_run:
+                mock_run.return_value = subprocess.CompletedProcess(
+                    args=[], returncode=0, stdout="uid=0(root)\n", stderr=""
+                )
+                self.extractor.obtain_root()
+
+        mock_run.assert_called_once()
+        self.assertEqual(mock_run.call_args.args[0][-3:], ["su", "-c", "id"])
+        self.assertEqual(self.extractor.root_method, ROOT_SU)
+
+    def test_obtain_root_forgets_stale_cached_method(self) -> None:
+        """A cached adbd entry should be dropped once adbd no longer runs as root."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "root.json"
+            RootCache(path).set("ABC123", ROOT_ADBD)
+            self.extractor.root_cache = RootCache(path)
+            self.extractor.device = "ABC123"
+            with (
+                patch("pykeypull.transport.subprocess.run") as mock_run,
+                patch("pykeypull.extractor.time.sleep"),
+            ):
+                mock_run.side_effect = [
+                    # Cache check, then the regular probe: still the shell user.
+                    subprocess.CompletedProcess(args=[], returncode=0, stdout="2000\n"),
+                    subprocess.CompletedProcess(args=[], returncode=0, stdout="2000\n"),
+                    subprocess.CompletedProcess(args=[], returncode=0, stdout=b""),
+                    subprocess.CompletedProcess(args=[], returncode=0, stdout="0\n"),
+                ]
+                self.extractor.obtain_root()
+
+            self.assertEqual(RootCache(path).get("ABC123"), ROOT_ADBD)
+
+        self.assertEqual(mock_run.call_args_list[2].args[0][-1], "root")
+        self.assertEqual(self.extractor.root_method, ROOT_ADBD)
 
     def test_obtain_root_falls_back_to_su(self) -> None:
         """If root fails, the extractor should attempt an SU fallback."""
 
         self.extractor.device = "ABC123"
-        with patch("pykeypull.extractor.subprocess.run") as mock_run:
+        with patch("pykeypull.transport.subprocess.run") as mock_run:
             mock_run.side_effect = [
+                subprocess.CompletedProcess(args=[], returncode=0, stdout="2000\n", stderr=""),
                 subprocess.CalledProcessError(returncode=1, cmd="adb", stderr=b"fail"),
                 subprocess.CompletedProcess(args=[], returncode=0, stdout=b"", stderr=b""),
             ]
 
             self.extractor.obtain_root()
 
-        self.assertEqual(mock_run.call_count, 2)
-        fallback_call = mock_run.mock_calls[1]
+        self.assertEqual(mock_run.call_count, 3)
+        fallback_call = mock_run.mock_calls[2]
         self.assertEqual(
             fallback_call,
             call(
@@ -106,15 +185,19 @@ class ExtractorTests(unittest.TestCase):
                 check=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
+                text=True,
+                timeout=None,
             ),
         )
+        self.assertEqual(self.extractor.root_method, ROOT_SU)
 
     def test_obtain_root_raises_when_su_fails(self) -> None:
         """The extractor should raise an error if SU access is unavailable."""
 
         self.extractor.device = "ABC123"
-        with patch("pykeypull.extractor.subprocess.run") as mock_run:
+        with patch("pykeypull.transport.subprocess.run") as mock_run:
             mock_run.side_effect = [
+                subprocess.CompletedProcess(args=[], returncode=0, stdout="2000\n", stderr=""),
                 subprocess.CalledProcessError(returncode=1, cmd="adb", stderr=b"fail"),
                 subprocess.CalledProcessError(returncode=1, cmd="adb", stderr=b"fail"),
             ]
@@ -122,6 +205,8 @@ class ExtractorTests(unittest.TestCase):
             with self.assertRaises(ExtractionError):
                 self.extractor.obtain_root()
 
+        self.assertIsNone(self.extractor.root_cache.get("ABC123"))
+
     def test_pull_directory_pulls_each_file(self) -> None:
         """Directory extraction should download each discovered file."""
 
@@ -129,7 +214,7 @@ class ExtractorTests(unittest.TestCase):
         directory_listing = "/data/file1\n/data/keybox.xml\n"
 
         with (
-            patch("pykeypull.extractor.subprocess.run") as mock_run,
+            patch("pykeypull.transport.subprocess.run") as mock_run,
             patch.object(self.extractor, "_adb_pull") as mock_pull,
             patch("pykeypull.extractor.validate_keybox") as mock_validate,
         ):
@@ -152,6 +237,97 @@ class ExtractorTests(unittest.TestCase):
         )
         mock_validate.assert_called_once_with(expected_destinations[1])
 
+    def test_stream_directory_unpacks_tar_members(self) -> None:
+        """Streaming mode should unpack every tar member into flat files."""
+
+        self.extractor.device = "ABC123"
+        self.extractor.stream_directories = True
+        process = _fake_process(_build_tar({"./file1": b"one", "./keybox.xml": b"<x/>"}))
+
+        with (
+            patch("pykeypull.transport.subprocess.Popen", return_value=process) as mock_popen,
+            patch("pykeypull.transport.subprocess.run") as mock_run,
+            patch("pykeypull.extractor.validate_keybox") as mock_validate,
+        ):
+            self.extractor._pull_directory("/data")
+
+        mock_run.assert_not_called()
+        self.assertEqual(mock_popen.call_args.args[0][:4], ["adb", "-s", "ABC123", "exec-out"])
+        self.assertEqual((self.extractor.output / "data_file1").read_bytes(), b"one")
+        mock_validate.assert_called_once_with(self.extractor.output / "data_keybox.xml")
+
+    def test_stream_directory_falls_back_without_tar(self) -> None:
+        """An empty stream should fall back to pulling files one by one."""
+
+        self.extractor.device = "ABC123"
+        self.extractor.stream_directories = True
+
+        with (
+            patch("pykeypull.transport.subprocess.Popen", return_value=_fake_process(b"")),
+            patch("pykeypull.transport.subprocess.run") as mock_run,
+            patch.object(self.extractor, "_adb_pull") as mock_pull,
+        ):
+            mock_run.return_value = subprocess.CompletedProcess(
+                args=[], returncode=0, stdout="/data/file1\n", stderr=""
+            )
+
+            self.extractor._pull_directory("/data")
+
+        mock_pull.assert_called_once_with("/data/file1", self.extractor.output / "data_file1")
+
+    def test_incremental_run_skips_unchanged_files(self) -> None:
+        """A second incremental run should only pull files whose state changed."""
+
+        states = {"/data/a": "3 100 /data/a", "/data/b": "5 100 /data/b"}
+        transport = MagicMock()
+
+        def shell(_serial, args):
+            if args[0] == "find":
+                return "/data/a\n/data/b\n"
+            return "\n".join(states.values()) + "\n--keypull-digests--\n"
+
+        def pull(_serial, remote, local):
+            local.write_bytes(b"x" * int(states[remote].split()[0]))
+
+        transport.shell.side_effect = shell
+        transport.pull.side_effect = pull
+        self.extractor.transport = transport
+        self.extractor.incremental = True
+        self.extractor.device = "ABC123"
+
+        self.extractor.extract_all(["/data"])
+        self.assertEqual(transport.pull.call_count, 2)
+
+        states["/data/b"] = "5 200 /data/b"
+        rerun = Extractor(output="test-output", transport=transport, incremental=True)
+        rerun.device = "ABC123"
+        rerun.extract_all(["/data"])
+
+        self.assertEqual(transport.pull.call_count, 3)
+        self.assertEqual(transport.pull.call_args.args[1:], ("/data/b", rerun.output / "data_b"))
+        self.assertEqual((rerun.stats.skipped_files, rerun.stats.skipped_bytes), (1, 3))
+        self.assertEqual(rerun.stats.transferred_files, 1)
+
+    def test_extract_all_uses_single_planning_call(self) -> None:
+        """Planning should replace per-directory listings and skip missing paths."""
+
+        self.extractor.device = "ABC123"
+        plan_output = "L|d|/data/\nF|3|1|/data/file1\nL|m|/vendor/etc/keystore/\n"
+
+        with (
+            patch("pykeypull.transport.subprocess.run") as mock_run,
+            patch.object(self.extractor, "_adb_pull") as mock_pull,
+        ):
+            mock_run.return_value = subprocess.CompletedProcess(
+                args=[], returncode=0, stdout=plan_output, stderr=""
+            )
+
+            successes = self.extractor.extract_all(["/data/", "/vendor/etc/keystore/"])
+
+        self.assertEqual(successes, ["/data/"])
+        mock_run.assert_called_once()
+        mock_pull.assert_called_once_with("/data/file1", self.extractor.output / "data_file1")
+
     def test_extract_all_collects_successful_locations(self) -> None:
         """Only successful extraction locations should be returned."""
 
@@ -164,6 +340,220 @@ class ExtractorTests(unittest.TestCase):
 
         self.assertEqual(successes, ["one", "three"])
 
+    def test_su_mode_streams_all_locations_at_once(self) -> None:
+        """Without adbd root every planned file should arrive in one su tar stream."""
+
+        self.extractor.device = "ABC123"
+        self.extractor.root_method = ROOT_SU
+        plan_output = (
+            "L|d|/data/misc/keystore/\n"
+            "F|3|100|/data/misc/keystore/user_0/blob\n"
+            "L|f|/data/keybox.xml\n"
+            "F|10|100|/data/keybox.xml\n"
+            "L|m|/missing\n"
+        )
+        archive = _build_tar(
+            {"data/misc/keystore/user_0/blob": b"key", "data/keybox.xml": keybox_xml(1)}
+        )
+
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            patch("pykeypull.transport.subprocess.run") as mock_run,
+            patch(
+                "pykeypull.transport.subprocess.Popen", return_value=_fake_process(archive)
+            ) as mock_popen,
+        ):
+            self.extractor.output = Path(tmp)
+            mock_run.return_value = subprocess.CompletedProcess(
+                args=[], returncode=0, stdout=plan_output, stderr=""
+            )
+
+            successes = self.extractor.extract_all(
+                ["/data/misc/keystore/", "/data/keybox.xml", "/missing"]
+            )
+
+            self.assertEqual(successes, ["/data/misc/keystore/", "/data/keybox.xml"])
+            self.assertEqual((Path(tmp) / "data_misc_keystore_user_0_blob").read_bytes(), b"key")
+            self.assertTrue((Path(tmp) / "keybox.xml").exists())
+
+        self.assertEqual(mock_run.call_args.args[0][4:6], ["su", "-c"])
+        mock_popen.assert_called_once()
+        command = mock_popen.call_args.args[0][-1]
+        self.assertTrue(command.startswith("su -c "))
+        self.assertIn("data/keybox.xml", command)
+
+    def test_su_mode_splits_long_member_lists_over_several_streams(self) -> None:
+        """Hundreds of keystore blobs should never end up on one su command line."""
+
+        self.extractor.device = "ABC123"
+        self.extractor.root_method = ROOT_SU
+        alias = "a" * 80
+        blobs = [f"data/misc/keystore/user_0/10{index:03d}_USRPKEY_{alias}" for index in range(600)]
+        plan_output = "L|d|/data/misc/keystore/\n" + "".join(
+            f"F|3|100|/{blob}\n" for blob in blobs
+        )
+
+        def stream(args, **_kwargs):
+            members = re.findall(r"data/misc/keystore/user_0/\w+", args[-1])
+            return _fake_process(_build_tar({member: b"key" for member in members}))
+
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            patch("pykeypull.transport.subprocess.run") as mock_run,
+            patch("pykeypull.transport.subprocess.Popen", side_effect=stream) as mock_popen,
+        ):
+            self.extractor.output = Path(tmp)
+            mock_run.return_value = subprocess.CompletedProcess(
+                args=[], returncode=0, stdout=plan_output, stderr=""
+            )
+
+            successes = self.extractor.extract_all(["/data/misc/keystore/"])
+
+            self.assertEqual(successes, ["/data/misc/keystore/"])
+            self.assertEqual(len(list(Path(tmp).iterdir())), 600)
+
+        commands = [call_args.args[0][-1] for call_args in mock_popen.call_args_list]
+        self.assertGreater(len(commands), 1)
+        self.assertTrue(all(len(command) < TAR_MEMBERS_LIMIT + 1024 for command in commands))
+
+        # A batch boundary never separates a database from its WAL.
+        members = [f"{index:04d}".ljust(1000, "x") for index in range(33)]
+        members[31:32] = ["db.sqlite".rjust(1000, "x"), "db.sqlite".rjust(1000, "x") + "-wal"]
+
+        batches = _member_batches(members)
+
+        self.assertEqual(sum(batches, []), members)
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(batches[0][-2:], members[31:33])
+
+    def test_su_mode_reads_single_files_with_cat(self) -> None:
+        """Without adbd root, single-file pulls should stream through su cat."""
+
+        self.extractor.device = "ABC123"
+        self.extractor.root_method = ROOT_SU
+        with tempfile.TemporaryDirectory() as tmp:
+            destination = Path(tmp) / "persistent.sqlite"
+            with patch(
+                "pykeypull.transport.subprocess.Popen", return_value=_fake_process(b"SQLite")
+            ) as mock_popen:
+                self.extractor._adb_pull("/data/persistent.sqlite", destination)
+            self.assertEqual(destination.read_bytes(), b"SQLite")
+
+            with (
+                patch("pykeypull.transport.subprocess.Popen", return_value=_fake_process(b"")),
+                patch("pykeypull.transport.subprocess.run") as mock_run,
+            ):
+                mock_run.side_effect = subprocess.CalledProcessError(1, "adb", stderr="")
+                with self.assertRaises(ExtractionError):
+                    self.extractor._adb_pull("/data/missing.sqlite", destination)
+                self.assertFalse(destination.exists())
+
+                # An empty result from a readable, empty file is kept.
+                mock_run.side_effect = None
+                mock_run.return_value = subprocess.CompletedProcess([], 0, stdout="", stderr="")
+                self.extractor._adb_pull("/data/empty.sqlite", destination)
+            self.assertEqual(destination.read_bytes(), b"")
+
+        self.assertEqual(
+            mock_popen.call_args.args[0][-1], "su -c 'cat /data/persistent.sqlite 2>/dev/null'"
+        )
+        self.assertEqual(
+            mock_run.call_args.args[0][4:],
+            ["su", "-c", "'test -r /data/empty.sqlite && test ! -s /data/empty.sqlite'"],
+        )
+
+    def test_compressed_stream_is_decoded_on_the_fly(self) -> None:
+        """With compression the tar stream should be piped through the device's gzip."""
+
+        self.extractor.device = "ABC123"
+        self.extractor.compression = "auto"
+        archive = gzip.compress(_build_tar({"./keys": b"A" * 4096}))
+
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            patch("pykeypull.transport.subprocess.run") as mock_run,
+            patch(
+                "pykeypull.transport.subprocess.Popen", return_value=_fake_process(archive)
+            ) as mock_popen,
+        ):
+            self.extractor.output = Path(tmp)
+            mock_run.return_value = subprocess.CompletedProcess(
+                args=[], returncode=0, stdout="gzip\nxz\n", stderr=""
+            )
+
+            self.extractor._pull_directory("/data")
+
+            self.assertEqual((Path(tmp) / "data_keys").read_bytes(), b"A" * 4096)
+
+        self.assertTrue(mock_popen.call_args.args[0][-1].endswith("| gzip -c"))
+        self.assertEqual(self.extractor.stats.wire_bytes, len(archive))
+        self.assertEqual(self.extractor.stats.payload_bytes, 4096)
+
+    def test_compressed_single_file_read(self) -> None:
+        """Single files should be read with the device compressor when enabled."""
+
+        self.extractor.device = "ABC123"
+        self.extractor.compression = "xz"
+        with tempfile.TemporaryDirectory() as tmp:
+            destination = Path(tmp) / "keybox.xml"
+            with (
+                patch("pykeypull.transport.subprocess.run") as mock_run,
+                patch(
+                    "pykeypull.transport.subprocess.Popen",
+                    return_value=_fake_process(lzma.compress(b"<xml/>" * 100)),
+                ) as mock_popen,
+            ):
+                mock_run.return_value = subprocess.CompletedProcess(
+                    args=[], returncode=0, stdout="gzip\nxz\n", stderr=""
+                )
+                self.extractor._adb_pull("/data/keybox.xml", destination)
+
+            self.assertEqual(destination.read_bytes(), b"<xml/>" * 100)
+
+        self.assertEqual(
+            mock_popen.call_args.args[0][-1], "xz -c /data/keybox.xml 2>/dev/null"
+        )
+
+    def test_keystore_snapshot_merges_wal_and_builds_index(self) -> None:
+        """The database and its WAL should arrive together and be consolidated."""
+
+        self.extractor.device = "ABC123"
+        database, wal = keystore_files()
+        archive = _build_tar({"persistent.sqlite": database, "persistent.sqlite-wal": wal})
+
+        with (
+            patch("pykeypull.transport.subprocess.Popen", return_value=_fake_process(archive)),
+            patch("pykeypull.transport.subprocess.run") as mock_run,
+        ):
+            self.extractor._pull_keystore("/data/misc/keystore/persistent.sqlite")
+
+        mock_run.assert_not_called()
+        snapshot = self.extractor.output / "persistent.sqlite"
+        self.assertFalse((self.extractor.output / "persistent.sqlite-wal").exists())
+        with KeyIndex(snapshot) as index:
+            self.assertEqual([key.alias for key in index.keys()], ["key0", "key1"])
+
+
+def _build_tar(members: dict) -> bytes:
+    """Return an in-memory tar archive containing ``members``."""
+
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name, payload in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(payload)
+            archive.addfile(info, io.BytesIO(payload))
+    return buffer.getvalue()
+
+
+def _fake_process(stdout: bytes) -> MagicMock:
+    """Return a stand-in for :class:`subprocess.Popen` streaming ``stdout``."""
+
+    process = MagicMock()
+    process.__enter__.return_value = process
+    process.stdout = io.BytesIO(stdout)
+    return process
+
 
 if __name__ == "__main__":  # pragma: no cover
     unittest.main()
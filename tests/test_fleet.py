@@ -0,0 +1,64 @@
+"""Unit tests covering concurrent fleet extraction."""
+
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from pykeypull.extractor import ExtractionError
+from pykeypull.fleet import device_directory, extract_fleet
+
+
+class FleetTests(unittest.TestCase):
+    """Behavioural tests for :func:`extract_fleet`."""
+
+    def test_extract_fleet_reports_each_device(self) -> None:
+        """Every serial should get its own output directory and result."""
+
+        def fake_root(extractor) -> None:
+            if extractor.device == "BAD":
+                raise ExtractionError("root access required")
+
+        with (
+            patch("pykeypull.fleet.Extractor.obtain_root", autospec=True) as mock_root,
+            patch("pykeypull.fleet.Extractor.ensure_output_directory"),
+            patch("pykeypull.fleet.Extractor.extract_all", return_value=["/a"]),
+        ):
+            mock_root.side_effect = fake_root
+            results = extract_fleet(["ABC", "BAD", "10.0.0.2:5555"], ["/a"], max_workers=2)
+
+        self.assertEqual([result.serial for result in results], ["ABC", "BAD", "10.0.0.2:5555"])
+        self.assertEqual(results[0].output, Path.cwd() / "output" / "ABC")
+        self.assertEqual(results[0].successes, ["/a"])
+        self.assertTrue(results[0].ok)
+        self.assertEqual(results[1].error, "root access required")
+        self.assertFalse(results[1].ok)
+        self.assertEqual(results[2].output.name, "10.0.0.2_5555")
+
+    def test_unexpected_errors_stay_with_their_device(self) -> None:
+        """An error other than ExtractionError should not discard the other results."""
+
+        def fake_extract(extractor, _locations):
+            if extractor.device == "BAD":
+                raise OSError(28, "No space left on device")
+            return ["/a"]
+
+        with (
+            patch("pykeypull.fleet.Extractor.obtain_root"),
+            patch("pykeypull.fleet.Extractor.ensure_output_directory"),
+            patch("pykeypull.fleet.Extractor.extract_all", autospec=True) as mock_extract,
+        ):
+            mock_extract.side_effect = fake_extract
+            results = extract_fleet(["ABC", "BAD", "XYZ"], ["/a"], max_workers=2)
+
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertIn("No space left on device", results[1].error)
+        self.assertEqual(results[1].output, Path("output") / "BAD")
+
+    def test_device_directory_is_filesystem_safe(self) -> None:
+        """Network serials should not produce nested or invalid paths."""
+
+        self.assertEqual(device_directory("host:5555"), "host_5555")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
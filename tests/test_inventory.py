@@ -0,0 +1,131 @@
+"""Unit tests for the persistent keybox inventory."""
+
+import io
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+from test_keybox import keybox_xml
+from test_verify import LEAF_CERT, ROOT_CERT
+from pykeypull.cli import run
+from pykeypull.extractor import Extractor
+from pykeypull.inventory import Inventory, fingerprint
+from pykeypull.keybox import (
+    Attestation,
+    Certificate,
+    CertificateChain,
+    Key,
+    Keybox,
+    PrivateKey,
+    _pem_to_der,
+)
+
+# Accessing protected members is acceptable in unit tests.
+# pylint: disable=protected-access
+
+
+def _attestation(*device_ids: str) -> Attestation:
+    """Return keyboxes whose single key chains up to the shared test root."""
+
+    chain = [Certificate("pem", LEAF_CERT), Certificate("pem", ROOT_CERT)]
+    keyboxes = [
+        Keybox(device_id, [Key("ecdsa", PrivateKey("pem", ""), CertificateChain(2, chain))])
+        for device_id in device_ids
+    ]
+    return Attestation(len(keyboxes), keyboxes)
+
+
+class InventoryTests(unittest.TestCase):
+    """Behavioural tests for :class:`Inventory`."""
+
+    def setUp(self) -> None:
+        """Open an empty inventory in a temporary directory."""
+
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.inventory = Inventory(self.root / "inventory.sqlite")
+        self.addCleanup(self.inventory.close)
+
+    def test_lookups_find_devices_sharing_a_root(self) -> None:
+        """Keys should be found by device ID, algorithm and root fingerprint."""
+
+        for serial, device_id in (("SERIAL_A", "device-a"), ("SERIAL_B", "device-b")):
+            path = self.root / f"{serial}.xml"
+            path.write_text("<x/>", encoding="utf-8")
+            self.inventory.add(path, _attestation(device_id), serial)
+
+        root = fingerprint(_pem_to_der(ROOT_CERT))
+        colon_separated = ":".join(root[i:i + 2] for i in range(0, len(root), 2)).upper()
+
+        self.assertEqual([e.serial for e in self.inventory.by_device_id("device-b")], ["SERIAL_B"])
+        self.assertEqual(len(self.inventory.by_algorithm("ecdsa")), 2)
+        self.assertEqual(
+            [e.device_id for e in self.inventory.by_fingerprint(colon_separated)],
+            ["device-a", "device-b"],
+        )
+        self.assertEqual(self.inventory.by_algorithm("rsa"), [])
+
+    def test_update_only_parses_changed_files(self) -> None:
+        """Unchanged files should be skipped and re-added entries replace old ones."""
+
+        path = self.root / "keybox.xml"
+        path.write_bytes(keybox_xml(2))
+
+        self.assertEqual(self.inventory.update([path]), (1, 0))
+        with patch("pykeypull.inventory.parse") as mock_parse:
+            self.assertEqual(self.inventory.update([path]), (0, 1))
+        mock_parse.assert_not_called()
+
+        path.write_bytes(keybox_xml(1))
+        self.inventory.update([path])
+        self.assertEqual(self.inventory.by_device_id("device-1"), [])
+        self.assertEqual(len(self.inventory.by_device_id("device-0")), 1)
+
+    def test_prune_drops_deleted_files(self) -> None:
+        """Entries of files that were removed should be forgotten."""
+
+        path = self.root / "keybox.xml"
+        path.write_bytes(keybox_xml(1))
+        self.inventory.update([path])
+        path.unlink()
+
+        self.assertEqual(self.inventory.prune(), 1)
+        self.assertEqual(self.inventory.by_algorithm("ecdsa"), [])
+
+    def test_extractor_records_validated_keyboxes(self) -> None:
+        """Keyboxes validated during extraction should land in the inventory."""
+
+        path = self.root / "keybox.xml"
+        path.write_bytes(keybox_xml(1))
+        extractor = Extractor(output=self.tmp.name, device="ABC123", inventory=self.inventory)
+
+        with redirect_stdout(io.StringIO()):
+            extractor._validate(path)
+
+        (entry,) = self.inventory.by_device_id("device-0")
+        self.assertEqual((entry.serial, entry.path), ("ABC123", str(path.resolve())))
+
+    def test_inventory_subcommand_scans_and_searches(self) -> None:
+        """``python -m pykeypull inventory`` should index a tree and print matches."""
+
+        (self.root / "corpus").mkdir()
+        (self.root / "corpus" / "keybox.xml").write_bytes(keybox_xml(2))
+        database = str(self.root / "cli.sqlite")
+
+        output = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(io.StringIO()):
+            scan = ["--scan", str(self.root / "corpus")]
+            status = run(["inventory", database, *scan, "--device-id", "device-1"])
+            missing = run(["inventory", database, "--device-id", "unknown"])
+
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual((status, missing), (0, 1))
+        self.assertEqual([line["device_id"] for line in lines], ["device-1"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
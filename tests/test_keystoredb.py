@@ -0,0 +1,236 @@
+"""Unit tests for keystore database snapshots and the sidecar key index."""
+
+import io
+import os
+import sqlite3
+import subprocess
+import tempfile
+import unittest
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+from typing import Tuple
+
+from test_prefilter import LocalShellTransport
+from pykeypull.extractor import Extractor
+from pykeypull.keystoredb import (
+    INDEX_SUFFIX,
+    WAL_SUFFIX,
+    KeyIndex,
+    KeystoreIndexError,
+    consolidate,
+    find_keys,
+)
+from pykeypull.prefilter import DEFAULT_RULES, filter_command, parse_filter_output
+
+_SCHEMA = """
+CREATE TABLE keyentry (
+    id INTEGER PRIMARY KEY, key_type INTEGER, domain INTEGER, namespace INTEGER, alias BLOB
+);
+CREATE TABLE blobentry (id INTEGER PRIMARY KEY, subcomponent_type INTEGER,
+    keyentryid INTEGER, blob BLOB);
+"""
+
+
+def keystore_files(committed: int = 1, in_wal: int = 1) -> Tuple[bytes, bytes]:
+    """Return the bytes of a keystore2-like database and of its pending WAL.
+
+    The first ``committed`` keys are checkpointed into the database file; the
+    next ``in_wal`` keys only exist in the WAL, as on a live device.
+    """
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "persistent.sqlite"
+        connection = sqlite3.connect(path)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            for key_id in range(committed + in_wal):
+                if key_id == committed:
+                    connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    connection.execute("PRAGMA wal_autocheckpoint=0")
+                connection.execute(
+                    "INSERT INTO keyentry VALUES (?, 0, 0, ?, ?)",
+                    (key_id, 10000 + key_id, f"key{key_id}".encode()),
+                )
+                connection.execute(
+                    "INSERT INTO blobentry VALUES (NULL, 0, ?, ?)", (key_id, b"\0" * 100)
+                )
+                connection.commit()
+            if not in_wal:
+                connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            database = path.read_bytes()
+            wal = path.with_name(path.name + WAL_SUFFIX).read_bytes()
+        finally:
+            connection.close()
+    return database, wal
+
+
+class StreamingShellTransport(LocalShellTransport):
+    """Local shell transport that can also stream command output."""
+
+    @contextmanager
+    def exec_out(self, _serial, command):
+        """Yield the stdout of ``command`` run through ``sh``."""
+
+        with subprocess.Popen(["sh", "-c", command], stdout=subprocess.PIPE) as process:
+            yield process.stdout
+
+
+class KeystoreDbTests(unittest.TestCase):
+    """Behavioural tests for :func:`consolidate` and :class:`KeyIndex`."""
+
+    def setUp(self) -> None:
+        """Write a snapshot with one committed key and one key in its WAL."""
+
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.snapshot = Path(self.tmp.name) / "persistent.sqlite"
+        database, wal = keystore_files()
+        self.snapshot.write_bytes(database)
+        self.snapshot.with_name(self.snapshot.name + WAL_SUFFIX).write_bytes(wal)
+
+    def test_consolidate_folds_wal_rows_into_snapshot(self) -> None:
+        """Keys only present in the WAL should survive consolidation."""
+
+        self.assertTrue(consolidate(self.snapshot))
+
+        self.assertFalse(self.snapshot.with_name(self.snapshot.name + WAL_SUFFIX).exists())
+        connection = sqlite3.connect(self.snapshot)
+        try:
+            (count,) = connection.execute("SELECT COUNT(*) FROM keyentry").fetchone()
+        finally:
+            connection.close()
+        self.assertEqual(count, 2)
+
+    def test_consolidate_rejects_non_database(self) -> None:
+        """A file that is not SQLite should be reported as not intact."""
+
+        self.snapshot.write_bytes(b"not a database")
+
+        self.assertFalse(consolidate(self.snapshot))
+
+    def test_index_looks_up_keys_without_blobs(self) -> None:
+        """The index should answer alias and UID lookups with blob sizes."""
+
+        consolidate(self.snapshot)
+        with KeyIndex(self.snapshot) as index:
+            self.assertEqual(index.build(), 2)
+            (record,) = index.by_alias("key1")
+            self.assertEqual((record.uid, record.blob_count, record.blob_bytes), (10001, 1, 100))
+            self.assertEqual([key.alias for key in index.by_uid(10000)], ["key0"])
+        self.assertTrue(self.snapshot.with_name(self.snapshot.name + INDEX_SUFFIX).exists())
+
+    def test_index_rebuilds_when_snapshot_changes(self) -> None:
+        """A stale sidecar should be rebuilt on first lookup."""
+
+        consolidate(self.snapshot)
+        KeyIndex(self.snapshot).build()
+        database, _ = keystore_files(committed=3, in_wal=0)
+        self.snapshot.write_bytes(database)
+        stat = self.snapshot.stat()
+        os.utime(self.snapshot, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        self.assertEqual(len(list(find_keys([self.snapshot]))), 3)
+
+    def test_index_rejects_non_keystore_database(self) -> None:
+        """Databases without keystore2 tables should raise a clear error."""
+
+        connection = sqlite3.connect(self.snapshot.with_name("other.sqlite"))
+        connection.execute("CREATE TABLE unrelated (id INTEGER)")
+        connection.close()
+
+        with self.assertRaises(KeystoreIndexError):
+            KeyIndex(self.snapshot.with_name("other.sqlite")).build()
+
+    def test_directory_locations_snapshot_databases_with_their_wal(self) -> None:
+        """Databases inside directory locations should arrive consolidated."""
+
+        tree = Path(self.tmp.name)
+        (tree / "blob").write_bytes(b"key")
+        blob, database = (
+            str(path).strip("/").replace("/", "_") for path in (tree / "blob", self.snapshot)
+        )
+        for stream in (False, True):
+            transport = StreamingShellTransport()
+            with self.subTest(stream=stream), tempfile.TemporaryDirectory() as output:
+                extractor = Extractor(
+                    output=output, device="ABC", transport=transport, stream_directories=stream
+                )
+                with redirect_stdout(io.StringIO()):
+                    successes = extractor.extract_all([f"{tree}/"])
+
+                self.assertEqual(successes, [f"{tree}/"])
+                self.assertEqual(transport.pulled, [] if stream else [str(tree / "blob")])
+                self.assertEqual(
+                    sorted(os.listdir(output)), [blob, database, database + INDEX_SUFFIX]
+                )
+                connection = sqlite3.connect(Path(output) / database)
+                try:
+                    (count,) = connection.execute("SELECT COUNT(*) FROM keyentry").fetchone()
+                finally:
+                    connection.close()
+                self.assertEqual(count, 2)
+
+    def test_incremental_directory_runs_treat_database_and_wal_as_one(self) -> None:
+        """A WAL-only change should re-snapshot the database, never pull the WAL alone."""
+
+        tree = Path(self.tmp.name)
+        wal_path = self.snapshot.with_name(self.snapshot.name + WAL_SUFFIX)
+        database = str(self.snapshot).strip("/").replace("/", "_")
+        for stream in (False, True):
+            wal_path.write_bytes(keystore_files()[1])
+            with self.subTest(stream=stream), tempfile.TemporaryDirectory() as output:
+
+                def run(output: str = output, stream: bool = stream) -> str:
+                    extractor = Extractor(
+                        output=output,
+                        device="ABC",
+                        transport=StreamingShellTransport(),
+                        incremental=True,
+                        stream_directories=stream,
+                    )
+                    with redirect_stdout(io.StringIO()) as log:
+                        self.assertEqual(extractor.extract_all([f"{tree}/"]), [f"{tree}/"])
+                    return log.getvalue()
+
+                run()
+                self.assertIn("Transferred 0 file(s)", run())
+                self.assertNotIn(database + WAL_SUFFIX, os.listdir(output))
+
+                wal_path.write_bytes(keystore_files(committed=1, in_wal=2)[1])
+                self.assertIn("Transferred 1 file(s)", run())
+                self.assertNotIn(database + WAL_SUFFIX, os.listdir(output))
+                with KeyIndex(Path(output) / database) as index:
+                    self.assertEqual(len(index.by_uid(10002)), 1)
+
+    def test_prefiltered_pulls_keep_the_wal_of_kept_databases(self) -> None:
+        """The pre-filter should keep a database's WAL so no key is lost."""
+
+        tree = Path(self.tmp.name)
+        (tree / "cache.tmp").write_bytes(b"noise")
+        output = StreamingShellTransport().shell(None, [filter_command([str(tree)])])
+        kept, _ = parse_filter_output(output)
+        self.assertEqual(sorted(kept), [str(self.snapshot), f"{self.snapshot}{WAL_SUFFIX}"])
+
+        database = str(self.snapshot).strip("/").replace("/", "_")
+        for stream in (False, True):
+            with self.subTest(stream=stream), tempfile.TemporaryDirectory() as output:
+                extractor = Extractor(
+                    output=output,
+                    device="ABC",
+                    transport=StreamingShellTransport(),
+                    prefilter=DEFAULT_RULES,
+                    stream_directories=stream,
+                )
+                with redirect_stdout(io.StringIO()):
+                    self.assertEqual(extractor.extract_all([f"{tree}/"]), [f"{tree}/"])
+
+                self.assertEqual(
+                    sorted(os.listdir(output)), [database, database + INDEX_SUFFIX]
+                )
+                with KeyIndex(Path(output) / database) as index:
+                    self.assertEqual(index.build(), 2)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Unit tests for the incremental extraction manifest."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from pykeypull.manifest import (
+    STATE_COMMAND_LIMIT,
+    Manifest,
+    RemoteFileState,
+    parse_state_output,
+    state_command,
+    state_commands,
+)
+
+
+class ManifestTests(unittest.TestCase):
+    """Behavioural tests for :mod:`pykeypull.manifest`."""
+
+    def test_state_command_quotes_paths(self) -> None:
+        """Remote paths should be shell-quoted in the batched probe."""
+
+        self.assertIn("'/data/with space'", state_command(["/data/with space"]))
+
+    def test_state_commands_stay_within_the_length_limit(self) -> None:
+        """Large file lists should be probed in several bounded commands."""
+
+        files = [f"/data/misc/keystore/user_0/10{index:03d}_USRPKEY_alias" for index in range(600)]
+
+        commands = state_commands(files)
+
+        self.assertGreater(len(commands), 1)
+        self.assertTrue(all(len(command) <= STATE_COMMAND_LIMIT for command in commands))
+        self.assertEqual(sum(command.count("_USRPKEY_") for command in commands), 3 * 600)
+        self.assertEqual(state_commands(files[:2]), [state_command(files[:2])])
+
+    def test_parse_state_output_merges_stat_and_digest(self) -> None:
+        """Sizes, mtimes and digests should be joined per path."""
+
+        output = (
+            "12 1700000000 /data/a\n"
+            "7 1700000001 /data/with space\n"
+            "--keypull-digests--\n"
+            "abc123  /data/a\n"
+        )
+
+        states = parse_state_output(output)
+
+        self.assertEqual(states["/data/a"], RemoteFileState(12, 1700000000, "abc123"))
+        self.assertEqual(states["/data/with space"], RemoteFileState(7, 1700000001, None))
+
+    def test_manifest_round_trip_detects_changes(self) -> None:
+        """Recorded files should only count as unchanged while state and copy match."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp)
+            local = output / "data_a"
+            local.write_bytes(b"payload")
+            state = RemoteFileState(7, 1, "abc")
+
+            manifest = Manifest.for_device(output, "host:5555")
+            manifest.record("/data/a", state, local)
+            manifest.save()
+
+            reloaded = Manifest.for_device(output, "host:5555")
+            self.assertEqual(reloaded.path.name, ".keypull-manifest-host_5555.json")
+            self.assertTrue(reloaded.is_unchanged("/data/a", state, local))
+            self.assertFalse(reloaded.is_unchanged("/data/a", RemoteFileState(7, 2, "abc"), local))
+            local.write_bytes(b"short")
+            self.assertFalse(reloaded.is_unchanged("/data/a", state, local))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Unit tests for per-phase extraction metrics."""
+
+import io
+import json
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from pykeypull.extractor import Extractor
+from pykeypull.metrics import EXTRACT, PLAN, TRANSFER, Metrics
+
+
+class MetricsTests(unittest.TestCase):
+    """Behavioural tests for :class:`Metrics`."""
+
+    def test_measure_aggregates_and_notifies_listeners(self) -> None:
+        """Events should be summed per location and passed to every listener."""
+
+        metrics = Metrics()
+        events = []
+        metrics.subscribe(events.append)
+
+        for size in (10, 20):
+            with metrics.measure(TRANSFER, "ABC123", "/data") as measurement:
+                measurement.bytes = size
+                measurement.files = 1
+        with self.assertRaises(ValueError):
+            with metrics.measure(TRANSFER, "ABC123", "/data"):
+                raise ValueError("boom")
+
+        totals = metrics.totals()[("ABC123", "/data", TRANSFER)]
+        self.assertEqual((totals.count, totals.bytes, totals.files), (3, 30, 2))
+        self.assertEqual(totals.failures, 1)
+        self.assertEqual([event.error for event in events], [None, None, "boom"])
+
+    def test_extractor_reports_phases_per_location(self) -> None:
+        """An extraction run should record planning and per-location transfers."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            extractor = Extractor(output=tmp, device="ABC123")
+
+            def fake_run(args, **_kwargs):
+                if args[3] == "pull":
+                    if args[4].endswith("-wal"):
+                        raise subprocess.CalledProcessError(1, args, b"", b"does not exist")
+                    Path(args[5]).write_bytes(b"12345")
+                    return subprocess.CompletedProcess(args, 0, b"", b"")
+                plan = "L|f|/data/persistent.sqlite\nF|5|1|/data/persistent.sqlite\n"
+                return subprocess.CompletedProcess(args, 0, plan, "")
+
+            # The device has no tar, so the database snapshot falls back to a pull.
+            no_tar = MagicMock()
+            no_tar.__enter__.return_value.stdout = io.BytesIO(b"")
+            with patch("pykeypull.transport.subprocess.run", side_effect=fake_run), patch(
+                "pykeypull.transport.subprocess.Popen", return_value=no_tar
+            ):
+                extractor.extract_all(["/data/persistent.sqlite"])
+
+            path = Path(tmp) / "metrics.json"
+            extractor.metrics.write_json(path)
+            report = json.loads(path.read_text(encoding="utf-8"))
+
+        self.assertEqual(report["phases"][PLAN]["files"], 1)
+        self.assertEqual(report["phases"][TRANSFER]["bytes"], 5)
+        extract = [row for row in report["entries"] if row["phase"] == EXTRACT]
+        self.assertEqual(len(extract), 1)
+        self.assertEqual(extract[0]["location"], "/data/persistent.sqlite")
+        self.assertEqual((extract[0]["bytes"], extract[0]["files"]), (5, 1))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Unit tests for batched location planning."""
+
+import unittest
+
+from pykeypull.plan import DIRECTORY, FILE, MISSING, PlanEntry, parse_plan_output, plan_command
+
+
+class PlanTests(unittest.TestCase):
+    """Behavioural tests for :mod:`pykeypull.plan`."""
+
+    def test_plan_command_covers_every_location(self) -> None:
+        """All locations should be expanded by a single shell loop."""
+
+        command = plan_command(["/data/misc/keystore/", "/data/adb/tricky_store/keybox.xml"])
+
+        self.assertTrue(command.startswith("for p in /data/misc/keystore/ "))
+        self.assertIn("/data/adb/tricky_store/keybox.xml;", command)
+
+    def test_parse_plan_output_groups_files_by_location(self) -> None:
+        """File lines should be attached to the preceding location header."""
+
+        output = (
+            "L|d|/data/misc/keystore/\n"
+            "F|12|1700000000|/data/misc/keystore//user_0/blob\n"
+            "F|4|1700000001|/data/misc/keystore/persistent.sqlite\n"
+            "L|f|/data/adb/tricky_store/keybox.xml\n"
+            "F|900|1700000002|/data/adb/tricky_store/keybox.xml\n"
+            "L|m|/vendor/etc/keystore/\n"
+        )
+
+        plans = parse_plan_output(output)
+
+        directory = plans["/data/misc/keystore/"]
+        self.assertEqual(directory.kind, DIRECTORY)
+        self.assertEqual(
+            directory.files[0], PlanEntry("/data/misc/keystore/user_0/blob", 12, 1700000000)
+        )
+        self.assertEqual(directory.total_size, 16)
+        self.assertEqual(plans["/data/adb/tricky_store/keybox.xml"].kind, FILE)
+        self.assertEqual(plans["/vendor/etc/keystore/"].kind, MISSING)
+        self.assertEqual(plans["/vendor/etc/keystore/"].files, [])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
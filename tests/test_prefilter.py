@@ -0,0 +1,97 @@
+"""Unit tests for on-device pre-filtering of directory contents."""
+
+import io
+import shutil
+import subprocess
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from test_keybox import keybox_xml
+from pykeypull.extractor import Extractor
+from pykeypull.prefilter import DEFAULT_RULES, Rule, filter_command, parse_filter_output
+
+
+class LocalShellTransport:
+    """Run device commands with the host ``sh`` against real host paths."""
+
+    def __init__(self):
+        self.pulled = []
+
+    def shell(self, _serial, args):
+        """Run the single command string through ``sh``."""
+
+        return subprocess.run(
+            ["sh", "-c", " ".join(args)], check=True, stdout=subprocess.PIPE, text=True
+        ).stdout
+
+    def pull(self, _serial, remote, local):
+        """Copy ``remote`` from the host filesystem."""
+
+        self.pulled.append(remote)
+        shutil.copyfile(remote, local)
+
+
+class PrefilterTests(unittest.TestCase):
+    """Behavioural tests for :mod:`pykeypull.prefilter`."""
+
+    def setUp(self) -> None:
+        """Build a noisy keystore tree with a few relevant files."""
+
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.tree = Path(self.tmp.name) / "keystore"
+        (self.tree / "user_0").mkdir(parents=True)
+        (self.tree / "keybox.xml").write_bytes(keybox_xml(1))
+        (self.tree / "layout.xml").write_text("<LinearLayout/>", encoding="utf-8")
+        (self.tree / "user_0" / "10001_USRPKEY_alias").write_bytes(b"\x03blob")
+        (self.tree / "user_0" / "10001_USRCERT_huge").write_bytes(b"\0" * (2 * 1024 * 1024))
+        (self.tree / "index.db").write_bytes(b"SQLite format 3\0" + b"\0" * 84)
+        (self.tree / "fake.db").write_bytes(b"not a database")
+        (self.tree / "cache.tmp").write_bytes(b"noise")
+
+    def test_filter_command_checks_name_size_and_magic(self) -> None:
+        """Only files matching a rule's name, size and magic should be kept."""
+
+        output = LocalShellTransport().shell(None, [filter_command([str(self.tree)])])
+        kept, examined = parse_filter_output(output)
+
+        self.assertEqual(examined, 7)
+        self.assertEqual(
+            sorted(Path(path).name for path in kept),
+            ["10001_USRPKEY_alias", "index.db", "keybox.xml"],
+        )
+
+    def test_first_matching_rule_decides(self) -> None:
+        """A file claimed by an earlier rule should not fall through to a later one."""
+
+        rules = (Rule("nothing", ("*.tmp",), "never-present", 64), Rule("all", ("*",)))
+        output = LocalShellTransport().shell(None, [filter_command([str(self.tree)], rules)])
+        kept, _ = parse_filter_output(output)
+
+        self.assertEqual(len(kept), 6)
+        self.assertNotIn(str(self.tree / "cache.tmp"), kept)
+
+    def test_extractor_transfers_only_matching_files(self) -> None:
+        """Directory extraction with a pre-filter should skip non-matching files."""
+
+        transport = LocalShellTransport()
+        output = Path(self.tmp.name) / "output"
+        extractor = Extractor(
+            output=str(output), device="ABC123", transport=transport, prefilter=DEFAULT_RULES
+        )
+        extractor.ensure_output_directory()
+
+        with redirect_stdout(io.StringIO()):
+            successes = extractor.extract_all([f"{self.tree}/"])
+
+        self.assertEqual(successes, [f"{self.tree}/"])
+        self.assertEqual(
+            sorted(Path(remote).name for remote in transport.pulled),
+            ["10001_USRPKEY_alias", "index.db", "keybox.xml"],
+        )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
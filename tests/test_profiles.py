@@ -0,0 +1,142 @@
+"""Unit tests for adaptive location discovery and the profile cache."""
+
+import io
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from pykeypull.extractor import ExtractionError, Extractor
+from pykeypull.locations import DEVICE_LOCATIONS, IDENTITY_COMMAND, merge_found, search_command
+from pykeypull.plan import parse_plan_output
+from pykeypull.profiles import ProfileCache
+
+FOUND = "/persist/attest/keybox_prod.xml\n/data/misc/keystore/persistent.sqlite\n"
+
+
+class DiscoveryTransport:  # pylint: disable=too-few-public-methods
+    """Answer the identity and search commands of a Pixel-like device."""
+
+    def __init__(self, fingerprint: str = "google/oriole/oriole:14/UQ1A/1:user/release-keys"):
+        self.fingerprint = fingerprint
+        self.commands = []
+
+    def shell(self, _serial, args):
+        """Return the model and build for getprop, or the search results for find."""
+
+        self.commands.append(args[0])
+        if args == [IDENTITY_COMMAND]:
+            return f"Pixel 6\n{self.fingerprint}\n"
+        return FOUND
+
+
+class ProfileTests(unittest.TestCase):
+    """Behavioural tests for :class:`ProfileCache` and location discovery."""
+
+    def setUp(self) -> None:
+        """Point a persistent profile cache at a temporary file."""
+
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "profiles.json"
+
+    def test_lookup_falls_back_from_build_to_model(self) -> None:
+        """A new build of a known model should reuse the model's profile."""
+
+        ProfileCache(self.path).learn("Pixel 6", "build-1", ["/persist/keybox.xml"])
+
+        cache = ProfileCache(self.path)
+        self.assertEqual(cache.lookup("Pixel 6", "build-2"), ["/persist/keybox.xml"])
+        self.assertIsNone(cache.lookup("Pixel 7", "build-3"))
+        self.assertIsNone(ProfileCache(self.path, refresh=True).lookup("Pixel 6", "build-1"))
+
+    def test_merge_found_skips_covered_paths(self) -> None:
+        """Search hits inside a candidate directory should not be added twice."""
+
+        locations = merge_found(DEVICE_LOCATIONS, FOUND.split())
+
+        self.assertEqual(locations[: len(DEVICE_LOCATIONS)], list(DEVICE_LOCATIONS))
+        self.assertEqual(locations[len(DEVICE_LOCATIONS):], ["/persist/attest/keybox_prod.xml"])
+        self.assertIn("-maxdepth", search_command())
+
+    def test_known_model_skips_search(self) -> None:
+        """Repeat runs should go straight to the locations that held data."""
+
+        transport = DiscoveryTransport()
+        cache = ProfileCache(self.path)
+        extractor = Extractor(device="ABC123", transport=transport, profiles=cache)
+        with redirect_stdout(io.StringIO()):
+            first = extractor.discover_locations()
+        self.assertIn("/persist/attest/keybox_prod.xml", first)
+        self.assertEqual(len(transport.commands), 2)
+
+        cache.learn("Pixel 6", transport.fingerprint, ["/persist/attest/keybox_prod.xml"])
+        transport.commands.clear()
+        with redirect_stdout(io.StringIO()):
+            second = Extractor(
+                device="ABC123", transport=transport, profiles=ProfileCache(self.path)
+            ).discover_locations()
+
+        self.assertEqual(second, ["/persist/attest/keybox_prod.xml"])
+        self.assertEqual(transport.commands, [IDENTITY_COMMAND])
+
+    def test_extract_all_learns_productive_locations(self) -> None:
+        """Only locations that yielded data should be remembered."""
+
+        cache = ProfileCache(self.path)
+        extractor = Extractor(device="ABC123", transport=DiscoveryTransport(), profiles=cache)
+        with redirect_stdout(io.StringIO()):
+            extractor.discover_locations()
+        extractor.plan_locations = lambda locations: {}
+        extractor.extract_from_location = _only_persist
+
+        with redirect_stdout(io.StringIO()):
+            extractor.extract_all(["/vendor/etc/keystore/", "/persist/attest/keybox_prod.xml"])
+
+        self.assertEqual(
+            ProfileCache(self.path).lookup("Pixel 6", ""), ["/persist/attest/keybox_prod.xml"]
+        )
+
+    def test_transient_failures_keep_learned_locations(self) -> None:
+        """A run should only forget locations the plan confirmed missing or empty."""
+
+        cache = ProfileCache(self.path)
+        cache.learn("Pixel 6", "", ["/gone.xml", "/persist/flaky.xml", "/persist/empty/"])
+        extractor = Extractor(device="ABC123", transport=DiscoveryTransport(), profiles=cache)
+        with redirect_stdout(io.StringIO()):
+            extractor.discover_locations()
+        extractor.plan_locations = lambda locations: parse_plan_output(
+            "L|m|/gone.xml\nL|f|/persist/flaky.xml\nF|9|1|/persist/flaky.xml\n"
+            "L|d|/persist/empty/\nL|f|/persist/new.xml\nF|9|1|/persist/new.xml\n"
+        )
+        extractor.extract_from_location = _fail_flaky
+
+        with redirect_stdout(io.StringIO()):
+            extractor.extract_all(
+                ["/gone.xml", "/persist/flaky.xml", "/persist/empty/", "/persist/new.xml"]
+            )
+
+        self.assertEqual(
+            ProfileCache(self.path).lookup("Pixel 6", ""),
+            ["/persist/flaky.xml", "/persist/new.xml"],
+        )
+
+
+def _fail_flaky(location, plan=None):
+    """Fail on unplanned files and transiently on ``/persist/flaky.xml``."""
+
+    if not plan.files:
+        raise ExtractionError(f"no files found in {location}")
+    if location == "/persist/flaky.xml":
+        raise ExtractionError("read failed for /persist/flaky.xml: error: device offline")
+
+
+def _only_persist(location, _plan=None):
+    """Pretend that only locations below ``/persist`` exist on the device."""
+
+    if not location.startswith("/persist"):
+        raise ExtractionError(f"{location} does not exist on the device")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Unit tests for resumable chunked transfers."""
+
+import hashlib
+import io
+import re
+import tempfile
+import unittest
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import patch
+
+# Accessing protected members is acceptable in unit tests.
+# pylint: disable=protected-access
+
+from pykeypull.extractor import ExtractionError, Extractor
+from pykeypull.plan import PlanEntry
+from pykeypull.resume import Checkpoint, partial_path
+
+DATA = bytes(range(256)) * 40
+
+
+class ChunkTransport:
+    """Serve ``DATA`` through ``dd`` reads, optionally cutting one read short."""
+
+    def __init__(self, fail_at_skip: int | None = None) -> None:
+        self.fail_at_skip = fail_at_skip
+        self.skips = []
+
+    def shell(self, _serial, _args):
+        """Answer the on-device digest request."""
+
+        return f"{hashlib.sha256(DATA).hexdigest()}  /data/persistent.sqlite\n"
+
+    @contextmanager
+    def exec_out(self, _serial, command):
+        """Yield the byte range requested by a ``dd`` command."""
+
+        block, skip, count = (
+            int(value) for value in re.search(r"bs=(\d+) skip=(\d+) count=(\d+)", command).groups()
+        )
+        self.skips.append(skip)
+        payload = DATA[skip * block:(skip + count) * block]
+        if skip == self.fail_at_skip:
+            payload = payload[: len(payload) // 2]
+        yield io.BytesIO(payload)
+
+
+class ResumeTests(unittest.TestCase):
+    """Behavioural tests for :meth:`Extractor._resumable_pull`."""
+
+    def setUp(self) -> None:
+        """Use tiny blocks so that ``DATA`` spans several chunks."""
+
+        for name, value in (("BLOCK_SIZE", 1024), ("CHUNK_SIZE", 4096)):
+            patcher = patch(f"pykeypull.resume.{name}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.destination = Path(self.tmp.name) / "persistent.sqlite"
+        self.entry = PlanEntry("/data/persistent.sqlite", len(DATA), 100)
+
+    def _extractor(self, transport: ChunkTransport) -> Extractor:
+        return Extractor(output=self.tmp.name, device="ABC123", transport=transport)
+
+    def test_interrupted_transfer_resumes_from_checkpoint(self) -> None:
+        """A second run should only request the chunks after the last checkpoint."""
+
+        flaky = ChunkTransport(fail_at_skip=8)
+        with self.assertRaises(ExtractionError):
+            self._extractor(flaky)._resumable_pull(self.entry.path, self.destination, self.entry)
+        checkpoint = Checkpoint.load(partial_path(self.destination))
+        self.assertEqual(checkpoint.offset, 8192)
+
+        steady = ChunkTransport()
+        self._extractor(steady)._resumable_pull(self.entry.path, self.destination, self.entry)
+
+        self.assertEqual(steady.skips, [8])
+        self.assertEqual(self.destination.read_bytes(), DATA)
+        self.assertFalse(partial_path(self.destination).exists())
+        self.assertIsNone(Checkpoint.load(partial_path(self.destination)))
+
+    def test_changed_remote_file_restarts_transfer(self) -> None:
+        """A checkpoint for another size or mtime should be discarded."""
+
+        with self.assertRaises(ExtractionError):
+            self._extractor(ChunkTransport(fail_at_skip=4))._resumable_pull(
+                self.entry.path, self.destination, self.entry
+            )
+        changed = PlanEntry(self.entry.path, len(DATA), 200)
+
+        transport = ChunkTransport()
+        self._extractor(transport)._resumable_pull(self.entry.path, self.destination, changed)
+
+        self.assertEqual(transport.skips[0], 0)
+        self.assertEqual(self.destination.read_bytes(), DATA)
+
+    def test_digest_mismatch_discards_partial(self) -> None:
+        """A copy that does not match the on-device hash must not be kept."""
+
+        transport = ChunkTransport()
+        with patch.object(ChunkTransport, "shell", return_value="0" * 64 + "  x\n"):
+            with self.assertRaisesRegex(ExtractionError, "sha256 mismatch"):
+                self._extractor(transport)._resumable_pull(
+                    self.entry.path, self.destination, self.entry
+                )
+
+        self.assertFalse(self.destination.exists())
+        self.assertFalse(partial_path(self.destination).exists())
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
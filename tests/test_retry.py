@@ -0,0 +1,159 @@
+"""Unit tests for ADB retries and the per-device circuit breaker."""
+
+import io
+import subprocess
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+from pykeypull.extractor import Extractor
+from pykeypull.retry import (
+    FAILED,
+    MISSING,
+    PERMISSION,
+    TRANSIENT,
+    DeviceUnavailableError,
+    Retrier,
+    RetryPolicy,
+    classify,
+)
+from pykeypull.transport import SubprocessTransport, TransportError
+
+
+class Flaky:  # pylint: disable=too-few-public-methods
+    """Fail with each of ``errors`` in turn, then return ``"done"``."""
+
+    def __init__(self, *errors: str) -> None:
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise TransportError(self.errors.pop(0))
+        return "done"
+
+
+class DeadTransport:
+    """A device that went offline: every operation fails after a delay."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def shell(self, _serial, _args):
+        """Fail like ``adb shell`` against an offline device."""
+
+        self.calls += 1
+        raise TransportError("error: device offline")
+
+    def pull(self, _serial, _remote, _local):
+        """Fail like ``adb pull`` against an offline device."""
+
+        self.calls += 1
+        raise TransportError("error: device offline")
+
+
+class RetryTests(unittest.TestCase):
+    """Behavioural tests for :mod:`pykeypull.retry`."""
+
+    def test_classify(self) -> None:
+        """Common adb and shell messages should map to their failure class."""
+
+        self.assertEqual(classify("error: device 'ABC' not found"), TRANSIENT)
+        self.assertEqual(classify("adb shell timed out after 5s"), TRANSIENT)
+        self.assertEqual(classify("cat: /data/x: Permission denied"), PERMISSION)
+        self.assertEqual(classify("remote object '/x' does not exist"), MISSING)
+        self.assertEqual(classify(""), FAILED)
+
+    def test_transient_failures_back_off_and_recover(self) -> None:
+        """Transient failures should be retried with growing delays."""
+
+        retrier = Retrier()
+        operation = Flaky("device offline", "connection reset by peer")
+        with patch("pykeypull.retry.time.sleep") as sleep:
+            self.assertEqual(retrier.call("ABC", operation), "done")
+
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+        self.assertEqual(retrier.outcomes("ABC"), {TRANSIENT: 2, "ok": 1})
+
+    def test_permanent_failures_are_not_retried(self) -> None:
+        """Permission errors and missing paths should fail on the first attempt."""
+
+        retrier = Retrier()
+        operation = Flaky("Permission denied")
+        with self.assertRaises(TransportError):
+            retrier.call("ABC", operation)
+
+        self.assertEqual(operation.calls, 1)
+        self.assertEqual(retrier.outcomes("ABC"), {PERMISSION: 1})
+
+    def test_breaker_stops_calls_to_a_dead_device(self) -> None:
+        """Once tripped, calls should fail without touching the device."""
+
+        retrier = Retrier(RetryPolicy(attempts=2, base_delay=0, breaker_threshold=2))
+        dead = Flaky(*["device offline"] * 10)
+        with self.assertRaises(TransportError):
+            retrier.call("ABC", dead)
+        with self.assertRaises(DeviceUnavailableError):
+            retrier.call("ABC", dead)
+
+        self.assertEqual(dead.calls, 2)
+        self.assertFalse(retrier.available("ABC"))
+        self.assertTrue(retrier.available("OTHER"))
+        self.assertEqual(retrier.call("OTHER", Flaky()), "done")
+
+    def test_subprocess_timeouts_are_transient(self) -> None:
+        """A command exceeding its timeout should surface as a transient error."""
+
+        transport = SubprocessTransport(timeout=5)
+        with patch("pykeypull.transport.subprocess.run") as run:
+            run.side_effect = subprocess.TimeoutExpired(["adb", "-s", "ABC", "shell", "id"], 5)
+            with self.assertRaises(TransportError) as caught:
+                transport.shell("ABC", ["id"])
+
+        self.assertEqual(str(caught.exception), "adb shell timed out after 5s")
+        self.assertEqual(classify(caught.exception), TRANSIENT)
+        self.assertEqual(run.call_args.kwargs["timeout"], 5)
+
+    def test_stalled_exec_out_streams_are_killed(self) -> None:
+        """A stream that stops delivering data should time out instead of hanging."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            adb = Path(tmp) / "adb"
+            adb.write_text("#!/bin/sh\nprintf data\nexec sleep 30\n", encoding="utf-8")
+            adb.chmod(0o755)
+            transport = SubprocessTransport(str(adb), timeout=0.2)
+            started = time.monotonic()
+            with self.assertRaises(TransportError) as caught:
+                with transport.exec_out("ABC", "cat /data/keybox.xml") as stream:
+                    self.assertEqual(stream.read(4), b"data")
+                    stream.read()
+
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertIn("timed out", str(caught.exception))
+        self.assertEqual(classify(caught.exception), TRANSIENT)
+
+    def test_extractor_skips_remaining_locations_of_dead_device(self) -> None:
+        """A dead device should only be tried until its breaker opens."""
+
+        transport = DeadTransport()
+        retrier = Retrier(RetryPolicy(attempts=2, base_delay=0, breaker_threshold=2))
+        with tempfile.TemporaryDirectory() as tmp:
+            extractor = Extractor(output=tmp, device="ABC", transport=transport, retrier=retrier)
+            output = io.StringIO()
+            with redirect_stdout(output):
+                successes = extractor.extract_all(
+                    ["/a/keybox.xml", "/b/keybox.xml", "/c/", "/d/keybox.xml"]
+                )
+
+        self.assertEqual(successes, [])
+        self.assertLessEqual(transport.calls, 2)
+        self.assertIn("Skipped: ABC stopped responding", output.getvalue())
+        self.assertIn("ADB attempts: 2 transient", output.getvalue())
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,206 @@
+"""Unit tests for per-hub transfer scheduling."""
+
+import io
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+from test_keystoredb import StreamingShellTransport
+from test_prefilter import LocalShellTransport
+from pykeypull.extractor import Extractor
+from pykeypull.plan import FILE, LocationPlan, PlanEntry
+from pykeypull.scheduler import SHARED_GROUP, TransferScheduler, hub_of, transfer_order
+from pykeypull.transport import TransportError, parse_topology_output
+
+DEVICES_L = (
+    "List of devices attached\n"
+    "AAA device usb:1-1.2 product:oriole model:Pixel_6 transport_id:1\n"
+    "BBB device usb:1-1.3 product:oriole model:Pixel_6 transport_id:2\n"
+    "CCC device usb:2-4 product:panther model:Pixel_7 transport_id:3\n"
+    "192.168.1.5:5555 device product:cheetah model:Pixel_7_Pro transport_id:4\n"
+)
+
+
+class TopologyTransport(LocalShellTransport):
+    """Local shell transport that reports the fleet above as its USB topology."""
+
+    def topology(self):
+        """Return the ports listed in :data:`DEVICES_L`."""
+
+        return parse_topology_output(DEVICES_L)
+
+
+class StreamingTopologyTransport(StreamingShellTransport, TopologyTransport):
+    """Streaming local shell transport with the fleet's USB topology."""
+
+
+class RecordingScheduler(TransferScheduler):
+    """Scheduler that records whether a transfer slot is currently held."""
+
+    held = False
+
+    @contextmanager
+    def slot(self, serial: str):
+        """Hold the slot of ``serial`` and flag it as held meanwhile."""
+
+        with super().slot(serial):
+            self.held = True
+            try:
+                yield
+            finally:
+                self.held = False
+
+
+class SchedulerTests(unittest.TestCase):
+    """Behavioural tests for :mod:`pykeypull.scheduler`."""
+
+    def test_devices_are_grouped_by_hub(self) -> None:
+        """Devices behind one hub should share a group; others get their own."""
+
+        scheduler = TransferScheduler(TopologyTransport())
+
+        self.assertEqual(hub_of("1-1.2"), "1-1")
+        self.assertEqual(hub_of("2-4"), "2")
+        self.assertEqual(scheduler.group("AAA"), scheduler.group("BBB"))
+        self.assertEqual(scheduler.group("CCC"), "usb:2")
+        self.assertEqual(scheduler.group("192.168.1.5:5555"), "device:192.168.1.5:5555")
+
+    def test_slots_limit_transfers_per_hub(self) -> None:
+        """Only ``per_hub`` transfers should run at once behind the same hub."""
+
+        scheduler = TransferScheduler(TopologyTransport(), per_hub=1)
+        running = {"usb:1-1": 0, "usb:2": 0}
+        peak = dict(running)
+        lock = threading.Lock()
+
+        def transfer(serial: str) -> None:
+            group = scheduler.group(serial)
+            with scheduler.slot(serial):
+                with lock:
+                    running[group] += 1
+                    peak[group] = max(peak[group], running[group])
+                time.sleep(0.02)
+                with lock:
+                    running[group] -= 1
+
+        threads = [
+            threading.Thread(target=transfer, args=(serial,))
+            for serial in ("AAA", "BBB", "AAA", "BBB", "CCC")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(peak, {"usb:1-1": 1, "usb:2": 1})
+
+    def test_bandwidth_budget_paces_a_hub(self) -> None:
+        """Bytes beyond the hub's budget should delay the next transfer's start."""
+
+        scheduler = TransferScheduler(TopologyTransport(), bandwidth=1000)
+        with patch("pykeypull.scheduler.time.sleep") as sleep:
+            scheduler.consume("AAA", 500)
+            scheduler.consume("BBB", 500)
+            scheduler.consume("CCC", 500)
+            self.assertEqual(sleep.call_count, 0)
+            with scheduler.slot("CCC"):
+                pass
+            with scheduler.slot("AAA"):
+                pass
+
+        self.assertEqual(sleep.call_count, 2)
+        self.assertAlmostEqual(sleep.call_args.args[0], 1.0, delta=0.05)
+
+    def test_unreadable_topology_is_read_once(self) -> None:
+        """A failed topology read should put every device in one group for good."""
+
+        transport = TopologyTransport()
+        scheduler = TransferScheduler(transport, bandwidth=1e9)
+        with (
+            patch.object(transport, "topology", side_effect=TransportError("closed")) as topology,
+            redirect_stdout(io.StringIO()) as output,
+        ):
+            groups = {scheduler.group(serial) for serial in ("AAA", "CCC", "AAA")}
+            with scheduler.slot("BBB"):
+                scheduler.consume("BBB", 100)
+
+        self.assertEqual(groups, {SHARED_GROUP})
+        self.assertEqual(topology.call_count, 1)
+        self.assertEqual(output.getvalue().count("Could not read the USB topology"), 1)
+
+    def test_small_locations_go_first(self) -> None:
+        """Planned locations should be ordered by size, unplanned ones last."""
+
+        plans = {
+            "/big.sqlite": LocationPlan("/big.sqlite", FILE, [PlanEntry("/big.sqlite", 900, 0)]),
+            "/small.xml": LocationPlan("/small.xml", FILE, [PlanEntry("/small.xml", 10, 0)]),
+        }
+        self.assertEqual(
+            transfer_order(["/unplanned/", "/big.sqlite", "/small.xml"], plans),
+            ["/small.xml", "/big.sqlite", "/unplanned/"],
+        )
+
+    def test_extractor_pulls_small_files_first(self) -> None:
+        """Scheduled directory pulls should start with the smallest files."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tree = Path(tmp) / "keystore"
+            tree.mkdir()
+            for name, size in (("large", 4096), ("tiny", 1), ("medium", 128)):
+                (tree / name).write_bytes(b"x" * size)
+            transport = TopologyTransport()
+            extractor = Extractor(
+                output=str(Path(tmp) / "output"),
+                device="AAA",
+                transport=transport,
+                scheduler=TransferScheduler(transport),
+            )
+            extractor.ensure_output_directory()
+
+            with redirect_stdout(io.StringIO()):
+                successes = extractor.extract_all([f"{tree}/", "/missing.xml"])
+
+        self.assertEqual(successes, [f"{tree}/"])
+        self.assertEqual(
+            [Path(remote).name for remote in transport.pulled], ["tiny", "medium", "large"]
+        )
+
+    def test_streamed_keyboxes_are_validated_outside_the_slot(self) -> None:
+        """Streamed directory files should only be validated once the slot is free."""
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tree = Path(tmp) / "keystore"
+            tree.mkdir()
+            (tree / "keybox.xml").write_text("<AndroidAttestation/>")
+            transport = StreamingTopologyTransport()
+            scheduler = RecordingScheduler(transport)
+            extractor = Extractor(
+                output=str(Path(tmp) / "output"),
+                device="AAA",
+                transport=transport,
+                scheduler=scheduler,
+                stream_directories=True,
+            )
+            extractor.ensure_output_directory()
+            held = []
+
+            with (
+                patch(
+                    "pykeypull.extractor.validate_keybox",
+                    side_effect=lambda _path: held.append(scheduler.held),
+                ),
+                redirect_stdout(io.StringIO()),
+            ):
+                successes = extractor.extract_all([f"{tree}/"])
+
+        self.assertEqual(successes, [f"{tree}/"])
+        self.assertEqual(transport.pulled, [])
+        self.assertEqual(held, [False])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,139 @@
+"""Unit tests for the archive output sinks."""
+
+import io
+import subprocess
+import tarfile
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+from test_extractor import _build_tar, _fake_process
+from test_keybox import keybox_xml
+from test_prefilter import LocalShellTransport
+from pykeypull.extractor import Extractor
+from pykeypull.rootcache import ROOT_SU
+from pykeypull.sinks import SINKS, TarSink, ZipSink, list_members, read_member
+
+
+class SinkTests(unittest.TestCase):
+    """Behavioural tests for :mod:`pykeypull.sinks`."""
+
+    def setUp(self) -> None:
+        """Create a staging directory for the files handed to the sinks."""
+
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.output = Path(self.tmp.name) / "ABC123"
+
+    def _stage(self, name: str, data: bytes) -> Path:
+        self.output.mkdir(exist_ok=True)
+        path = self.output / name
+        path.write_bytes(data)
+        return path
+
+    def test_archives_keep_members_and_read_them_singly(self) -> None:
+        """Both archive formats should keep remote paths across reopened sinks.
+
+        A file written again on a later run should replace its old copy.
+        """
+
+        blob = bytes(range(256)) * 4096
+        for sink_class in (ZipSink, TarSink):
+            with self.subTest(sink=sink_class.__name__):
+                sink = sink_class(self.output)
+                sink.add("/data/misc/keystore/keybox.xml", self._stage("a", b"<keybox/>"))
+                sink.close()
+                sink = sink_class(self.output)
+                sink.add("/data/misc/keystore/user_0/" + "k" * 120, self._stage("b", blob))
+                sink.close()
+                sink = sink_class(self.output)
+                sink.add("/data/misc/keystore/keybox.xml", self._stage("c", b"<keybox v=2/>"))
+                sink.close()
+
+                self.assertFalse(self.output.exists())
+                if sink_class is TarSink:
+                    with tarfile.open(sink.path) as archive:
+                        self.assertEqual(len(archive.getnames()), 2)
+                self.assertEqual(
+                    list_members(sink.path),
+                    ["data/misc/keystore/keybox.xml", "data/misc/keystore/user_0/" + "k" * 120],
+                )
+                first, second = io.BytesIO(), io.BytesIO()
+                read_member(sink.path, "/data/misc/keystore/keybox.xml", first)
+                read_member(sink.path, "data/misc/keystore/user_0/" + "k" * 120, second)
+                self.assertEqual(first.getvalue(), b"<keybox v=2/>")
+                self.assertEqual(second.getvalue(), blob)
+                with self.assertRaises(KeyError):
+                    read_member(sink.path, "/missing", io.BytesIO())
+
+    def test_extractor_moves_files_into_archive(self) -> None:
+        """Extraction with an archive sink should leave only the archive behind."""
+
+        tree = Path(self.tmp.name) / "keystore"
+        (tree / "user_0").mkdir(parents=True)
+        (tree / "keybox.xml").write_bytes(keybox_xml(1))
+        (tree / "user_0" / "10001_USRPKEY_alias").write_bytes(b"\x03blob")
+        extractor = Extractor(
+            output=str(self.output), device="ABC123", transport=LocalShellTransport(), sink="tar"
+        )
+        extractor.ensure_output_directory()
+
+        with redirect_stdout(io.StringIO()):
+            successes = extractor.extract_all([f"{tree}/"])
+
+        self.assertEqual(successes, [f"{tree}/"])
+        self.assertIsInstance(extractor.sink, SINKS["tar"])
+        self.assertEqual(extractor.sink.path, self.output.with_name("ABC123.tar"))
+        self.assertFalse(self.output.exists())
+        member = io.BytesIO()
+        read_member(extractor.sink.path, f"{tree}/keybox.xml", member)
+        self.assertEqual(member.getvalue(), keybox_xml(1))
+        self.assertEqual(len(list_members(extractor.sink.path)), 2)
+
+    def test_su_stream_archives_only_validated_locations(self) -> None:
+        """Files streamed through su should reach the archive after their validation."""
+
+        plan_output = (
+            "L|f|/data/other/bad_keybox.xml\n"
+            "F|9|100|/data/other/bad_keybox.xml\n"
+            "L|d|/data/misc/keystore/\n"
+            "F|3|100|/data/misc/keystore/user_0/blob\n"
+            "L|f|/data/keybox.xml\n"
+            "F|10|100|/data/keybox.xml\n"
+        )
+        archive = _build_tar(
+            {
+                "data/misc/keystore/user_0/blob": b"key",
+                "data/keybox.xml": keybox_xml(1),
+                "data/other/bad_keybox.xml": b"not xml <",
+            }
+        )
+        extractor = Extractor(output=str(self.output), device="ABC123", sink="zip")
+        extractor.root_method = ROOT_SU
+        extractor.ensure_output_directory()
+
+        with (
+            patch("pykeypull.transport.subprocess.run") as mock_run,
+            patch("pykeypull.transport.subprocess.Popen", return_value=_fake_process(archive)),
+            redirect_stdout(io.StringIO()),
+        ):
+            mock_run.return_value = subprocess.CompletedProcess(
+                args=[], returncode=0, stdout=plan_output, stderr=""
+            )
+            successes = extractor.extract_all(
+                ["/data/misc/keystore/", "/data/keybox.xml", "/data/other/bad_keybox.xml"]
+            )
+
+        self.assertEqual(successes, ["/data/misc/keystore/", "/data/keybox.xml"])
+        self.assertEqual(
+            list_members(extractor.sink.path),
+            ["data/keybox.xml", "data/misc/keystore/user_0/blob"],
+        )
+        # The keybox that failed validation stays behind for inspection.
+        self.assertEqual([path.name for path in self.output.iterdir()], ["bad_keybox.xml"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,67 @@
+"""Unit tests for the content-addressed output store."""
+
+import hashlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from pykeypull.store import ContentStore
+
+
+class ContentStoreTests(unittest.TestCase):
+    """Behavioural tests for :class:`ContentStore`."""
+
+    def setUp(self) -> None:
+        """Create a scratch directory holding the store and device outputs."""
+
+        self.tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.store = ContentStore(self.root / "store")
+
+    def test_identical_streams_share_one_blob(self) -> None:
+        """Writing the same bytes for two devices should store them once."""
+
+        first = self.root / "dev1" / "cacerts"
+        second = self.root / "dev2" / "cacerts"
+
+        digest = self.store.write_stream(io.BytesIO(b"shared"), first)
+        self.store.write_stream(io.BytesIO(b"shared"), second)
+
+        self.assertEqual(digest, hashlib.sha256(b"shared").hexdigest())
+        self.assertEqual(second.read_bytes(), b"shared")
+        self.assertTrue(first.samefile(second))
+        self.assertTrue(first.samefile(self.store.object_path(digest)))
+        self.assertEqual((self.store.new_objects, self.store.reused_objects), (1, 1))
+        self.assertEqual(self.store.reused_bytes, 6)
+        self.assertEqual(list((self.store.root / "tmp").iterdir()), [])
+
+    def test_adopt_moves_existing_file_into_store(self) -> None:
+        """Files written by ``adb pull`` should be replaced by links to blobs."""
+
+        pulled = self.root / "dev1" / "keybox.xml"
+        pulled.parent.mkdir()
+        pulled.write_bytes(b"<AndroidAttestation/>")
+
+        digest = self.store.adopt(pulled)
+
+        self.assertEqual(pulled.read_bytes(), b"<AndroidAttestation/>")
+        self.assertTrue(pulled.samefile(self.store.object_path(digest)))
+
+    def test_rewriting_a_destination_does_not_touch_the_blob(self) -> None:
+        """Replacing a linked file should leave other devices' copies intact."""
+
+        first = self.root / "dev1" / "blob"
+        second = self.root / "dev2" / "blob"
+        self.store.write_stream(io.BytesIO(b"v1"), first)
+        self.store.write_stream(io.BytesIO(b"v1"), second)
+
+        self.store.write_stream(io.BytesIO(b"v2"), first)
+
+        self.assertEqual(first.read_bytes(), b"v2")
+        self.assertEqual(second.read_bytes(), b"v1")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
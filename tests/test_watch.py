@@ -0,0 +1,143 @@
+"""Unit tests for the hot-plug watch mode."""
+
+import io
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from pykeypull.extractor import ExtractionError
+from pykeypull.fleet import DeviceResult
+from pykeypull.retry import Retrier, RetryPolicy
+from pykeypull.transport import TransportError
+from pykeypull.watch import DeviceWatcher
+
+UPDATES = [
+    [("A", "device")],
+    [("A", "device"), ("B", "offline")],
+    [("A", "device"), ("B", "device")],
+    [("B", "device")],
+    [("A", "device"), ("B", "device")],
+]
+
+
+class TrackingTransport:
+    """Replay ``updates`` from ``track-devices``, then fail like a dead server.
+
+    Each update waits until ``idle()`` is true so that tests are deterministic.
+    """
+
+    def __init__(self, updates, idle=lambda: True):
+        self.updates = updates
+        self.idle = idle
+
+    def track_devices(self):
+        """Yield each device list, then raise as if the ADB server went away."""
+
+        for update in self.updates:
+            while not self.idle():
+                time.sleep(0.01)
+            yield update
+        raise TransportError("connection closed by ADB server")
+
+    def start_server(self):
+        """Pretend to restart the ADB server."""
+
+
+def _fake_extract(serial, locations, output="output", **_options):
+    """Stand-in for :func:`extract_device` that fails for serial ``B``."""
+
+    if serial == "B":
+        raise RuntimeError("boom")
+    return DeviceResult(serial=serial, output=output, successes=list(locations or ["found"]))
+
+
+class WatchTests(unittest.TestCase):
+    """Behavioural tests for :class:`DeviceWatcher`."""
+
+    def test_extracts_each_attachment_once(self) -> None:
+        """Every newly ready device is queued once per attachment."""
+
+        transport = TrackingTransport(UPDATES)
+        seen = []
+        watcher = DeviceWatcher(
+            transport, None, max_workers=2, on_result=seen.append, incremental=True
+        )
+        # Accessing protected members is acceptable in unit tests.
+        transport.idle = lambda: not watcher._active  # pylint: disable=protected-access
+        with (
+            patch("pykeypull.watch.extract_device", side_effect=_fake_extract) as mock_extract,
+            redirect_stdout(io.StringIO()) as output,
+        ):
+            results = watcher.run(reconnect=False)
+
+        serials = [call.args[0] for call in mock_extract.call_args_list]
+        self.assertEqual(sorted(serials), ["A", "A", "B"])
+        for call in mock_extract.call_args_list:
+            self.assertIs(call.kwargs["transport"], transport)
+            self.assertTrue(call.kwargs["incremental"])
+        self.assertEqual(len(results), 3)
+        self.assertEqual(seen, results)
+        failed = [result for result in results if result.error]
+        self.assertEqual([(r.serial, r.error) for r in failed], [("B", "boom")])
+        self.assertIn("Lost the ADB server", output.getvalue())
+
+    def test_busy_device_is_not_queued_twice(self) -> None:
+        """A device that reconnects mid-extraction should not be extracted again."""
+
+        watcher = DeviceWatcher(TrackingTransport([]), None)
+        watcher._active.add("A")  # pylint: disable=protected-access
+
+        with (
+            patch("pykeypull.watch.extract_device") as mock_extract,
+            redirect_stdout(io.StringIO()),
+        ):
+            watcher._update(None, {"A"})  # pylint: disable=protected-access
+
+        mock_extract.assert_not_called()
+
+    def test_reattached_device_gets_a_fresh_breaker(self) -> None:
+        """A device re-plugged within the cooldown should be tried again."""
+
+        retrier = Retrier(RetryPolicy(attempts=1, breaker_threshold=1))
+        with self.assertRaises(TransportError):
+            retrier.call("A", _offline)
+        self.assertFalse(retrier.available("A"))
+
+        watcher = DeviceWatcher(TrackingTransport([]), None, retrier=retrier)
+        with (
+            ThreadPoolExecutor(max_workers=1) as pool,
+            patch("pykeypull.watch.extract_device", side_effect=_fake_extract),
+            redirect_stdout(io.StringIO()),
+        ):
+            watcher._update(pool, {"A"})  # pylint: disable=protected-access
+
+        self.assertTrue(retrier.available("A"))
+        self.assertEqual(retrier.outcomes("A"), {})
+
+    def test_missing_adb_stops_with_a_clear_error(self) -> None:
+        """A vanished adb executable should end watching with an ExtractionError."""
+
+        transport = TrackingTransport([])
+        transport.track_devices = _no_adb
+        with self.assertRaises(ExtractionError) as caught:
+            DeviceWatcher(transport, None).run()
+
+        self.assertEqual(str(caught.exception), "ADB executable not found in PATH")
+
+
+def _offline():
+    """Fail like a device that dropped off the bus."""
+
+    raise TransportError("error: device offline")
+
+
+def _no_adb():
+    """Fail like :class:`SubprocessTransport` without an ``adb`` executable."""
+
+    raise FileNotFoundError(2, "No such file or directory", "adb")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()